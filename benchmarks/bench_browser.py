@@ -0,0 +1,119 @@
+"""
+Benchmark do perfil do navegador: tempo de carregamento da página e memória (RSS).
+
+Sobe um servidor local que entrega benchmarks/fixtures/paciente.html acrescido
+de imagens, fontes e um script de analytics com atraso artificial (como o site
+real) e compara, a cada `refresh()`:
+    - padrao : perfil antigo (janela, page_load_strategy normal, tudo carregado)
+    - enxuto : headless + bloqueio de recursos via CDP + page_load_strategy eager
+
+O RSS soma o chromedriver e todos os processos filhos do Chrome (requer psutil;
+sem ele só o tempo é medido).
+
+Uso:
+    python -m benchmarks.bench_browser [--reps 10] [--asset-delay-ms 80]
+"""
+
+import argparse
+import http.server
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from monitor_hu.parser import BROWSER_DEFAULTS, HUParser
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "paciente.html"
+PERFIS = {
+    "padrao": {},
+    "enxuto": {"headless": True, "block_resources": True, "page_load_strategy": "eager"},
+}
+ASSETS = "".join(
+    [f'<img src="/static/foto{i}.png">' for i in range(8)]
+    + ['<link rel="preload" href="/static/fonte.woff2" as="font" crossorigin>',
+       '<script src="/www.google-analytics.com/analytics.js"></script>']
+)
+
+
+class PageHandler(http.server.BaseHTTPRequestHandler):
+    delay = 0.08
+    page = FIXTURE.read_text(encoding="utf-8").replace("</body>", ASSETS + "</body>").encode("utf-8")
+
+    def do_GET(self):
+        if self.path.startswith("/reshu/"):
+            body, tipo = self.page, "text/html; charset=utf-8"
+        else:
+            time.sleep(self.delay)  # recurso de terceiros lento
+            body, tipo = b"\0" * 20000, "application/octet-stream"
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def rss_mb(driver):
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        raiz = psutil.Process(driver.service.process.pid)
+        procs = [raiz] + raiz.children(recursive=True)
+        return sum(p.memory_info().rss for p in procs) / 2**20
+    except Exception:
+        return None
+
+
+def medir(nome, browser, url, reps):
+    with tempfile.TemporaryDirectory() as tmp:
+        parser = HUParser(None, None, cookies_file=Path(tmp) / "cookies.pkl", browser=browser, url=url)
+        try:
+            parser.open()
+            tempos, memorias = [], []
+            for _ in range(reps):
+                inicio = time.perf_counter()
+                parser.driver.refresh()
+                snapshot = parser.extract_dropdown()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                memorias.append(rss_mb(parser.driver))
+        finally:
+            parser.close()
+
+    rss = [m for m in memorias if m is not None]
+    memoria = f"RSS={statistics.median(rss):7.1f} MB" if rss else "RSS=n/d (instale psutil)"
+    print(
+        f"{nome:<7} opções={len(snapshot.options):<4} "
+        f"carga+extração mediana={statistics.median(tempos):8.1f} ms  max={max(tempos):8.1f} ms  {memoria}"
+    )
+    return statistics.median(tempos), (statistics.median(rss) if rss else None)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--reps", type=int, default=10)
+    ap.add_argument("--asset-delay-ms", type=float, default=80)
+    args = ap.parse_args()
+
+    PageHandler.delay = args.asset_delay_ms / 1000
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/reshu/paciente"
+
+    try:
+        resultados = {nome: medir(nome, {**BROWSER_DEFAULTS, **perfil}, url, args.reps) for nome, perfil in PERFIS.items()}
+    finally:
+        server.shutdown()
+
+    (t_antes, m_antes), (t_depois, m_depois) = resultados["padrao"], resultados["enxuto"]
+    print(f"tempo por ciclo: {t_antes:.1f} → {t_depois:.1f} ms ({t_antes / max(t_depois, 1e-9):.1f}x)")
+    if m_antes and m_depois:
+        print(f"RSS: {m_antes:.1f} → {m_depois:.1f} MB ({m_antes - m_depois:+.1f} MB por monitor)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark ponta a ponta contra o site falso (benchmarks/fake_hu.py).
+
+Sobe o FakeHU, aponta o monitor para ele (HU_URL) e roda MonitorService.check_once()
+em laço, com um diretório de dados temporário. Durante a execução o roteiro abre
+especialidades em instantes aleatórios entre verificações, fecha-as depois de
+algumas verificações e derruba o site por alguns segundos. Mede:
+    - latência de detecção: opção aparece no site → alerta enfileirado no dispatcher
+    - CPU por verificação (tempo de CPU da thread principal, sem o servidor falso)
+    - memória (RSS do processo + chromedriver/Chrome no motor Selenium; requer psutil)
+
+Nenhuma notificação sai de verdade: o dispatcher é substituído por um registrador.
+No motor HTTP (padrão) os cookies são semeados com uma sessão do site falso, então
+o Chrome não é necessário; --engine selenium exercita o HUParser com o navegador
+(o login no site falso se resolve sozinho, sem CAPTCHA).
+
+Uso:
+    python -m benchmarks.bench_e2e [--engine http|selenium] [--checks 60] [--interval 0.5]
+                                   [--options 40] [--latency-ms 20] [--jitter-ms 10]
+                                   [--open-every 5] [--outage-s 2]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_hu import SESSION_COOKIE, FakeHU
+
+
+def rss_mb(parser=None):
+    try:
+        import psutil
+    except ImportError:
+        return None
+    procs = [psutil.Process()]
+    driver = getattr(parser, "_driver", None)
+    try:
+        if driver is not None:
+            raiz = psutil.Process(driver.service.process.pid)
+            procs += [raiz] + raiz.children(recursive=True)
+        return sum(p.memory_info().rss for p in procs) / 2**20
+    except Exception:
+        return None
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--engine", choices=("http", "selenium"), default="http")
+    ap.add_argument("--checks", type=int, default=60)
+    ap.add_argument("--interval", type=float, default=0.5, help="segundos entre verificações")
+    ap.add_argument("--options", type=int, default=40)
+    ap.add_argument("--latency-ms", type=float, default=20)
+    ap.add_argument("--jitter-ms", type=float, default=10)
+    ap.add_argument("--open-every", type=int, default=5, help="abre uma especialidade a cada N verificações")
+    ap.add_argument("--outage-s", type=float, default=2, help="queda simulada no meio da execução (0 = sem queda)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    fake = FakeHU(n_options=args.options, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, seed=args.seed)
+    server, url = fake.serve()
+
+    # O monitor lê as credenciais no import (e a URL ao criar o parser): o ambiente vem antes
+    os.environ["HU_URL"] = url
+    os.environ.setdefault("HU_USER", "1234567")
+    os.environ.setdefault("HU_DATA", "01/01/1990")
+    from monitor_hu.monitor import MonitorService
+    from monitor_hu.session import CookieStore
+
+    rng = random.Random(args.seed)
+    alertas = {}  # nome -> time.time() do enfileiramento
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.engine == "http":
+            cookie = {"name": SESSION_COOKIE, "value": fake.issue_session(), "domain": "127.0.0.1", "path": "/"}
+            CookieStore(os.path.join(tmp, "hu_cookies.json")).save([cookie], login=True)
+
+        svc = MonitorService(data_dir=tmp)
+        svc.scheduler.config = {**svc.scheduler.config, "fetch": {"engine": args.engine}, "session": {}}
+        if args.engine == "selenium":
+            svc.scheduler.config["browser"] = {"headless": True, "block_resources": True, "page_load_strategy": "eager"}
+
+        def registrar(telegram=None, email=None, **_):
+            agora = time.time()
+            for nome in fake.opened_at:
+                if telegram and nome in telegram:
+                    alertas.setdefault(nome, agora)
+        svc.dispatcher.notify = registrar
+
+        cpu, parede, memoria, falhas = [], [], [], 0
+        abertas = []
+        meio = args.checks // 2
+        try:
+            svc._create_parser()
+            if not svc._try_fast_start():
+                svc.parser.ensure_logged()
+                svc._sync_http_session()
+
+            for i in range(args.checks):
+                # Roteiro: abertura em um instante qualquer antes da próxima verificação
+                if i and i % args.open_every == 0:
+                    nome = f"VAGA BENCH {i:04d}"
+                    abertas.append((i, nome))
+                    atraso = rng.uniform(0, args.interval)
+                    time.sleep(atraso)
+                    fake.open(nome)
+                    time.sleep(args.interval - atraso)
+                else:
+                    time.sleep(args.interval)
+                while abertas and i - abertas[0][0] >= 3:
+                    fake.close(abertas.pop(0)[1])
+                if args.outage_s and i == meio:
+                    fake.outage(args.outage_s)
+
+                c0, t0 = time.thread_time(), time.perf_counter()
+                try:
+                    svc.check_once()
+                except Exception:
+                    falhas += 1
+                cpu.append((time.thread_time() - c0) * 1000)
+                parede.append((time.perf_counter() - t0) * 1000)
+                memoria.append(rss_mb(svc.parser))
+        finally:
+            svc.dispatcher.close(timeout=1)
+            if svc.session: svc.session.stop()
+            if svc.fetcher: svc.fetcher.close()
+            if svc.parser: svc.parser.close()
+            server.shutdown()
+
+    latencias = [(alertas[n] - fake.opened_at[n]) * 1000 for n in fake.opened_at if n in alertas]
+    perdidas = len(fake.opened_at) - len(latencias)
+    rss = [m for m in memoria if m is not None]
+
+    print(f"motor={args.engine} verificações={args.checks} intervalo={args.interval}s opções={args.options} "
+          f"latência do site={args.latency_ms:.0f}±{args.jitter_ms:.0f} ms")
+    print(f"verificação (parede): mediana={statistics.median(parede):7.1f} ms  p95={percentil(parede, 95):7.1f} ms  "
+          f"falhas={falhas} (queda simulada de {args.outage_s:g}s)")
+    print(f"CPU por verificação : mediana={statistics.median(cpu):7.2f} ms  p95={percentil(cpu, 95):7.2f} ms")
+    if latencias:
+        print(f"detecção            : mediana={statistics.median(latencias):7.1f} ms  p95={percentil(latencias, 95):7.1f} ms  "
+              f"max={max(latencias):7.1f} ms  ({len(latencias)} aberturas, {perdidas} não detectadas)")
+    else:
+        print(f"detecção            : nenhuma abertura detectada ({perdidas} roteirizadas)")
+    if rss:
+        print(f"RSS                 : início={rss[0]:7.1f} MB  fim={rss[-1]:7.1f} MB  ({rss[-1] - rss[0]:+.1f} MB)")
+    else:
+        print("RSS                 : n/d (instale psutil)")
+    print(f"site falso          : {fake.requests} requisições, {fake.logins} logins")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Micro-benchmark das estratégias de extração do dropdown 'Especialidade'.
+
+Compara, contra o HTML local em benchmarks/fixtures/paciente.html:
+    - script : ScriptExtraction (um único execute_script)
+    - select : SelectExtraction (caminho antigo, uma chamada WebDriver por opção)
+    - html   : parse_options do motor HTTP (sem navegador)
+
+Uso:
+    python -m benchmarks.bench_extraction [--reps 20] [--no-browser]
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from monitor_hu.fetcher import parse_options
+from monitor_hu.parser import DropdownSnapshot, ScriptExtraction, SelectExtraction
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "paciente.html"
+
+
+def medir(nome, fn, reps):
+    tempos = []
+    resultado = None
+    for _ in range(reps):
+        inicio = time.perf_counter()
+        resultado = fn()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    print(
+        f"{nome:<8} opções={len(resultado.options):<4} "
+        f"mediana={statistics.median(tempos):8.2f} ms  "
+        f"min={min(tempos):8.2f} ms  max={max(tempos):8.2f} ms  hash={resultado.digest[:10]}"
+    )
+    return resultado
+
+
+def bench_html(reps):
+    html = FIXTURE.read_text(encoding="utf-8")
+    return medir("html", lambda: DropdownSnapshot(parse_options(html)[2]), reps)
+
+
+def bench_browser(reps):
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(FIXTURE.as_uri())
+        resultados = [medir(s.name, lambda s=s: s.extract(driver), reps) for s in (ScriptExtraction(), SelectExtraction())]
+        return resultados
+    finally:
+        driver.quit()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--reps", type=int, default=20)
+    ap.add_argument("--no-browser", action="store_true", help="mede apenas o parser HTML (sem Chrome)")
+    args = ap.parse_args()
+
+    html = bench_html(args.reps)
+    if args.no_browser: return
+
+    script, select = bench_browser(args.reps)
+    # As três estratégias precisam enxergar exatamente o mesmo conjunto de especialidades
+    if not (script.especialidades == select.especialidades == html.especialidades):
+        raise SystemExit("❌ Estratégias divergiram no conjunto de especialidades.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark de inicialização do monitor (o que um restart do Guardian paga).
+
+Mede, em processos Python novos:
+    - import    : tempo de `import monitor_hu.monitor`
+    - 1ª leitura: do início do processo até o fim do primeiro check_once() de um
+                  MonitorService construído como no restart (banco, índice de
+                  analytics, início rápido pelos cookies salvos), contra o site
+                  falso (benchmarks/fake_hu.py)
+
+Também falha se algum módulo pesado (selenium, pandas, matplotlib, rich...)
+voltar a ser importado no topo dos módulos.
+
+Uso:
+    python -m benchmarks.bench_startup [--runs 5] [--import-budget-ms 400] [--first-check-budget-ms 800]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.fake_hu import SESSION_COOKIE, FakeHU
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("selenium", "webdriver_manager", "pandas", "matplotlib", "rich")
+
+# O mesmo caminho de run(): construção, início rápido e a primeira verificação
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import monitor_hu.monitor
+t_import = time.perf_counter() - t0
+from monitor_hu.monitor import MonitorService
+svc = MonitorService(data_dir=sys.argv[1], headless=True)
+svc.scheduler.config = {**svc.scheduler.config, "fetch": {"engine": "http"}, "session": {}}
+svc.dispatcher.notify = lambda *a, **k: None
+svc._create_parser()
+if not svc._try_fast_start():
+    raise SystemExit("cookies do site falso não restauraram a sessão")
+svc.check_once()
+t_first = time.perf_counter() - t0
+pesados = sorted({m.split(".")[0] for m in sys.modules} & set(sys.argv[2].split(",")))
+svc.dispatcher.close(timeout=1)
+svc.fetcher.close()
+if svc.db: svc.db.close()
+print(json.dumps({"import": t_import, "first": t_first, "heavy": pesados}))
+"""
+
+
+def run_child(url, data_dir):
+    # HU_URL é lido no import do parser: vai pelo ambiente do processo filho
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, data_dir, ",".join(HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, "HU_URL": url, "HU_USER": os.getenv("HU_USER", "1234567"),
+             "HU_DATA": os.getenv("HU_DATA", "01/01/1990")},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--import-budget-ms", type=float, default=400)
+    ap.add_argument("--first-check-budget-ms", type=float, default=800)
+    args = ap.parse_args()
+
+    from monitor_hu.session import CookieStore
+
+    fake = FakeHU()
+    server, url = fake.serve()
+    with tempfile.TemporaryDirectory() as tmp:
+        cookie = {"name": SESSION_COOKIE, "value": fake.issue_session(), "domain": "127.0.0.1", "path": "/"}
+        CookieStore(os.path.join(tmp, "hu_cookies.json")).save([cookie], login=True)
+        # A primeira execução cria/migra o banco e aquece o cache de bytecode: as medidas
+        # seguintes são um restart, com os dados da execução anterior no diretório
+        run_child(url, tmp)
+        resultados = [run_child(url, tmp) for _ in range(args.runs)]
+    server.shutdown()
+    if fake.logins:
+        raise SystemExit("❌ o início rápido caiu no formulário de login")
+
+    t_import = statistics.median(r["import"] for r in resultados) * 1000
+    t_first = statistics.median(r["first"] for r in resultados) * 1000
+    pesados = sorted({m for r in resultados for m in r["heavy"]})
+
+    print(f"import monitor_hu.monitor : {t_import:8.1f} ms (orçamento {args.import_budget_ms:.0f} ms)")
+    print(f"primeira verificação      : {t_first:8.1f} ms (orçamento {args.first_check_budget_ms:.0f} ms)")
+    print(f"módulos pesados carregados: {', '.join(pesados) or 'nenhum'}")
+
+    falhas = []
+    if t_import > args.import_budget_ms: falhas.append("import acima do orçamento")
+    if t_first > args.first_check_budget_ms: falhas.append("primeira verificação acima do orçamento")
+    if pesados: falhas.append(f"imports pesados no caminho de inicialização: {', '.join(pesados)}")
+    if falhas:
+        raise SystemExit("❌ " + "; ".join(falhas))
+    print("✅ Dentro do orçamento.")
+
+
+if __name__ == "__main__":
+    main()
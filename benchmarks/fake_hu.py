@@ -0,0 +1,220 @@
+"""
+Réplica local da página reshu/paciente do HU para benchmarks e testes manuais.
+
+- Sem cookie de sessão válido devolve o formulário de login (PacienteMatricula /
+  PacienteDataNascimento). Não há CAPTCHA: preencher a data (evento 'change',
+  como faz o HUParser.manual_login) envia o formulário e cria a sessão.
+- Com sessão devolve o <select id="Especialidade"> com N opções.
+- Aberturas/fechamentos roteirizados, latência injetada e quedas simuladas (503).
+
+Uso avulso (aponte o monitor para ele com HU_URL):
+    python -m benchmarks.fake_hu [--port 8765] [--options 40] [--latency-ms 0] [--toggle-every 30]
+    HU_URL=http://127.0.0.1:8765/reshu/paciente python -m monitor_hu.monitor
+"""
+
+import argparse
+import html
+import http.server
+import random
+import secrets
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+SESSION_COOKIE = "CAKEPHP"
+PAGE_PATH = "/reshu/paciente"
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html lang="pt-br"><head><meta charset="utf-8"><title>ResHU - Login</title></head>
+<body>
+  <form id="PacienteLoginForm" method="post" action="{path}/login">
+    <input id="PacienteMatricula" name="matricula" type="text">
+    <input id="PacienteDataNascimento" name="nascimento" type="text">
+    <div class="captcha"><img src="/static/captcha.png" alt="captcha"></div>
+    <button type="submit">Entrar</button>
+  </form>
+  <script>
+    // Sem CAPTCHA de verdade: data preenchida com matrícula presente = login enviado
+    document.getElementById('PacienteDataNascimento').addEventListener('change', function () {{
+      if (document.getElementById('PacienteMatricula').value) document.getElementById('PacienteLoginForm').submit();
+    }});
+  </script>
+</body></html>
+"""
+
+SELECT_PAGE = """<!DOCTYPE html>
+<html lang="pt-br"><head><meta charset="utf-8"><title>ResHU - Paciente</title></head>
+<body>
+  <form id="AgendamentoForm" method="post" action="{path}">
+    <label for="Especialidade">Especialidade</label>
+    <select id="Especialidade" name="Especialidade">
+      <option value="">-- Selecione --</option>
+{options}
+    </select>
+  </form>
+</body></html>
+"""
+
+
+class FakeHU:
+    """Estado do site falso. Todos os métodos são seguros entre threads."""
+
+    def __init__(self, n_options=40, latency=0.0, jitter=0.0, disabled_every=9, seed=None):
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.options = {f"ESPECIALIDADE {i:03d}": (i % disabled_every == 0) for i in range(1, n_options + 1)}
+        self.sessions = set()
+        self.outage_until = 0.0
+        self.opened_at = {}   # nome -> time.time() da abertura roteirizada
+        self.requests = 0
+        self.logins = 0
+
+    # ==========================================================================
+    # Roteiro
+    # ==========================================================================
+    def issue_session(self):
+        """Cria uma sessão válida sem passar pelo formulário (semente de cookies para o modo HTTP)."""
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.sessions.add(token)
+        return token
+
+    def expire_sessions(self):
+        """Derruba todas as sessões (kickback): o próximo acesso cai no formulário de login."""
+        with self._lock:
+            self.sessions.clear()
+
+    def open(self, name, disabled=False):
+        with self._lock:
+            self.options[name] = disabled
+            self.opened_at[name] = time.time()
+
+    def close(self, name):
+        with self._lock:
+            self.options.pop(name, None)
+
+    def outage(self, seconds):
+        """Responde 503 a tudo pelos próximos `seconds` segundos."""
+        with self._lock:
+            self.outage_until = time.monotonic() + seconds
+
+    # ==========================================================================
+    # Renderização
+    # ==========================================================================
+    def render(self, token):
+        with self._lock:
+            self.requests += 1
+            if time.monotonic() < self.outage_until:
+                return 503, None
+            if token not in self.sessions:
+                return 200, LOGIN_PAGE.format(path=PAGE_PATH)
+            linhas = [
+                f'      <option value="{i}"{" disabled" if desabilitada else ""}>{html.escape(nome)}</option>'
+                for i, (nome, desabilitada) in enumerate(self.options.items(), 1)
+            ]
+        return 200, SELECT_PAGE.format(path=PAGE_PATH, options="\n".join(linhas))
+
+    def login(self):
+        with self._lock:
+            self.logins += 1
+        return self.issue_session()
+
+    def delay(self):
+        atraso = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+        if atraso > 0: time.sleep(atraso)
+
+    # ==========================================================================
+    # Servidor
+    # ==========================================================================
+    def serve(self, host="127.0.0.1", port=0):
+        """Sobe o servidor numa thread daemon. Devolve (servidor, URL da página do paciente)."""
+        fake = self
+
+        class Handler(_Handler):
+            pass
+        Handler.fake = fake
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="fake-hu", daemon=True).start()
+        return server, f"http://{host}:{server.server_port}{PAGE_PATH}"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    fake = None
+
+    def _token(self):
+        for parte in self.headers.get("Cookie", "").split(";"):
+            nome, _, valor = parte.strip().partition("=")
+            if nome == SESSION_COOKIE:
+                return valor
+        return None
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for nome, valor in headers:
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        caminho = urlparse(self.path).path
+        if caminho.rstrip("/") != PAGE_PATH:
+            self._send(404)
+            return
+        self.fake.delay()
+        status, pagina = self.fake.render(self._token())
+        if pagina is None:
+            self._send(status, b"Service Unavailable", "text/plain")
+        else:
+            self._send(status, pagina.encode("utf-8"))
+
+    def do_POST(self):
+        if urlparse(self.path).path != PAGE_PATH + "/login":
+            self._send(404)
+            return
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        campos = parse_qs(self.rfile.read(tamanho).decode("utf-8"))
+        if not campos.get("matricula") or not campos.get("nascimento"):
+            self._send(303, headers=[("Location", PAGE_PATH)])
+            return
+        token = self.fake.login()
+        self._send(303, headers=[("Location", PAGE_PATH), ("Set-Cookie", f"{SESSION_COOKIE}={token}; Path=/")])
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--options", type=int, default=40)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--toggle-every", type=float, default=0, help="abre/fecha uma especialidade a cada N s (0 = nunca)")
+    args = ap.parse_args()
+
+    fake = FakeHU(n_options=args.options, latency=args.latency_ms / 1000)
+    server, url = fake.serve(port=args.port)
+    print(f"Fake HU em {url} (Ctrl+C para sair)")
+    try:
+        n = 0
+        while True:
+            if args.toggle_every:
+                time.sleep(args.toggle_every)
+                n += 1
+                nome = f"VAGA TESTE {n:03d}"
+                fake.open(nome)
+                print(f"+ {nome}")
+                fake.close(f"VAGA TESTE {n - 1:03d}")
+            else:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: adaptive.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Adaptive Scheduling Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Agendamento adaptativo aprendido a partir dos eventos 'added' do
+    diário (tabela events do SQLite ou history.csv). Mantém um modelo de taxa de liberação por dia da semana e
+    minuto do dia e distribui o mesmo orçamento diário de requisições do
+    agendamento fixo proporcionalmente a sqrt(taxa): para chegadas de Poisson
+    com verificações periódicas essa é a alocação que minimiza a latência
+    média de detecção para um número fixo de verificações.
+
+    Rodando `python -m monitor_hu.adaptive` o módulo reexecuta o histórico e
+    compara latência mediana de detecção e requisições/dia dos dois modos.
+===============================================================================
+"""
+
+import math
+import statistics
+from datetime import timedelta
+
+from .journal import EventJournal
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def read_release_times(journal=None):
+    """Gera os timestamps dos eventos 'added' do histórico, em streaming."""
+    for e in (journal or EventJournal()).iter_events(evento="added"):
+        yield e.data_hora
+
+
+class ReleaseModel:
+    """Contagem de liberações por (dia da semana, minuto), suavizada por um kernel triangular."""
+
+    def __init__(self, bandwidth=15, lead=10, floor=0.3, pool=0.5):
+        self.bandwidth = bandwidth   # meia-largura do kernel, em minutos
+        self.lead = lead             # antecipação: começa a acelerar `lead` minutos antes do pico
+        self.floor = floor           # fração da taxa média usada como piso fora dos picos
+        # Peso do perfil de todos os dias na taxa de cada dia da semana: com poucas
+        # semanas de histórico, o dia sozinho tem eventos demais ao acaso
+        self.pool = pool
+        self.counts = [[0] * MINUTES_PER_DAY for _ in range(7)]
+        self.all_counts = [0] * MINUTES_PER_DAY
+        self.total = 0
+        self.first = None
+        self.last = None
+        self._density = {}
+
+    @classmethod
+    def from_history(cls, times=None, journal=None, **kwargs):
+        model = cls(**kwargs)
+        for ts in (read_release_times(journal) if times is None else times):
+            model.observe(ts)
+        return model
+
+    def observe(self, ts):
+        """Atualiza o modelo com uma nova liberação (incremental, O(1))."""
+        self.counts[ts.weekday()][ts.hour * 60 + ts.minute] += 1
+        self.all_counts[ts.hour * 60 + ts.minute] += 1
+        self.total += 1
+        if self.first is None or ts < self.first: self.first = ts
+        if self.last is None or ts > self.last: self.last = ts
+        # A densidade depende de todos os dias (piso = taxa média), então invalida o cache
+        self._density.clear()
+
+    def days_observed(self, weekday):
+        """Quantas vezes o dia da semana aparece no período coberto pelo histórico."""
+        if self.first is None: return 0
+        dias = (self.last.date() - self.first.date()).days + 1
+        semanas, resto = divmod(dias, 7)
+        extra = (weekday - self.first.weekday()) % 7 < resto
+        return semanas + int(extra)
+
+    def _smoothed(self, linha, minute):
+        bw = self.bandwidth
+        soma = 0.0
+        for d in range(-bw, bw + 1):
+            soma += linha[(minute + d) % MINUTES_PER_DAY] * (bw + 1 - abs(d))
+        return soma / ((bw + 1) ** 2)
+
+    def rate(self, weekday, minute):
+        """Liberações esperadas por dia naquele minuto (kernel triangular de ±bandwidth)."""
+        dias = self.days_observed(weekday)
+        if not dias: return 0.0
+        proprio = self._smoothed(self.counts[weekday], minute) / dias
+        if not self.pool: return proprio
+        todos = self._smoothed(self.all_counts, minute) / sum(self.days_observed(d) for d in range(7))
+        return (1 - self.pool) * proprio + self.pool * todos
+
+    def density(self, weekday, budget, min_seconds=15, max_seconds=3600):
+        """Verificações por minuto ao longo do dia, somando `budget` verificações/dia."""
+        chave = (weekday, round(budget, 3), min_seconds, max_seconds)
+        if chave in self._density: return self._density[chave]
+
+        taxas = [self.rate(weekday, m) for m in range(MINUTES_PER_DAY)]
+        # Antecipação: cada minuto herda a maior taxa dos próximos `lead` minutos
+        efetiva = [max(taxas[(m + k) % MINUTES_PER_DAY] for k in range(self.lead + 1)) for m in range(MINUTES_PER_DAY)]
+        media = sum(efetiva) / MINUTES_PER_DAY
+        piso = self.floor * media if media else 1.0
+        pesos = [math.sqrt(t + piso) for t in efetiva]
+
+        # Water-filling: minutos presos nos limites saem da conta e o resto do
+        # orçamento é redistribuído entre os livres, mantendo o total diário
+        lo, hi = 60.0 / max_seconds, 60.0 / min_seconds
+        densidade = [0.0] * MINUTES_PER_DAY
+        livres = set(range(MINUTES_PER_DAY))
+        restante = budget
+        for _ in range(10):
+            soma = sum(pesos[m] for m in livres)
+            if not livres or soma <= 0: break
+            escala = restante / soma
+            presos = set()
+            for m in livres:
+                densidade[m] = pesos[m] * escala
+                if densidade[m] < lo or densidade[m] > hi:
+                    densidade[m] = min(hi, max(lo, densidade[m]))
+                    presos.add(m)
+            if not presos: break
+            livres -= presos
+            restante = budget - sum(densidade[m] for m in range(MINUTES_PER_DAY) if m not in livres)
+        self._density[chave] = densidade
+        return densidade
+
+    def interval_seconds(self, now, budget, min_seconds=15, max_seconds=3600):
+        """
+        Intervalo até a próxima verificação dado o orçamento diário: o ponto em que a
+        densidade acumulada a partir de `now` chega a 1 verificação. Amostrar só o
+        minuto atual pularia os minutos densos logo depois de um trecho esparso
+        (e deixaria parte do orçamento sem uso).
+        """
+        if not self.total:
+            return None
+        minuto = now.hour * 60 + now.minute
+        dia = now.weekday()
+        densidade = self.density(dia, budget, min_seconds, max_seconds)
+        fracao = 1 - (now.second + now.microsecond / 1e6) / 60  # resto do minuto atual
+        falta, segundos = 1.0, 0.0
+        while segundos < max_seconds:
+            n = densidade[minuto] * fracao  # verificações devidas neste pedaço de minuto
+            if n >= falta:
+                segundos += 60.0 * falta / densidade[minuto]
+                break
+            falta -= n
+            segundos += 60.0 * fracao
+            fracao = 1.0
+            minuto += 1
+            if minuto == MINUTES_PER_DAY:
+                minuto, dia = 0, (dia + 1) % 7
+                densidade = self.density(dia, budget, min_seconds, max_seconds)
+        return min(max_seconds, max(min_seconds, segundos))
+
+
+# ==============================================================================
+# Avaliação por reexecução do histórico
+# ==============================================================================
+def simulate(interval_fn, releases, start, end):
+    """Reexecuta o período: devolve (latências em segundos, verificações por dia)."""
+    polls = []
+    t = start
+    while t < end:
+        polls.append(t)
+        t += timedelta(seconds=interval_fn(t))
+
+    latencias = []
+    i = 0
+    for ts in sorted(releases):
+        while i < len(polls) and polls[i] < ts:
+            i += 1
+        if i < len(polls):
+            latencias.append((polls[i] - ts).total_seconds())
+    dias = max((end - start).total_seconds() / 86400, 1e-9)
+    return latencias, len(polls) / dias
+
+
+def evaluate(scheduler, releases=None, holdout=0.3, journal=None, **model_kwargs):
+    """
+    Compara o agendamento fixo com o adaptativo. O modelo é treinado nos primeiros
+    (1 - holdout) eventos e avaliado nos restantes, para não medir em cima do treino.
+    """
+    releases = sorted(read_release_times(journal) if releases is None else releases)
+    if len(releases) < 2:
+        return None
+
+    corte = min(len(releases) - 1, max(1, int(len(releases) * (1 - holdout))))
+    treino, teste = releases[:corte], releases[corte:]
+    opts = scheduler.adaptive_options()
+    model_kwargs.setdefault("lead", int(opts["lead_minutes"]))
+    model_kwargs.setdefault("bandwidth", int(opts["bandwidth_minutes"]))
+    model_kwargs.setdefault("floor", opts["floor"])
+    model_kwargs.setdefault("pool", opts["weekday_pooling"])
+    model = ReleaseModel.from_history(treino, **model_kwargs)
+
+    def fixo(t):
+        return scheduler.base_interval_seconds(t, adaptive=False)
+
+    def adaptativo(t):
+        budget = scheduler.fixed_budget(t)
+        return model.interval_seconds(t, budget, opts["min_seconds"], opts["max_seconds"]) or fixo(t)
+
+    inicio = teste[0].replace(hour=0, minute=0, second=0)
+    fim = teste[-1].replace(hour=0, minute=0, second=0) + timedelta(days=1)
+    relatorio = {"treino": len(treino), "teste": len(teste)}
+    for nome, fn in (("fixo", fixo), ("adaptativo", adaptativo)):
+        latencias, por_dia = simulate(fn, teste, inicio, fim)
+        relatorio[nome] = {
+            "latencia_mediana_s": statistics.median(latencias) if latencias else None,
+            "latencia_p95_s": sorted(latencias)[int(0.95 * (len(latencias) - 1))] if latencias else None,
+            "requisicoes_dia": por_dia,
+        }
+    return relatorio
+
+
+def main():
+    from .db import open_storage
+    from .scheduler import get_scheduler
+
+    scheduler = get_scheduler()
+    # O mesmo diário que o monitor usa (SQLite por padrão, ou o history.csv)
+    db, journal, _ = open_storage(scheduler.config)
+    try:
+        relatorio = evaluate(scheduler, journal=journal)
+    finally:
+        if db: db.close()
+    if relatorio is None:
+        print("ℹ️ Histórico insuficiente para avaliar o modo adaptativo.")
+        return
+    print(f"Eventos de treino: {relatorio['treino']} | eventos de teste: {relatorio['teste']}")
+    for nome in ("fixo", "adaptativo"):
+        r = relatorio[nome]
+        print(
+            f"{nome:<11} latência mediana: {r['latencia_mediana_s'] / 60:7.1f} min | "
+            f"p95: {r['latencia_p95_s'] / 60:7.1f} min | requisições/dia: {r['requisicoes_dia']:7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
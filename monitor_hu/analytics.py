@@ -0,0 +1,304 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: analytics.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Incremental Analytics Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Índice pré-agregado do histórico (contagens por hora, por dia da semana e
+    por especialidade), persistido em data/analytics_index.json e atualizado
+    incrementalmente a cada gravação do EventJournal. Os gráficos do
+    /relatorio ficam em cache com o nome derivado de um hash do histograma
+    por hora que eles plotam: enquanto os dados não mudam, o PNG já
+    renderizado é reaproveitado (mesmo depois de o índice ser reconstruído).
+
+    O mesmo índice pareia added/removed por especialidade em uma passada
+    (só guarda o instante de abertura das que estão abertas agora) e mantém
+    a distribuição da duração das vagas num histograma geométrico de tamanho
+    fixo: mínimo, mediana, p95 e aberturas por semana saem para o /stats sem
+    reler o histórico.
+===============================================================================
+"""
+
+import hashlib
+import math
+from datetime import datetime
+from pathlib import Path
+
+from .journal import TS_FORMAT
+from .logger import get_logger
+from .matcher import normalize
+from .state import read_json, atomic_write_json
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+INDEX_FILE = DATA_DIR / "analytics_index.json"
+CHART_DIR = DATA_DIR / "charts"
+
+# Formato do analytics_index.json; um índice de formato antigo é reconstruído
+# (3: descarta as especialidades falsas vindas dos marcadores de início do CSV legado)
+INDEX_FORMAT = 3
+# Baldes geométricos de 5 s a ~90 dias (+20% cada): erro relativo dos quantis <= 10%
+DURATION_BASE = 5.0
+DURATION_FACTOR = 1.2
+DURATION_BUCKETS = 80
+
+log = get_logger("Analytics")
+
+
+def format_duration(seconds):
+    if seconds < 90: return f"{seconds:.0f} s"
+    if seconds < 90 * 60: return f"{seconds / 60:.0f} min"
+    if seconds < 48 * 3600: return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} d"
+
+
+class DurationStats:
+    """Distribuição de durações em memória constante: min/max/soma e histograma geométrico esparso."""
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.count = data.get("count", 0)
+        self.total = data.get("total", 0.0)
+        self.min = data.get("min")
+        self.max = data.get("max")
+        self.buckets = {int(k): v for k, v in data.get("buckets", {}).items()}
+
+    @staticmethod
+    def _bucket(seconds):
+        if seconds <= DURATION_BASE: return 0
+        return min(DURATION_BUCKETS - 1, int(math.log(seconds / DURATION_BASE, DURATION_FACTOR)) + 1)
+
+    def add(self, seconds):
+        seconds = max(0.0, seconds)
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        i = self._bucket(seconds)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+
+    def merge(self, other):
+        for k in ("count", "total"):
+            setattr(self, k, getattr(self, k) + getattr(other, k))
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+
+    def quantile(self, q):
+        """Estimativa pelo balde (média geométrica dos limites), presa entre min e max."""
+        if not self.count: return None
+        alvo = q * self.count
+        acumulado = 0
+        for i in sorted(self.buckets):
+            acumulado += self.buckets[i]
+            if acumulado >= alvo:
+                inferior = DURATION_BASE * DURATION_FACTOR ** (i - 1) if i else 0.0
+                superior = DURATION_BASE * DURATION_FACTOR ** i
+                estimativa = math.sqrt(inferior * superior) if inferior else superior
+                return min(max(estimativa, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "total": self.total, "min": self.min, "max": self.max,
+                "buckets": {str(i): n for i, n in self.buckets.items()}}
+
+
+class AnalyticsIndex:
+    def __init__(self, journal, path=INDEX_FILE, chart_dir=CHART_DIR):
+        self.journal = journal
+        self.path = Path(path)
+        self.chart_dir = Path(chart_dir)
+        self.reload()
+
+    def reload(self):
+        """(Re)carrega o índice do disco e indexa o que faltar; reconstrói se estiver inválido."""
+        self._reset()
+        if not self._load():
+            self.rebuild()
+        else:
+            self._catch_up()
+
+    def _reset(self):
+        self.version = 0
+        self.hourly = [0] * 24
+        self.weekday = [0] * 7
+        self.per_specialty = {}
+        self.durations = {}    # especialidade -> DurationStats
+        self.open_since = {}   # especialidade aberta agora -> instante do added
+        self.first_seen = {}   # especialidade -> primeiro added (base das aberturas por semana)
+        self.last_ts = None
+        self.at_last_ts = 0  # eventos já indexados com timestamp == last_ts
+
+    def _load(self):
+        data = read_json(self.path)
+        if not isinstance(data, dict) or data.get("format") != INDEX_FORMAT: return False
+        try:
+            self.version = data["version"]
+            self.hourly = data["hourly"]
+            self.weekday = data["weekday"]
+            self.per_specialty = data["per_specialty"]
+            self.durations = {k: DurationStats(v) for k, v in data["durations"].items()}
+            self.open_since = {k: datetime.strptime(v, TS_FORMAT) for k, v in data["open_since"].items()}
+            self.first_seen = {k: datetime.strptime(v, TS_FORMAT) for k, v in data["first_seen"].items()}
+            self.last_ts = datetime.strptime(data["last_ts"], TS_FORMAT) if data.get("last_ts") else None
+            self.at_last_ts = data.get("at_last_ts", 0)
+        except (KeyError, ValueError, TypeError):
+            self._reset()
+            return False
+        return True
+
+    def save(self):
+        data = {
+            "format": INDEX_FORMAT,
+            "version": self.version,
+            "hourly": self.hourly,
+            "weekday": self.weekday,
+            "per_specialty": self.per_specialty,
+            "durations": {k: v.to_dict() for k, v in self.durations.items()},
+            "open_since": {k: v.strftime(TS_FORMAT) for k, v in self.open_since.items()},
+            "first_seen": {k: v.strftime(TS_FORMAT) for k, v in self.first_seen.items()},
+            "last_ts": self.last_ts.strftime(TS_FORMAT) if self.last_ts else None,
+            "at_last_ts": self.at_last_ts,
+        }
+        try:
+            atomic_write_json(self.path, data)
+        except OSError as e:
+            log.warning(f"Falha ao salvar o índice de analytics: {e}")
+
+    # ==========================================================================
+    # Atualização
+    # ==========================================================================
+    def _apply(self, e):
+        # Mesma resolução do diário (segundos): o índice incremental e o reconstruído coincidem
+        ts = e.data_hora.replace(microsecond=0)
+        contagem = self.per_specialty.setdefault(e.especialidade, {"added": 0, "removed": 0})
+        if e.evento in contagem:
+            contagem[e.evento] += 1
+        if e.evento == "added":
+            self.hourly[ts.hour] += 1
+            self.weekday[ts.weekday()] += 1
+            # Um added sem o removed anterior (monitor parado no meio) recomeça a contagem
+            self.open_since[e.especialidade] = ts
+            self.first_seen.setdefault(e.especialidade, ts)
+        elif e.evento == "removed":
+            inicio = self.open_since.pop(e.especialidade, None)
+            if inicio is not None:
+                self.durations.setdefault(e.especialidade, DurationStats()).add((ts - inicio).total_seconds())
+
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts, self.at_last_ts = ts, 1
+        elif ts == self.last_ts:
+            self.at_last_ts += 1
+
+    def rebuild(self):
+        """Reconstrói o índice inteiro em uma passada de streaming pelo histórico."""
+        versao = self.version
+        self._reset()
+        for e in self.journal.iter_events():
+            self._apply(e)
+        self.version = versao + 1
+        self.save()
+        log.info(f"Índice de analytics reconstruído (versão {self.version}).")
+
+    def _catch_up(self):
+        """Indexa eventos gravados enquanto o índice estava desatualizado (ex.: crash)."""
+        if self.last_ts is None:
+            novos = list(self.journal.iter_events())
+        else:
+            pular = self.at_last_ts
+            novos = []
+            for e in self.journal.iter_events(since=self.last_ts):
+                if e.data_hora == self.last_ts and pular:
+                    pular -= 1
+                    continue
+                novos.append(e)
+        if novos:
+            self.observe(novos)
+
+    def observe(self, eventos):
+        """Listener do EventJournal: aplica o lote e avança a versão do índice."""
+        for e in eventos:
+            self._apply(e)
+        self.version += 1
+        self.save()
+
+    # ==========================================================================
+    # Duração das vagas (/stats)
+    # ==========================================================================
+    def find(self, nome):
+        """Especialidades do índice cujo nome normalizado começa com `nome`."""
+        chave = normalize(nome)
+        return sorted(esp for esp in self.per_specialty if normalize(esp).startswith(chave))
+
+    def specialty_stats(self, especialidade, now=None):
+        now = now or datetime.now()
+        duracoes = self.durations.get(especialidade) or DurationStats()
+        aberturas = self.per_specialty.get(especialidade, {}).get("added", 0)
+        primeiro = self.first_seen.get(especialidade)
+        semanas = max((now - primeiro).total_seconds() / (7 * 86400), 1.0) if primeiro else 1.0
+        return {
+            "especialidade": especialidade,
+            "openings": aberturas,
+            "per_week": aberturas / semanas,
+            "closed": duracoes.count,
+            "min": duracoes.min,
+            "median": duracoes.quantile(0.5),
+            "p95": duracoes.quantile(0.95),
+            "open_since": self.open_since.get(especialidade),
+        }
+
+    def overall_stats(self):
+        total = DurationStats()
+        for d in self.durations.values():
+            total.merge(d)
+        return {"closed": total.count, "min": total.min, "median": total.quantile(0.5), "p95": total.quantile(0.95)}
+
+    # ==========================================================================
+    # Gráficos em cache
+    # ==========================================================================
+    @property
+    def total_added(self):
+        return sum(self.hourly)
+
+    def chart(self):
+        """Caminho do PNG de horários de pico para os dados atuais ("VAZIO" se não há dados)."""
+        if not self.total_added: return "VAZIO"
+        # Chave pelo conteúdo do gráfico (o histograma por hora), não pela versão do
+        # índice: um índice recriado do zero volta à versão 0 e serviria um PNG antigo
+        chave = hashlib.sha1(",".join(map(str, self.hourly)).encode()).hexdigest()[:12]
+        path = self.chart_dir / f"relatorio-{chave}.png"
+        if path.exists(): return str(path)
+
+        self.chart_dir.mkdir(parents=True, exist_ok=True)
+        self._render(path)
+        # Gráficos de dados anteriores não serão mais servidos
+        for antigo in self.chart_dir.glob("relatorio-*.png"):
+            if antigo != path:
+                try: antigo.unlink()
+                except OSError: pass
+        return str(path)
+
+    def _render(self, path):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        horas = [h for h in range(24) if self.hourly[h]]
+        plt.figure(figsize=(10, 5))
+        plt.bar([str(h) for h in horas], [self.hourly[h] for h in horas], color='#2ecc71', edgecolor='black')
+        plt.title('Horários de Liberação de Vagas')
+        plt.xlabel('Hora do Dia')
+        plt.ylabel('Qtd Vagas')
+        plt.grid(axis='y', alpha=0.3)
+        tmp = path.with_name(path.name + ".tmp.png")
+        plt.savefig(tmp)
+        plt.close()
+        tmp.replace(path)
@@ -0,0 +1,291 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: control.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Control Plane Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Plano de controle local (HTTP só no loopback), ao lado do monitor:
+    - GET  /status   estado em JSON: vagas atuais, última e próxima
+                     verificação, sessão, alvos, pausa;
+    - POST /command  os mesmos comandos do Telegram, em JSON
+                     ({"command": "/pause"}), executados pela thread principal pela mesma fila; a
+                     resposta volta no corpo, sem passar pela API do Telegram;
+    - GET  /events   stream (Server-Sent Events) com cada vaga que abre ou
+                     fecha e o status após cada verificação.
+    Com `control.token` definido, toda requisição precisa do cabeçalho
+    "Authorization: Bearer <token>". Mesmo sem token, requisições vindas de
+    um navegador (cabeçalho Origin ou Host diferente do loopback) são
+    recusadas: uma página aberta na máquina não consegue disparar comandos
+    nem ler o status.
+
+Uso (cliente):
+    python -m monitor_hu.control status
+    python -m monitor_hu.control "/add CARDIO"
+    python -m monitor_hu.control events
+===============================================================================
+"""
+
+import hmac
+import html
+import http.server
+import json
+import queue
+import re
+import sys
+import threading
+from datetime import datetime
+
+from .logger import get_logger
+
+log = get_logger("Control")
+
+CONTROL_DEFAULTS = {
+    "enabled": False,
+    "host": "127.0.0.1",
+    "port": 9110,
+    "token": None,
+    "command_timeout": 30,   # segundos esperando a thread principal executar o comando
+}
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+KEEPALIVE_SECONDS = 15
+STREAM_BUFFER = 100          # eventos pendentes por cliente; um cliente lento perde a conexão
+_TAGS = re.compile(r"<[^>]+>")
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, default=lambda o: o.isoformat() if hasattr(o, "isoformat") else str(o))
+
+
+class LocalCommand:
+    """Um comando vindo do plano de controle: coleta as respostas que iriam para o Telegram."""
+
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+        self.done = threading.Event()
+
+    def reply(self, message):
+        self.replies.append(html.unescape(_TAGS.sub("", message)))
+
+
+class EventBus:
+    """Distribui eventos para os clientes do /events; publicar nunca bloqueia o monitor."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = set()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=STREAM_BUFFER)
+        with self._lock:
+            self._clients.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._clients.discard(q)
+
+    def publish(self, kind, data):
+        with self._lock:
+            clientes = list(self._clients)
+        for q in clientes:
+            try:
+                q.put_nowait((kind, data))
+            except queue.Full:
+                # Cliente parado: sai da lista e recebe o sinal de encerrar a conexão
+                self.unsubscribe(q)
+                try: q.get_nowait()
+                except queue.Empty: pass
+                try: q.put_nowait((None, None))
+                except queue.Full: pass
+
+
+class _ControlHandler(http.server.BaseHTTPRequestHandler):
+    server_version = "MonitorHU"
+    control = None
+
+    def _trusted(self):
+        """Barra CSRF e DNS rebinding: o cliente legítimo é o CLI, que não manda Origin."""
+        host = (self.headers.get("Host") or "").rsplit(":", 1)[0].strip("[]")
+        rebinding = self.control.host in LOCAL_HOSTS and host not in LOCAL_HOSTS
+        if self.headers.get("Origin") is None and not rebinding:
+            return True
+        self._json(403, {"ok": False, "error": "requisição de navegador recusada"})
+        return False
+
+    def _authorized(self):
+        if not self._trusted(): return False
+        token = self.control.token
+        # Comparação em tempo constante (bytes: um cabeçalho não-ASCII não derruba o handler)
+        if not token or hmac.compare_digest(self.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+            return True
+        self._json(401, {"ok": False, "error": "token inválido"})
+        return False
+
+    def _json(self, status, data):
+        corpo = _dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        caminho = self.path.split("?")[0]
+        if not self._authorized(): return
+        if caminho == "/status":
+            self._json(200, self.control.service.status_snapshot())
+        elif caminho == "/events":
+            self._stream()
+        else:
+            self._json(404, {"ok": False, "error": "rota desconhecida"})
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/command":
+            self._json(404, {"ok": False, "error": "rota desconhecida"})
+            return
+        if not self._authorized(): return
+        # Só JSON: um <form> ou fetch "simples" de outra página não consegue mandar esse Content-Type
+        if not self.headers.get("Content-Type", "").startswith("application/json"):
+            self._json(415, {"ok": False, "error": 'envie JSON: {"command": "/status"}'})
+            return
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        try:
+            corpo = str(json.loads(self.rfile.read(tamanho).decode("utf-8")).get("command", "")).strip()
+        except (ValueError, AttributeError):
+            corpo = ""
+        if not corpo.startswith("/"):
+            self._json(400, {"ok": False, "error": "envie um comando, ex.: /status"})
+            return
+        cmd = self.control.submit(corpo)
+        if not cmd.done.wait(self.control.command_timeout):
+            self._json(504, {"ok": False, "error": "o monitor não executou o comando a tempo", "command": corpo})
+            return
+        self._json(200, {"ok": True, "command": corpo, "replies": cmd.replies})
+
+    def _stream(self):
+        q = self.control.bus.subscribe()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            self._event("status", self.control.service.status_snapshot())
+            while not self.control.stopping.is_set():
+                try:
+                    kind, data = q.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                if kind is None: break
+                self._event(kind, data)
+        except OSError:
+            pass  # cliente desconectou
+        finally:
+            self.control.bus.unsubscribe(q)
+
+    def _event(self, kind, data):
+        linha = _dumps(data)
+        self.wfile.write(f"event: {kind}\ndata: {linha}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class ControlServer:
+    """Servidor do plano de controle, conforme a seção `control:` do config.yaml."""
+
+    def __init__(self, service, host="127.0.0.1", port=9110, token=None, command_timeout=30):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.token = token
+        self.command_timeout = command_timeout
+        self.bus = EventBus()
+        self.stopping = threading.Event()
+        self._server = None
+
+    @classmethod
+    def from_config(cls, service, config):
+        opts = {**CONTROL_DEFAULTS, **((config or {}).get("control", {}) or {})}
+        if not opts["enabled"]:
+            return None
+        return cls(service, host=opts["host"], port=opts["port"], token=opts["token"], command_timeout=opts["command_timeout"])
+
+    def start(self):
+        handler = type("Handler", (_ControlHandler,), {"control": self})
+        try:
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), handler)
+        except OSError as e:
+            log.warning(f"Plano de controle indisponível em {self.host}:{self.port}: {e}")
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="control", daemon=True).start()
+        log.info(f"Plano de controle em http://{self.host}:{self._server.server_port}")
+
+    def submit(self, text):
+        """Enfileira o comando para a thread principal (a mesma fila do listener do Telegram)."""
+        cmd = LocalCommand(text)
+        self.service.commands.put((text, cmd))
+        return cmd
+
+    def publish(self, kind, data):
+        self.bus.publish(kind, data)
+
+    def on_journal_events(self, eventos):
+        """Listener do diário: cada vaga que abre ou fecha vira um evento do stream."""
+        for e in eventos:
+            self.publish(e.evento, {"especialidade": e.especialidade, "at": e.data_hora.isoformat()})
+
+    def stop(self):
+        self.stopping.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# ==============================================================================
+# Cliente de linha de comando
+# ==============================================================================
+def main():
+    import argparse
+    import requests
+    from .scheduler import get_scheduler
+
+    ap = argparse.ArgumentParser(description="Cliente do plano de controle do Monitor HU.")
+    ap.add_argument("acao", help='status, events ou um comando entre aspas ("/pause", "/add CARDIO")')
+    args = ap.parse_args()
+
+    opts = {**CONTROL_DEFAULTS, **(get_scheduler().config.get("control", {}) or {})}
+    base = f"http://{opts['host']}:{opts['port']}"
+    headers = {"Authorization": f"Bearer {opts['token']}"} if opts["token"] else {}
+    try:
+        if args.acao == "status":
+            print(json.dumps(requests.get(f"{base}/status", headers=headers, timeout=5).json(), ensure_ascii=False, indent=2))
+        elif args.acao == "events":
+            with requests.get(f"{base}/events", headers=headers, stream=True, timeout=(5, None)) as resp:
+                for linha in resp.iter_lines(decode_unicode=True):
+                    if linha.startswith("data: "):
+                        print(f"[{datetime.now():%H:%M:%S}] {linha[6:]}", flush=True)
+        else:
+            resp = requests.post(f"{base}/command", json={"command": args.acao}, headers=headers, timeout=opts["command_timeout"] + 5)
+            dados = resp.json()
+            print("\n".join(dados.get("replies", [])) or dados.get("error", ""))
+            return 0 if dados.get("ok") else 1
+    except requests.ConnectionError:
+        print(f"Monitor não está ouvindo em {base} (control.enabled no config.yaml?)")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
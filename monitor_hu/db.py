@@ -0,0 +1,359 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: db.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (SQLite Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Armazenamento embutido em SQLite (modo WAL) em data/monitor.db:
+    - events: diário added/removed, indexado por especialidade e horário
+      (consultas como "aberturas de DERMATOLOGIA nos últimos 30 dias" são
+      buscas no índice, não varreduras do CSV);
+    - snapshots: conjunto de especialidades a cada mudança (o último é o
+      estado atual);
+    - sessions: cookies e instante de cada login;
+    - subscribers: chats do Telegram inscritos e seus alvos.
+    Na primeira abertura importa history.csv (+ data/history/*.csv.gz),
+    historico_especialidades.csv, last_snapshot.json e hu_cookies.json.
+    Os arquivos antigos ficam no lugar, só deixam de ser usados.
+
+    O heartbeat continua em heartbeat.json: o Guardian o lê de outro processo
+    e precisa dele mesmo que o banco esteja ocupado ou corrompido.
+===============================================================================
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .journal import Event, EventJournal, TS_FORMAT, _read_rows
+from .logger import get_logger
+from .matcher import normalize
+from .session import CookieStore
+from .state import _load_with_backup
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+DB_NAME = "monitor.db"
+LEGACY_CSV = "historico_especialidades.csv"
+BACKENDS = ("sqlite", "csv")
+# Do CSV legado só entram aberturas/fechamentos: o resto são marcadores de início
+# de execução (INICIO, INICIO_EXECUCAO) que virariam especialidades falsas no /stats
+JOURNAL_EVENTS = ("added", "removed")
+# journal.fsync -> PRAGMA synchronous (no WAL, NORMAL só perde o último commit numa queda de energia)
+SYNCHRONOUS = {"batch": "FULL", "interval": "NORMAL", "none": "OFF"}
+
+# Uma entrada por versão do esquema (PRAGMA user_version)
+SCHEMA = [
+    """
+    CREATE TABLE events (
+        id INTEGER PRIMARY KEY,
+        ts TEXT NOT NULL,
+        evento TEXT NOT NULL,
+        especialidade TEXT NOT NULL,
+        chave TEXT NOT NULL,
+        origem TEXT
+    );
+    CREATE INDEX idx_events_chave_ts ON events (chave, ts);
+    CREATE INDEX idx_events_ts ON events (ts);
+
+    CREATE TABLE snapshots (
+        id INTEGER PRIMARY KEY,
+        taken_at TEXT NOT NULL,
+        especialidades TEXT NOT NULL
+    );
+
+    CREATE TABLE sessions (
+        id INTEGER PRIMARY KEY,
+        login_at TEXT,
+        saved_at TEXT NOT NULL,
+        cookies TEXT NOT NULL
+    );
+
+    CREATE TABLE imports (
+        origem TEXT PRIMARY KEY,
+        imported_at TEXT NOT NULL,
+        linhas INTEGER NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE subscribers (
+        chat_id TEXT PRIMARY KEY,
+        targets TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    );
+    """,
+    # Bancos que já importaram os marcadores de início do CSV legado
+    f"""
+    DELETE FROM events WHERE origem = '{LEGACY_CSV}' AND evento NOT IN ('added', 'removed');
+    """,
+]
+
+log = get_logger("DB")
+
+
+def _ts(dt):
+    return dt.strftime(TS_FORMAT)
+
+
+class Database:
+    """Conexão única compartilhada entre as threads do processo (serializada por um RLock)."""
+
+    def __init__(self, path, synchronous="NORMAL"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._upgrade()
+
+    def _upgrade(self):
+        with self.lock:
+            versao = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            for numero, script in enumerate(SCHEMA[versao:], versao + 1):
+                self.conn.executescript(f"BEGIN IMMEDIATE; {script} PRAGMA user_version = {numero}; COMMIT;")
+                log.info(f"Esquema do banco atualizado para a versão {numero}.")
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self.lock:
+            try: self.conn.close()
+            except sqlite3.Error: pass
+
+    # ==========================================================================
+    # Eventos
+    # ==========================================================================
+    def insert_events(self, eventos, origem=None, conn=None):
+        linhas = [(_ts(e.data_hora), e.evento, e.especialidade, normalize(e.especialidade), origem) for e in eventos]
+        sql = "INSERT INTO events (ts, evento, especialidade, chave, origem) VALUES (?, ?, ?, ?, ?)"
+        if conn is not None:
+            conn.executemany(sql, linhas)
+        else:
+            with self.transaction() as c:
+                c.executemany(sql, linhas)
+        return len(linhas)
+
+    def iter_events(self, since=None, until=None, evento=None, especialidade=None, prefix=False, batch=500):
+        """Eventos em ordem cronológica, lidos em lotes (nunca o histórico inteiro na memória)."""
+        filtros, params = [], []
+        if especialidade:
+            chave = normalize(especialidade)
+            if prefix:
+                # Faixa no índice: "DERMATO" encontra "DERMATOLOGIA"
+                filtros.append("chave >= ? AND chave < ?")
+                params += [chave, chave + "\U0010ffff"]
+            else:
+                filtros.append("chave = ?")
+                params.append(chave)
+        if since:
+            filtros.append("ts >= ?")
+            params.append(_ts(since))
+        if until:
+            filtros.append("ts <= ?")
+            params.append(_ts(until))
+        if evento:
+            filtros.append("evento = ?")
+            params.append(evento)
+
+        # Paginação por (ts, id): cada lote é uma consulta curta, sem cursor aberto entre lotes
+        ultimo = None
+        while True:
+            condicoes, args = list(filtros), list(params)
+            if ultimo:
+                condicoes.append("(ts > ? OR (ts = ? AND id > ?))")
+                args += [ultimo[0], ultimo[0], ultimo[1]]
+            where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+            linhas = self.query(f"SELECT ts, evento, especialidade, id FROM events{where} ORDER BY ts, id LIMIT ?", args + [batch])
+            for ts, ev, esp, _ in linhas:
+                yield Event(datetime.strptime(ts, TS_FORMAT), ev, esp)
+            if len(linhas) < batch: return
+            ultimo = (linhas[-1][0], linhas[-1][3])
+
+    def openings(self, especialidade, days=30, now=None):
+        """Aberturas (added) de uma especialidade, por prefixo normalizado, nos últimos `days` dias."""
+        since = (now or datetime.now()) - timedelta(days=days) if days else None
+        return list(self.iter_events(since=since, evento="added", especialidade=especialidade, prefix=True))
+
+    # ==========================================================================
+    # Snapshots e sessões
+    # ==========================================================================
+    def latest_snapshot(self):
+        linhas = self.query("SELECT especialidades FROM snapshots ORDER BY id DESC LIMIT 1")
+        return json.loads(linhas[0][0]) if linhas else None
+
+    def save_snapshot(self, especialidades, taken_at=None, conn=None):
+        params = ((taken_at or datetime.now()).isoformat(), json.dumps(sorted(especialidades), ensure_ascii=False))
+        sql = "INSERT INTO snapshots (taken_at, especialidades) VALUES (?, ?)"
+        if conn is not None:
+            conn.execute(sql, params)
+        else:
+            with self.transaction() as c:
+                c.execute(sql, params)
+
+    def latest_session(self):
+        linhas = self.query("SELECT login_at, saved_at, cookies FROM sessions ORDER BY id DESC LIMIT 1")
+        if not linhas: return None
+        login_at, saved_at, cookies = linhas[0]
+        return {"login_at": login_at, "saved_at": saved_at, "cookies": json.loads(cookies)}
+
+    def save_session(self, cookies, login_at=None, saved_at=None, conn=None):
+        params = (login_at, saved_at or datetime.now().isoformat(), json.dumps(list(cookies), ensure_ascii=False))
+        sql = "INSERT INTO sessions (login_at, saved_at, cookies) VALUES (?, ?, ?)"
+        if conn is not None:
+            conn.execute(sql, params)
+        else:
+            with self.transaction() as c:
+                c.execute(sql, params)
+
+    def subscribers(self):
+        linhas = self.query("SELECT chat_id, targets FROM subscribers ORDER BY created_at")
+        return {chat_id: json.loads(targets) for chat_id, targets in linhas}
+
+    def save_subscriber(self, chat_id, targets):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO subscribers (chat_id, targets, created_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (chat_id) DO UPDATE SET targets = excluded.targets",
+                (str(chat_id), json.dumps(list(targets), ensure_ascii=False), datetime.now().isoformat()),
+            )
+
+    def delete_subscriber(self, chat_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM subscribers WHERE chat_id = ?", (str(chat_id),))
+
+    # ==========================================================================
+    # Migração dos arquivos antigos
+    # ==========================================================================
+    def import_legacy(self, data_dir):
+        """Importa (uma única vez por origem) os CSVs e JSONs que o banco substitui."""
+        data_dir = Path(data_dir)
+        ja = {row[0] for row in self.query("SELECT origem FROM imports")}
+
+        def importar(origem, carregar):
+            if origem in ja: return
+            with self.transaction() as conn:
+                linhas = carregar(conn)
+                if linhas is None: return  # arquivo ausente: tenta de novo na próxima abertura
+                conn.execute(
+                    "INSERT INTO imports (origem, imported_at, linhas) VALUES (?, ?, ?)",
+                    (origem, datetime.now().isoformat(), linhas),
+                )
+            if linhas:
+                log.info(f"Migração: {linhas} registro(s) importado(s) de {origem}.")
+
+        def historico(conn):
+            csv_journal = EventJournal(path=data_dir / "history.csv", archive_dir=data_dir / "history")
+            if not csv_journal.path.exists() and not csv_journal.archives(): return None
+            total = 0
+            lote = []
+            for e in csv_journal.iter_events():
+                lote.append(e)
+                if len(lote) >= 1000:
+                    total += self.insert_events(lote, origem="history.csv", conn=conn)
+                    lote = []
+            return total + self.insert_events(lote, origem="history.csv", conn=conn)
+
+        def legado(conn):
+            path = data_dir / LEGACY_CSV
+            if not path.exists(): return None
+            with open(path, newline="", encoding="utf-8") as f:
+                eventos = [e for e in _read_rows(f) if e.evento in JOURNAL_EVENTS]
+            return self.insert_events(eventos, origem=LEGACY_CSV, conn=conn)
+
+        def snapshot(conn):
+            data = _load_with_backup(data_dir / "last_snapshot.json")
+            if data is None: return None
+            try: quando = datetime.fromisoformat(data.get("timestamp") or "")
+            except ValueError: quando = None
+            self.save_snapshot(data.get("especialidades", []), taken_at=quando, conn=conn)
+            return 1
+
+        def cookies(conn):
+            data = CookieStore(data_dir / "hu_cookies.json")._read()
+            if not data: return None
+            self.save_session(data["cookies"], login_at=data.get("login_at"), saved_at=data.get("saved_at"), conn=conn)
+            return 1
+
+        for origem, carregar in (("history.csv", historico), (LEGACY_CSV, legado),
+                                 ("last_snapshot.json", snapshot), ("hu_cookies.json", cookies)):
+            try:
+                importar(origem, carregar)
+            except Exception as e:
+                log.warning(f"Migração de {origem} falhou ({e}); o arquivo continua intacto.")
+
+
+class SQLiteJournal(EventJournal):
+    """EventJournal gravando na tabela events. Sem rotação: as consultas usam o índice."""
+
+    def __init__(self, db):
+        super().__init__(path=db.path, archive_dir=db.path.parent)
+        self.db = db
+
+    def _write(self, lote):
+        self.db.insert_events(lote)
+
+    def rotate(self, now=None):
+        self._month = (now or datetime.now()).strftime("%Y-%m")
+        return 0
+
+    def archives(self):
+        return []
+
+    def iter_events(self, since=None, until=None, evento=None):
+        return self.db.iter_events(since=since, until=until, evento=evento)
+
+
+class DBCookieStore(CookieStore):
+    """CookieStore na tabela sessions (uma linha por gravação; a última vale)."""
+
+    def __init__(self, db):
+        super().__init__(db.path.with_name("hu_cookies.json"))
+        self.db = db
+
+    def _read(self):
+        return self.db.latest_session()
+
+    def save(self, cookies, login=False):
+        anterior = self._read() or {}
+        agora = datetime.now().isoformat()
+        self.db.save_session(cookies, login_at=agora if login else anterior.get("login_at"), saved_at=agora)
+
+
+def open_storage(config, data_dir=DATA_DIR):
+    """
+    (db, journal, cookie_store) conforme `journal.backend` do config.yaml:
+    sqlite (padrão, com migração automática) ou csv (arquivos antigos, db=None).
+    """
+    opts = (config or {}).get("journal", {}) or {}
+    data_dir = Path(data_dir)
+    backend = opts.get("backend", "sqlite")
+    if backend not in BACKENDS:
+        raise ValueError(f"journal.backend inválido: {backend!r} (use {', '.join(BACKENDS)})")
+    if backend == "csv":
+        journal = EventJournal.from_config(config or {}, path=data_dir / "history.csv", archive_dir=data_dir / "history")
+        return None, journal, CookieStore(data_dir / "hu_cookies.json")
+
+    db = Database(data_dir / DB_NAME, synchronous=SYNCHRONOUS.get(opts.get("fsync", "batch"), "NORMAL"))
+    db.import_legacy(data_dir)
+    return db, SQLiteJournal(db), DBCookieStore(db)
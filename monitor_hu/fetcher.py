@@ -0,0 +1,168 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: fetcher.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (HTTP Fast Path Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Motor de coleta leve baseado em requests. Reaproveita os cookies da sessão
+    autenticada pelo Selenium para ler o <select id="Especialidade"> direto do
+    HTML da página reshu/paciente, sem recarregar o Chrome a cada ciclo.
+    Quando o servidor rejeita a sessão, levanta SessionRejected para que o
+    monitor devolva o controle ao fluxo de login manual do HUParser.
+===============================================================================
+"""
+
+import threading
+import time
+from html.parser import HTMLParser
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .logger import get_logger
+from .parser import DropdownSnapshot, hu_url
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/122.0 Safari/537.36"
+)
+
+log = get_logger("Fetcher")
+
+
+class SessionRejected(Exception):
+    """O servidor não devolveu a página de especialidades (sessão expirada ou kickback)."""
+
+
+class EspecialidadeHTMLParser(HTMLParser):
+    """Extrai as opções do <select id="Especialidade"> em uma única passada."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = False
+        self.login_form = False
+        self.options = []
+        self._in_select = False
+        self._current = None
+        self._attrs = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "select" and attrs.get("id") == "Especialidade":
+            self.found = True
+            self._in_select = True
+        elif tag == "option" and self._in_select:
+            # </option> é opcional no HTML, então fechamos a anterior aqui
+            self._close_option()
+            self._current = []
+            self._attrs = attrs
+        elif tag == "input" and attrs.get("id") == "PacienteMatricula":
+            self.login_form = True
+
+    def handle_endtag(self, tag):
+        if not self._in_select: return
+        if tag == "option":
+            self._close_option()
+        elif tag == "select":
+            self._close_option()
+            self._in_select = False
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current.append(data)
+
+    def _close_option(self):
+        if self._current is not None:
+            texto = " ".join("".join(self._current).split())
+            # Sem atributo value o navegador usa o próprio texto, igual ao option.value do DOM
+            valor = self._attrs.get("value")
+            self.options.append((texto, texto if valor is None else valor, "disabled" in self._attrs))
+            self._current = None
+
+
+def parse_options(html):
+    """Devolve (encontrou_select, pagina_de_login, opcoes) para um HTML da página do paciente."""
+    parser = EspecialidadeHTMLParser()
+    parser.feed(html)
+    parser.close()
+    return parser.found, parser.login_form, parser.options
+
+
+class HTTPFetcher:
+    def __init__(self, url=None, cookies=None, timeout=10, verify_ssl=False, pool_size=2):
+        self.url = url or hu_url()
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Loop principal e keepalive da sessão compartilham a conexão
+        self.lock = threading.Lock()
+        self.last_ok = time.monotonic()
+
+        # Pool pequeno e persistente: uma conexão keep-alive reaproveitada a cada ciclo
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT})
+
+        # O Chrome roda com --ignore-certificate-errors; mantemos o mesmo comportamento aqui
+        self.session.verify = verify_ssl
+        if not verify_ssl:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        if cookies:
+            self.load_cookies(cookies)
+
+    def load_cookies(self, cookies):
+        """Semeia a sessão com os cookies no formato do Selenium (lista de dicts)."""
+        self.session.cookies.clear()
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+                secure=cookie.get("secure", False),
+                expires=cookie.get("expiry"),
+            )
+        log.info(f"Sessão HTTP semeada com {len(cookies)} cookies.")
+
+    def export_cookies(self):
+        """Cookies atuais da sessão HTTP no formato do Selenium (inclui os renovados pelo servidor)."""
+        cookies = []
+        for c in self.session.cookies:
+            cookie = {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "secure": c.secure}
+            if c.expires: cookie["expiry"] = c.expires
+            cookies.append(cookie)
+        return cookies
+
+    def fetch_html(self):
+        with self.lock, metrics.timed("http_fetch"):
+            resp = self.session.get(self.url, timeout=self.timeout)
+        if resp.status_code in (401, 403):
+            raise SessionRejected(f"HTTP {resp.status_code}")
+        # Erros 5xx sobem como HTTPError: o monitor trata como "site indisponível"
+        resp.raise_for_status()
+        return resp.text
+
+    def extract_dropdown(self):
+        """Mesmo contrato do HUParser.extract_dropdown, mas via HTTP puro."""
+        html = self.fetch_html()
+        with metrics.timed("parse"):
+            found, login_form, options = parse_options(html)
+        if not found:
+            motivo = "formulário de login" if login_form else "select ausente"
+            raise SessionRejected(motivo)
+        self.last_ok = time.monotonic()
+        return DropdownSnapshot(options)
+
+    def get_dropdown_options(self):
+        return self.extract_dropdown().especialidades
+
+    def close(self):
+        try: self.session.close()
+        except Exception: pass
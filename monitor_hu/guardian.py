@@ -1,62 +1,226 @@
 import os
+import signal
 import subprocess
 import sys
 import time
 from datetime import datetime
 from .notifier import send_telegram
+from .scheduler import get_scheduler
+from .state import DATA_DIR, read_json, atomic_write_json
 
 MAX_CRASHES = 5
 CRASH_WINDOW_SECONDS = 60
 INITIAL_BACKOFF = 5
 MAX_BACKOFF = 300
+HEARTBEAT_FILE = DATA_DIR / "heartbeat.json"
+RESTART_METRICS_FILE = DATA_DIR / "restart_metrics.json"
+RESTART_SAMPLES = 100
+WAIT_SLICE = 5  # segundos entre leituras do heartbeat enquanto espera o processo
+
+# Códigos de saída manual (Ctrl+C ou fechamento de janela)
+MANUAL_EXIT_CODES = (0, 3221225786, -1073741510)
+
+GUARDIAN_DEFAULTS = {
+    "stall_grace_seconds": 60,     # atraso tolerado além do expires_at do heartbeat
+    "startup_grace_seconds": 300,  # tempo até o primeiro heartbeat de um monitor novo
+    "stop_timeout_seconds": 20,    # espera após o sinal suave antes de matar o processo
+    "standby": True,               # mantém um monitor reserva aquecido para promoção imediata
+}
+# Windows: o monitor roda no próprio grupo de processos e o sinal suave é CTRL_BREAK
+# (SIGINT não é entregável a outro processo lá); o monitor o trata como Ctrl+C
+if os.name == "nt":
+    SOFT_STOP_SIGNAL = signal.CTRL_BREAK_EVENT
+    POPEN_FLAGS = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    SOFT_STOP_SIGNAL = signal.SIGINT
+    POPEN_FLAGS = {}
+
+
+def load_guardian_config():
+    try:
+        cfg = get_scheduler().config.get("guardian", {}) or {}
+    except Exception:
+        cfg = {}
+    return {**GUARDIAN_DEFAULTS, **cfg}
+
+
+def start_monitor(standby=False):
+    cmd = [sys.executable, "-m", "monitor_hu.monitor"]
+    if standby:
+        # O reserva fica bloqueado lendo a entrada padrão até receber "promote"
+        return subprocess.Popen(cmd + ["--standby"], stdin=subprocess.PIPE, text=True, **POPEN_FLAGS)
+    return subprocess.Popen(cmd, **POPEN_FLAGS)
+
+
+def promote(standby):
+    """Acorda o monitor reserva. Devolve o processo promovido ou None se ele não serve mais."""
+    if standby is None or standby.poll() is not None:
+        return None
+    try:
+        standby.stdin.write("promote\n")
+        standby.stdin.flush()
+    except OSError:
+        return None
+    return standby
+
+
+def stop_standby(standby):
+    if standby is None or standby.poll() is not None: return
+    try:
+        standby.stdin.close()  # EOF: o reserva sai sozinho
+        standby.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        standby.kill()
+
+
+def read_heartbeat(monitor):
+    """Heartbeat do processo `monitor`; None se ausente ou de outro PID (processo anterior)."""
+    hb = read_json(HEARTBEAT_FILE)
+    if not isinstance(hb, dict) or hb.get("pid") != monitor.pid:
+        return None
+    return hb
+
+
+def record_restart(modo, segundos):
+    """Acrescenta uma amostra de tempo até a primeira verificação após uma queda."""
+    dados = read_json(RESTART_METRICS_FILE)
+    amostras = dados.get("samples", []) if isinstance(dados, dict) else []
+    amostras.append({"at": datetime.now().isoformat(), "mode": modo, "seconds": round(segundos, 3)})
+    amostras = amostras[-RESTART_SAMPLES:]
+    por_modo = sorted(a["seconds"] for a in amostras if a["mode"] == modo)
+    try:
+        atomic_write_json(RESTART_METRICS_FILE, {"samples": amostras})
+    except OSError:
+        pass
+    return por_modo[len(por_modo) // 2]
+
+
+def check_health(hb, started_at, cfg):
+    """Classifica o monitor vivo pelo heartbeat: ("ok" | "captcha" | "stalled", detalhe)."""
+    agora = datetime.now()
+    if hb is None:
+        if (agora - started_at).total_seconds() > cfg["startup_grace_seconds"]:
+            return "stalled", "nenhum heartbeat desde o início"
+        return "ok", "iniciando"
 
-def start_monitor():
-    return subprocess.Popen([sys.executable, "-m", "monitor_hu.monitor"])
+    try:
+        expires_at = datetime.fromisoformat(hb["expires_at"])
+    except (KeyError, TypeError, ValueError):
+        return "ok", hb.get("status", "?")
+    atraso = (agora - expires_at).total_seconds()
+    if atraso > cfg["stall_grace_seconds"]:
+        return "stalled", f"status '{hb.get('status')}' atrasado {atraso:.0f}s além do previsto"
+    if hb.get("status") == "captcha":
+        return "captcha", "aguardando CAPTCHA"
+    return "ok", hb.get("status", "?")
+
+
+def stop_monitor(monitor, timeout):
+    """Sinal suave (Ctrl+C: o monitor fecha o Chrome e entrega alertas), depois terminate, depois kill."""
+    etapas = [(lambda: monitor.send_signal(SOFT_STOP_SIGNAL), timeout), (monitor.terminate, 5), (monitor.kill, 5)]
+    for acao, espera in etapas:
+        try:
+            acao()
+            return monitor.wait(timeout=espera)
+        except subprocess.TimeoutExpired:
+            continue
+        except OSError:
+            break
+    return monitor.poll()
 
 def main():
     print("🛡️ Guardian iniciado.")
     send_telegram("🟢 Guardian iniciado.")
 
+    cfg = load_guardian_config()
     crash_times = []
     backoff = INITIAL_BACKOFF
     monitor = None
+    standby = None
     manual_exit = False 
 
     try:
         monitor = start_monitor()
+        started_at = datetime.now()
+        captcha_avisado = False
+        queda = None  # (instante da queda, modo do restart) até a 1ª verificação do substituto
 
         while True:
-            retcode = monitor.poll()
-
-            if retcode is not None:
-                # Códigos de saída manual (Ctrl+C ou fechamento de janela)
-                if retcode == 0 or retcode == 3221225786 or retcode == -1073741510:
-                    manual_exit = True
-                    break
-
-                now = datetime.now()
-                crash_times.append(now)
-
-                crash_times = [
-                    t for t in crash_times
-                    if (now - t).total_seconds() <= CRASH_WINDOW_SECONDS
-                ]
-
-                if len(crash_times) >= MAX_CRASHES:
-                    send_telegram("🚨 ALERTA CRÍTICO 🚨\nCrash loop detectado. Monitor interrompido.")
-                    print("\n🚨 Crash loop detectado. Encerrando o Guardian.")
-                    break
-
-                # MODIFICAÇÃO AQUI: Informando o código do erro
-                alerta_msg = f"🔴 Monitor caiu inesperadamente (Código: {retcode}). Reiniciando em {backoff}s..."
+            # Espera pela saída do processo; a cada fatia confere o heartbeat
+            travado = False
+            try:
+                retcode = monitor.wait(timeout=WAIT_SLICE)
+            except subprocess.TimeoutExpired:
+                hb = read_heartbeat(monitor)
+                if hb and hb.get("first_check_at"):
+                    if queda:
+                        caido_em, modo = queda
+                        segundos = (datetime.fromisoformat(hb["first_check_at"]) - caido_em).total_seconds()
+                        mediana = record_restart(modo, segundos)
+                        msg = f"✅ Monitor de volta: 1ª verificação {segundos:.1f}s após a queda ({modo}; mediana {mediana:.1f}s)."
+                        print(msg)
+                        send_telegram(msg)
+                        queda = None
+                    # Reserva só sobe depois da 1ª verificação do ativo, para não disputar CPU com ela
+                    if cfg["standby"] and (standby is None or standby.poll() is not None):
+                        standby = start_monitor(standby=True)
+
+                estado, detalhe = check_health(hb, started_at, cfg)
+                if estado == "captcha":
+                    if not captcha_avisado:
+                        send_telegram("⏳ Monitor aguardando resolução do CAPTCHA (não está travado).")
+                        captcha_avisado = True
+                    continue
+                captcha_avisado = False
+                if estado == "ok":
+                    if detalhe == "running": backoff = INITIAL_BACKOFF
+                    continue
+
+                alerta_msg = f"🟠 Monitor travado ({detalhe}). Encerrando e reiniciando..."
+                print(alerta_msg)
+                send_telegram(alerta_msg)
+                retcode = stop_monitor(monitor, cfg["stop_timeout_seconds"])
+                travado = True
+
+            if not travado and retcode in MANUAL_EXIT_CODES:
+                manual_exit = True
+                break
+
+            now = datetime.now()
+            queda = queda or (now, None)
+            crash_times.append(now)
+
+            crash_times = [
+                t for t in crash_times
+                if (now - t).total_seconds() <= CRASH_WINDOW_SECONDS
+            ]
+
+            if len(crash_times) >= MAX_CRASHES:
+                send_telegram("🚨 ALERTA CRÍTICO 🚨\nCrash loop detectado. Monitor interrompido.")
+                print("\n🚨 Crash loop detectado. Encerrando o Guardian.")
+                break
+
+            # Com reserva aquecido a troca é imediata; sem ele, reinício a frio com backoff
+            promovido = promote(standby)
+            standby = None
+
+            # MODIFICAÇÃO AQUI: Informando o código do erro
+            if not travado:
+                destino = "Promovendo o reserva" if promovido else f"Reiniciando em {backoff}s..."
+                alerta_msg = f"🔴 Monitor caiu inesperadamente (Código: {retcode}). {destino}"
                 print(f"{alerta_msg}")
                 send_telegram(alerta_msg)
 
+            if promovido:
+                monitor = promovido
+                queda = (queda[0], "standby")
+            else:
                 time.sleep(backoff)
                 backoff = min(backoff * 2, MAX_BACKOFF)
                 monitor = start_monitor()
-
-            time.sleep(2)
+                queda = (queda[0], "frio")
+            started_at = datetime.now()
+            captcha_avisado = False
 
     except KeyboardInterrupt:
         manual_exit = True
@@ -64,12 +228,17 @@ def main():
         # Isso quebra as coordenadas do terminal para o Rich (processo filho) limpar a tela.
 
     finally:
+        stop_standby(standby)
         if monitor and monitor.poll() is None:
-            try:
-                # Dá 3 segundos para a TUI encolher e sumir em paz
-                monitor.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                monitor.terminate()
+            if os.name == "nt":
+                # Em outro grupo de processos o Ctrl+C do console não chega ao monitor
+                stop_monitor(monitor, 10)
+            else:
+                try:
+                    # Dá 3 segundos para a TUI encolher e sumir em paz
+                    monitor.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    monitor.terminate()
         
         # Agora sim, com a TUI já apagada, o Guardian pode imprimir a mensagem de saída
         if manual_exit:
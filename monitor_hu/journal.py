@@ -0,0 +1,189 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: journal.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Event Journal Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Diário de eventos (added/removed) do monitor. Todos os eventos de um ciclo
+    são gravados em uma única escrita no history.csv, com política de fsync
+    configurável. Meses antigos são compactados em data/history/*.csv.gz e a
+    leitura é sempre em streaming (arquivos antigos + arquivo ativo), sem
+    carregar o histórico inteiro na memória.
+===============================================================================
+"""
+
+import csv
+import gzip
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from .logger import get_logger
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+CSV_FILE = DATA_DIR / "history.csv"
+ARCHIVE_DIR = DATA_DIR / "history"
+HEADER = ["Data_Hora", "Evento", "Especialidade"]
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+FSYNC_POLICIES = ("none", "batch", "interval")
+
+Event = namedtuple("Event", ["data_hora", "evento", "especialidade"])
+
+log = get_logger("Journal")
+
+
+def _month_key(ts):
+    return ts.strftime("%Y-%m")
+
+
+def _months_back(ts, n):
+    """Chave 'AAAA-MM' de n meses antes de ts."""
+    idx = ts.year * 12 + ts.month - 1 - n
+    return f"{idx // 12:04d}-{idx % 12 + 1:02d}"
+
+
+def _read_rows(f):
+    for row in csv.reader(f):
+        if len(row) < 3 or row[0] == HEADER[0]: continue
+        try:
+            yield Event(datetime.strptime(row[0], TS_FORMAT), row[1], row[2])
+        except ValueError:
+            continue
+
+
+class EventJournal:
+    def __init__(self, path=CSV_FILE, archive_dir=ARCHIVE_DIR, fsync="batch", fsync_interval=60, keep_months=2):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync inválida: {fsync!r} (use {', '.join(FSYNC_POLICIES)})")
+        self.path = Path(path)
+        self.archive_dir = Path(archive_dir)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.keep_months = keep_months
+        self._last_fsync = 0.0
+        self._month = None
+        self._listeners = []
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        opts = config.get("journal", {}) or {}
+        return cls(
+            fsync=opts.get("fsync", "batch"),
+            fsync_interval=opts.get("fsync_interval", 60),
+            keep_months=opts.get("keep_months", 2),
+            **kwargs,
+        )
+
+    def add_listener(self, callback):
+        """Registra uma função chamada com a lista de eventos após cada gravação."""
+        self._listeners.append(callback)
+
+    # ==========================================================================
+    # Escrita
+    # ==========================================================================
+    def append(self, eventos, now=None):
+        """Grava todos os eventos do ciclo de uma vez. `eventos` = [(evento, especialidade), ...]."""
+        if not eventos: return True
+        now = now or datetime.now()
+        if self._month != _month_key(now):
+            self.rotate(now)
+
+        lote = [e if isinstance(e, Event) else Event(now, e[0], e[1]) for e in eventos]
+        try:
+            self._write(lote)
+        except Exception as e:
+            log.error(f"Falha ao gravar {len(lote)} eventos no histórico: {e}")
+            return False
+
+        for callback in self._listeners:
+            try:
+                callback(lote)
+            except Exception as e:
+                log.warning(f"Listener do histórico falhou: {e}")
+        return True
+
+    def _write(self, lote):
+        novo = not self.path.exists() or self.path.stat().st_size == 0
+        with open(self.path, mode="a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if novo: writer.writerow(HEADER)
+            writer.writerows([e.data_hora.strftime(TS_FORMAT), e.evento, e.especialidade] for e in lote)
+            f.flush()
+            if self._should_fsync():
+                os.fsync(f.fileno())
+
+    def _should_fsync(self):
+        if self.fsync == "batch": return True
+        if self.fsync == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._last_fsync = time.monotonic()
+            return True
+        return False
+
+    # ==========================================================================
+    # Rotação / compactação
+    # ==========================================================================
+    def rotate(self, now=None):
+        """Move os meses fora da janela `keep_months` para data/history/historico-AAAA-MM.csv.gz."""
+        now = now or datetime.now()
+        self._month = _month_key(now)
+        if not self.path.exists(): return 0
+
+        limite = _months_back(now, max(self.keep_months - 1, 0))
+        with open(self.path, newline="", encoding="utf-8") as f:
+            antigos = [e for e in _read_rows(f) if _month_key(e.data_hora) < limite]
+        if not antigos: return 0
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        por_mes = {}
+        for e in antigos:
+            por_mes.setdefault(_month_key(e.data_hora), []).append(e)
+        for mes, eventos in por_mes.items():
+            # 'at' acrescenta um novo membro gzip; o leitor trata o arquivo como um só fluxo
+            with gzip.open(self.archive_dir / f"historico-{mes}.csv.gz", "at", newline="", encoding="utf-8") as gz:
+                csv.writer(gz).writerows([e.data_hora.strftime(TS_FORMAT), e.evento, e.especialidade] for e in eventos)
+
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(self.path, newline="", encoding="utf-8") as src, open(tmp, "w", newline="", encoding="utf-8") as dst:
+            writer = csv.writer(dst)
+            writer.writerow(HEADER)
+            writer.writerows(
+                [e.data_hora.strftime(TS_FORMAT), e.evento, e.especialidade]
+                for e in _read_rows(src) if _month_key(e.data_hora) >= limite
+            )
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp, self.path)
+        log.info(f"Histórico compactado: {len(antigos)} eventos em {len(por_mes)} arquivo(s) mensal(is).")
+        return len(antigos)
+
+    # ==========================================================================
+    # Leitura em streaming
+    # ==========================================================================
+    def archives(self):
+        return sorted(self.archive_dir.glob("historico-*.csv.gz"))
+
+    def iter_events(self, since=None, until=None, evento=None):
+        """Itera os eventos em ordem cronológica, dos arquivos compactados ao history.csv."""
+        fontes = []
+        for arquivo in self.archives():
+            mes = arquivo.name[len("historico-"):-len(".csv.gz")]
+            if since and mes < _month_key(since): continue
+            if until and mes > _month_key(until): continue
+            fontes.append((gzip.open, arquivo))
+        if self.path.exists():
+            fontes.append((open, self.path))
+
+        for abrir, arquivo in fontes:
+            with abrir(arquivo, "rt", newline="", encoding="utf-8") as f:
+                for e in _read_rows(f):
+                    if since and e.data_hora < since: continue
+                    if until and e.data_hora > until: continue
+                    if evento and e.evento != evento: continue
+                    yield e
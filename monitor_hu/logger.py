@@ -1,5 +1,31 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: logger.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Async Log Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Log assíncrono: os loggers só enfileiram o registro (QueueHandler, alguns
+    microssegundos) e uma thread de fundo (QueueListener) formata, grava e
+    rotaciona logs/monitor.log. Nenhum log.info do laço de verificação espera
+    pelo disco.
+    - Formato texto (padrão) ou JSON lines (`logging.format: json`), com os
+      campos estruturados passados em `extra=` (cycle, stage, duration_ms,
+      especialidades ...) como chaves próprias.
+    - Rotação por tamanho (max_mb/backup_count) ou por horário (`when`,
+      ex.: midnight), na seção `logging:` do config.yaml.
+===============================================================================
+"""
+
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -7,24 +33,136 @@ LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 LOG_FILE = LOG_DIR / "monitor.log"
 
+LOGGING_DEFAULTS = {
+    "format": "text",    # text | json (uma linha JSON por registro)
+    "level": "INFO",
+    "max_mb": 5,         # rotação por tamanho (0 = sem rotação)
+    "backup_count": 3,
+    "when": None,        # rotação por horário (midnight, H, D ...); tem precedência sobre max_mb
+}
+FORMATS = ("text", "json")
+
+# Atributos padrão do LogRecord: o que sobra veio de `extra=`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_queue = queue.SimpleQueue()
+_listener = None
+_level = LOGGING_DEFAULTS["level"]
+_names = set()
+
+
+def _extras(record):
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED}
+
+
+class TextFormatter(logging.Formatter):
+    """Formato de sempre; campos de `extra=` vão ao final como chave=valor."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s | [%(levelname)s] | %(name)s | %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+    def format(self, record):
+        linha = super().format(record)
+        extras = _extras(record)
+        if extras:
+            linha += " | " + " ".join(f"{k}={v}" for k, v in extras.items())
+        return linha
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, pronta para o coletor de logs."""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_extras(record),
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _FastQueueHandler(QueueHandler):
+    """
+    Só o mínimo na thread de quem loga: junta msg % args e a traceback (que
+    não sobrevive fora do except). A formatação fica para a thread de fundo.
+    """
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_handler = _FastQueueHandler(_queue)
+
+
+def _file_handler(opts):
+    if opts["when"]:
+        handler = TimedRotatingFileHandler(LOG_FILE, when=opts["when"], backupCount=opts["backup_count"], encoding='utf-8')
+    else:
+        handler = RotatingFileHandler(
+            LOG_FILE, maxBytes=int(opts["max_mb"] * 1024 * 1024), backupCount=opts["backup_count"], encoding='utf-8'
+        )
+    handler.setFormatter(JsonFormatter() if opts["format"] == "json" else TextFormatter())
+    return handler
+
+
+def shutdown():
+    """Grava o que ainda estiver na fila (chamado também no atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for h in _listener.handlers:
+            h.close()
+        _listener = None
+
+
+def _start(opts):
+    """(Re)inicia a thread de gravação; a anterior esvazia a fila antes de sair."""
+    global _listener
+    shutdown()
+    _listener = QueueListener(_queue, _file_handler(opts))
+    _listener.start()
+
+
+def configure(config=None):
+    """Aplica a seção `logging:` do config.yaml (formato, nível e rotação)."""
+    global _level
+    opts = {**LOGGING_DEFAULTS, **((config or {}).get("logging", {}) or {})}
+    if opts["format"] not in FORMATS:
+        raise ValueError(f"logging.format inválido: {opts['format']!r} (use {', '.join(FORMATS)})")
+    _level = opts["level"]
+    for name in _names:
+        logging.getLogger(name).setLevel(_level)
+    _start(opts)
+
+
+atexit.register(shutdown)
+
+
 def get_logger(module_name: str):
     logger = logging.getLogger(module_name)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(_level)
+    _names.add(module_name)
 
-    if not logger.handlers:
-        file_handler = RotatingFileHandler(
-            LOG_FILE, maxBytes=5*1024*1024, backupCount=3, encoding='utf-8'
-        )
-        formatter = logging.Formatter(
-            '%(asctime)s | [%(levelname)s] | %(name)s | %(message)s', 
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+    if _handler not in logger.handlers:
+        logger.addHandler(_handler)
+    if _listener is None:
+        _start(LOGGING_DEFAULTS)
 
     # Silencia logs externos ruidosos
     logging.getLogger("WDM").setLevel(logging.ERROR)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
     logging.getLogger("selenium").setLevel(logging.WARNING)
 
-    return logger
\ No newline at end of file
+    return logger
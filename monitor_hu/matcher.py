@@ -0,0 +1,142 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: matcher.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Sniper Matcher Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Filtro do modo sniper compilado uma única vez (a cada /add ou /remove).
+    - Normalização: sem acentos, maiúsculas e espaços colapsados, então
+      "Cirúrgica", "CIRURGICA" e "cirurgica  " são o mesmo texto.
+    - Regras: "CARDIO" (trecho do nome), curingas "*" e "?"
+      ("CIRURGIA*INFANTIL") e regras negativas com "-" ("-PEDIATRIA"), que
+      vencem qualquer alvo. A blacklist usa a mesma normalização.
+    - Todas as regras viram um autômato de Aho-Corasick: cada especialidade
+      nova é lida uma vez só, em tempo proporcional ao tamanho do nome e não
+      ao número de alvos. Regras com curinga entram pelo seu trecho literal
+      mais longo e só são confirmadas (regex) quando esse trecho aparece.
+===============================================================================
+"""
+
+import re
+import unicodedata
+from collections import deque
+
+NEGATIVE_PREFIXES = ("-", "!")
+_WILDCARDS = re.compile(r"([*?])")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Remove acentos, passa para maiúsculas e colapsa espaços."""
+    decomposto = unicodedata.normalize("NFKD", str(text))
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return _SPACES.sub(" ", sem_acento).strip().upper()
+
+
+class _Rule:
+    """Uma regra compilada: chave literal para o autômato e, com curinga, a regex de confirmação."""
+
+    __slots__ = ("text", "negative", "key", "regex")
+
+    def __init__(self, text, negative=False):
+        self.text = text
+        self.negative = negative
+        partes = _WILDCARDS.split(text)
+        literais = [p for p in partes if p and p not in "*?"]
+        self.key = max(literais, key=len) if literais else ""
+        if len(literais) == 1 and literais[0] == text:
+            self.regex = None
+        else:
+            traduzido = "".join(".*" if p == "*" else "." if p == "?" else re.escape(p) for p in partes if p)
+            self.regex = re.compile(traduzido)
+
+    def confirm(self, name):
+        return self.regex is None or self.regex.search(name) is not None
+
+
+class _Automaton:
+    """Aho-Corasick sobre as chaves literais das regras."""
+
+    def __init__(self, rules):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for rule in rules:
+            estado = 0
+            for c in rule.key:
+                proximo = self.goto[estado].get(c)
+                if proximo is None:
+                    proximo = len(self.goto)
+                    self.goto[estado][c] = proximo
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                estado = proximo
+            self.out[estado].append(rule)
+
+        # Links de falha em largura; as saídas do sufixo são herdadas
+        fila = deque(self.goto[0].values())
+        while fila:
+            estado = fila.popleft()
+            for c, proximo in self.goto[estado].items():
+                fila.append(proximo)
+                f = self.fail[estado]
+                while f and c not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[proximo] = self.goto[f].get(c, 0)
+                self.out[proximo] = self.out[proximo] + self.out[self.fail[proximo]]
+
+    def scan(self, text):
+        """Regras cujas chaves aparecem no texto (cada regra uma vez)."""
+        encontradas = {}
+        estado = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for c in text:
+            while estado and c not in goto[estado]:
+                estado = fail[estado]
+            estado = goto[estado].get(c, 0)
+            for rule in out[estado]:
+                encontradas[id(rule)] = rule
+        return encontradas.values()
+
+
+class Matcher:
+    """
+    Alvos e exclusões compilados. Sem alvos positivos vale o modo geral:
+    tudo que não cai na blacklist. Regras negativas valem nos dois modos.
+    """
+
+    def __init__(self, targets=(), blacklist=()):
+        self.targets = []
+        vistos = set()
+        for alvo in targets:
+            texto = normalize(alvo)
+            negativo = texto.startswith(NEGATIVE_PREFIXES)
+            if negativo:
+                texto = texto[1:].strip()
+            if not texto or (negativo, texto) in vistos: continue
+            vistos.add((negativo, texto))
+            self.targets.append(_Rule(texto, negative=negativo))
+
+        self.sniper = any(not r.negative for r in self.targets)
+        self.blacklist = [_Rule(normalize(b), negative=True) for b in blacklist if normalize(b)]
+        # No modo sniper a blacklist não se aplica (o alvo explícito vence)
+        regras = self.targets + ([] if self.sniper else self.blacklist)
+        self._always = [r for r in regras if not r.key]  # só curingas: confere em todo nome
+        self._automaton = _Automaton([r for r in regras if r.key])
+
+    def matches(self, name):
+        texto = normalize(name)
+        positivo = False
+        for rule in list(self._automaton.scan(texto)) + self._always:
+            if not rule.confirm(texto): continue
+            if rule.negative: return False
+            positivo = True
+        return positivo or not self.sniper
+
+    def filter(self, names):
+        return {n for n in names if self.matches(n)}
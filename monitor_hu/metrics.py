@@ -0,0 +1,257 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: metrics.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Metrics Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Instrumentação leve (sem dependências) do ciclo de monitoramento:
+    histogramas de latência por etapa, contadores de verificações, falhas,
+    relogins, notificações e polls do Telegram, e a idade da última
+    verificação bem-sucedida. Exposto no formato texto do Prometheus em um
+    endpoint HTTP local (127.0.0.1:<porta>/metrics) e/ou em um arquivo .prom
+    para o textfile collector do node_exporter.
+===============================================================================
+"""
+
+import bisect
+import http.server
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .logger import get_logger
+
+log = get_logger("Metrics")
+
+# Etapas de milissegundos (parse) a minutos (login com CAPTCHA)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _labels(names, values):
+    if not names: return ""
+    pares = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pares + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def render(self):
+        linhas = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            itens = sorted(self._values.items())
+        for chave, valor in itens:
+            linhas.append(f"{self.name}{_labels(self.label_names, chave)} {valor:g}")
+        return linhas
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        if not self.label_names:
+            self._values[()] = 0  # série exposta desde o início, mesmo zerada
+
+    def inc(self, amount=1, **labels):
+        chave = self._key(labels)
+        with self._lock:
+            self._values[chave] = self._values.get(chave, 0) + amount
+
+
+class Gauge(_Metric):
+    """Valor instantâneo; com `fn`, calculado na hora da coleta (ex.: idade da última verificação)."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), fn=None):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        if self.fn is not None:
+            valor = self.fn()
+            if valor is None: return []
+            with self._lock:
+                self._values[()] = valor
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        chave = self._key(labels)
+        with self._lock:
+            serie = self._values.get(chave)
+            if serie is None:
+                serie = self._values[chave] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                serie[0][i] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    def render(self):
+        linhas = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            itens = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        nomes = self.label_names + ("le",)
+        for chave, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, n in zip(self.buckets, contagens):
+                acumulado += n
+                linhas.append(f"{self.name}_bucket{_labels(nomes, chave + (f'{limite:g}',))} {acumulado}")
+            linhas.append(f"{self.name}_bucket{_labels(nomes, chave + ('+Inf',))} {total}")
+            linhas.append(f"{self.name}_sum{_labels(self.label_names, chave)} {soma:g}")
+            linhas.append(f"{self.name}_count{_labels(self.label_names, chave)} {total}")
+        return linhas
+
+
+REGISTRY = []
+
+
+# ==============================================================================
+# Métricas do monitor
+# ==============================================================================
+STAGE_SECONDS = Histogram(
+    "monitor_stage_seconds",
+    "Latência por etapa do ciclo (refresh, extract, http_fetch, parse, changes, journal, snapshot_write, heartbeat_write, tui, login, cycle).",
+    labels=("stage",),
+)
+CHECKS = Counter("monitor_checks_total", "Verificações do dropdown concluídas.", labels=("engine",))
+CHECK_FAILURES = Counter("monitor_check_failures_total", "Verificações que falharam (site fora do ar, erro de leitura).")
+RELOGINS = Counter("monitor_relogins_total", "Logins refeitos pelo navegador (cookies ou CAPTCHA).")
+NOTIFICATIONS = Counter("monitor_notifications_total", "Mensagens entregues ou descartadas por canal.", labels=("channel", "result"))
+NOTIFICATION_DELAY = Histogram(
+    "monitor_notification_delivery_seconds",
+    "Tempo entre enfileirar o alerta e o canal confirmar a entrega.",
+    labels=("channel",),
+)
+TELEGRAM_POLLS = Counter("monitor_telegram_polls_total", "Chamadas getUpdates ao Telegram.", labels=("result",))
+TELEGRAM_THROTTLED = Counter("monitor_telegram_throttled_total", "Respostas 429 (flood control) do Telegram.")
+OPENINGS = Counter("monitor_openings_total", "Especialidades novas detectadas (antes do filtro de alvos).")
+
+_last_success = None
+
+
+def mark_success():
+    """Registra uma verificação bem-sucedida (base do gauge de idade)."""
+    global _last_success
+    _last_success = time.time()
+
+
+LAST_SUCCESS = Gauge(
+    "monitor_last_success_timestamp_seconds",
+    "Instante (epoch) da última verificação bem-sucedida.",
+    fn=lambda: _last_success,
+)
+LAST_SUCCESS_AGE = Gauge(
+    "monitor_last_success_age_seconds",
+    "Segundos desde a última verificação bem-sucedida.",
+    fn=lambda: None if _last_success is None else time.time() - _last_success,
+)
+
+
+@contextmanager
+def timed(stage):
+    """`with metrics.timed("refresh"): ...` observa a duração em monitor_stage_seconds."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - inicio, stage=stage)
+
+
+def render():
+    linhas = []
+    for metrica in REGISTRY:
+        linhas.extend(metrica.render())
+    return "\n".join(linhas) + "\n"
+
+
+# ==============================================================================
+# Exposição
+# ==============================================================================
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        corpo = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class MetricsExporter:
+    """Endpoint HTTP local e/ou textfile, conforme a seção `metrics:` do config.yaml."""
+
+    def __init__(self, port=None, host="127.0.0.1", textfile=None):
+        self.port = port
+        self.host = host
+        self.textfile = Path(textfile) if textfile else None
+        self._server = None
+
+    @classmethod
+    def from_config(cls, config):
+        opts = config.get("metrics", {}) or {}
+        if not opts.get("enabled", False):
+            return None
+        return cls(port=opts.get("port"), host=opts.get("host", "127.0.0.1"), textfile=opts.get("textfile"))
+
+    def start(self):
+        if not self.port: return
+        try:
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            log.warning(f"Endpoint de métricas indisponível em {self.host}:{self.port}: {e}")
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        log.info(f"Métricas em http://{self.host}:{self._server.server_port}/metrics")
+
+    def write_textfile(self):
+        """Grava o .prom de forma atômica (o collector nunca lê um arquivo pela metade)."""
+        if not self.textfile: return
+        tmp = self.textfile.with_name(self.textfile.name + ".tmp")
+        try:
+            self.textfile.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(render(), encoding="utf-8")
+            tmp.replace(self.textfile)
+        except OSError as e:
+            log.warning(f"Falha ao gravar métricas em {self.textfile}: {e}")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
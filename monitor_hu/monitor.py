@@ -14,7 +14,7 @@ Descrição:
 Estrutura do Código:
     1. Imports e Configurações
     2. Gestão de Dados e Arquivos
-    3. Construção da Interface (TUI)
+    3. Interface (TUI): painel em tui.py, alimentado pelo serviço
     4. Comandos e Comunicação (Telegram)
     5. Motor Principal (Loop de Monitoramento)
 ===============================================================================
@@ -25,27 +25,28 @@ Estrutura do Código:
 # ==============================================================================
 import os
 import time
+import queue
+import signal
 import sys
-import csv
 import traceback
-import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Importações da TUI (Rich)
-from rich.console import Console, Group
-from rich.live import Live
-from rich.panel import Panel
-from rich.table import Table
-from rich.text import Text
-from rich import box
-
-# Imports locais
+# Imports locais (a TUI só importa o Rich ao subir o painel)
+from . import logger, metrics, screenshot
+from .tui import create_dashboard
 from .logger import get_logger
-from .parser import HUParser
-from .notifier import TelegramBot, send_email
+from .parser import BROWSER_DEFAULTS, BrowserBusy, HUParser, resolve_driver_path
+from .fetcher import HTTPFetcher, SessionRejected
+from .db import open_storage
+from .matcher import Matcher, normalize
+from .session import SessionManager
+from .analytics import AnalyticsIndex, format_duration
+from .control import ControlServer, LocalCommand
+from .notifier import RateLimiter, TelegramBot, NotificationDispatcher
+from .subscribers import SubscriberRegistry
 try:
     from . import state
     from . import scheduler
@@ -59,322 +60,759 @@ HU_USER = os.getenv("HU_USER")
 HU_DATA = os.getenv("HU_DATA")
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
-CSV_FILE = DATA_DIR / "history.csv"
+# Folga prometida ao Guardian além do intervalo: uma verificação (HTTP + relogin) cabe nela
+CHECK_BUDGET_SECONDS = 60
+# Com login em segundo plano aberto, a verificação que precisaria do navegador é refeita nesse prazo
+LOGIN_RETRY_SECONDS = 30
 DATA_DIR.mkdir(exist_ok=True)
 
-# Habilita suporte ANSI nativo (necessário para o Windows Terminal)
-os.system("")
-
-# Instâncias globais de logging e interface
-console = Console()
+# Instância global de logging
 log = get_logger("Monitor")
 
 
+def aguardar_promocao():
+    """Modo standby: bloqueia até o Guardian escrever "promote" na entrada padrão."""
+    for linha in sys.stdin:
+        if linha.strip() == "promote":
+            log.info("Standby promovido a monitor ativo.")
+            return True
+    # EOF: o Guardian que nos criou não existe mais
+    return False
+
+
+def montar_alertas(relevantes):
+    """Devolve (mensagem do Telegram, (assunto, corpo) do e-mail) para as vagas novas."""
+    msg_tg = "🟢 <b>NOVAS VAGAS:</b>\n" + "\n".join(f"• {n}" for n in relevantes)
+    msg_email = "O Monitor HU encontrou as seguintes vagas:\n\n" + "\n".join(f"- {n}" for n in relevantes)
+    return msg_tg, ("Monitor HU: Novas Vagas!", msg_email)
+
+
 class MonitorService:
-    def __init__(self):
+    def __init__(self, data_dir=DATA_DIR, headless=None, standby=False):
         # Controle de Estado Interno
-        self.bot = TelegramBot()
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.scheduler = scheduler.get_scheduler()
+        logger.configure(self.scheduler.config)
+        # Um único bot (e um único RateLimiter) para comandos e alertas
+        self.bot = TelegramBot(limiter=RateLimiter.from_config(self.scheduler.config))
+        self.dispatcher = NotificationDispatcher(
+            bot=self.bot, telegram_workers=(self.scheduler.config.get("telegram", {}) or {}).get("send_workers", 4),
+            on_blocked=self._chat_blocked,
+        )
+        # Armazenamento aberto em _open_storage (no standby, só depois da promoção)
+        self.standby = standby
+        self.db = self.journal = self.cookie_store = None
+        self.state = self.analytics = self.subscribers = None
         self.parser = None
+        self.fetcher = None
+        self.session = None
+        self.exporter = None
+        self.control = None
+        self._origin = None
+        # /print roda fora do laço principal: capturar e enviar nunca atrasa a próxima verificação
+        self.screenshot_opts = screenshot.options(self.scheduler.config)
+        self._printer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="print")
+        self._print_job = None
+        self._prefetched = None
+        self.release_browser = False
         self.paused = False
+        self.force_check = False
+        self.commands = queue.Queue()
         self.vagas_atuais = set()
+        self.last_digest = None
         self.inicio_sessao = datetime.now()
-        self.recent_history = []
-        self.live = None
+        self.first_check_at = None
+        self.cycle = 0
+        self.tui = create_dashboard(self.scheduler.config, headless=headless)
         
         # Filtros de Especialidades
         self.alvos = []
         self.blacklist = ["PEDIATRIA", "ODONTOLOGIA"]
+        self._compile_targets()
+        if not standby:
+            self._open_storage()
+
+    def _open_storage(self):
+        """Banco/diário, snapshot, índice de analytics e assinantes (migrações incluídas)."""
+        # SQLite (padrão) ou os CSV/JSON antigos, conforme journal.backend
+        self.db, self.journal, self.cookie_store = open_storage(self.scheduler.config, self.data_dir)
+        self.scheduler.use_journal(self.journal)
+        self.state = state.StateStore(data_dir=self.data_dir, db=self.db)
+        self.journal.add_listener(self._on_journal_events)
+        self.analytics = AnalyticsIndex(
+            self.journal, path=self.data_dir / "analytics_index.json", chart_dir=self.data_dir / "charts",
+        )
+        self.journal.add_listener(self.analytics.observe)
+        self.subscribers = SubscriberRegistry.from_config(
+            self.scheduler.config, self.data_dir, db=self.db, blacklist=self.blacklist,
+        )
 
     # ==========================================================================
     # 2. GESTÃO DE DADOS E ARQUIVOS (Log, CSV, Gráficos)
     # ==========================================================================
-    def _log_to_csv(self, evento, especialidade):
-        """Salva adições e remoções no history.csv para análises futuras."""
-        file_exists = CSV_FILE.exists()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        try:
-            with open(CSV_FILE, mode='a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                if not file_exists:
-                    writer.writerow(["Data_Hora", "Evento", "Especialidade"])
-                writer.writerow([timestamp, evento, especialidade])
-        except Exception:
-            pass
+    def _chat_blocked(self, chat_id):
+        """Dispatcher: o chat bloqueou o bot (403). Assinante deixa de receber alertas."""
+        if self.subscribers.unsubscribe(chat_id):
+            log.info(f"Assinante {chat_id} removido: o chat bloqueou o bot.")
+
+    def _on_journal_events(self, eventos):
+        """Listener do diário: alimenta o modelo adaptativo com as novas liberações."""
+        for e in eventos:
+            if e.evento == "added":
+                self.scheduler.observe_release(e.data_hora)
 
     def _gerar_grafico(self):
-        """Lê o history.csv e gera um gráfico de barras com horários de pico."""
+        """Devolve o gráfico de horários de pico, renderizado só quando o índice muda."""
         try:
-            if not CSV_FILE.exists(): return None
-            df = pd.read_csv(CSV_FILE)
-            df['Data_Hora'] = pd.to_datetime(df['Data_Hora'])
-            df_adds = df[df['Evento'] == 'added']
-            if len(df_adds) == 0: return "VAZIO"
-
-            df_adds['Hora'] = df_adds['Data_Hora'].dt.hour
-            contagem = df_adds['Hora'].value_counts().sort_index()
-
-            plt.figure(figsize=(10, 5))
-            contagem.plot(kind='bar', color='#2ecc71', edgecolor='black')
-            plt.title('Horários de Liberação de Vagas')
-            plt.xlabel('Hora do Dia')
-            plt.ylabel('Qtd Vagas')
-            plt.grid(axis='y', alpha=0.3)
-            
-            img_path = DATA_DIR / "relatorio_temp.png"
-            plt.savefig(img_path)
-            plt.close()
-            return str(img_path)
-        except Exception: 
+            return self.analytics.chart()
+        except Exception as e:
+            log.warning(f"Falha ao gerar gráfico: {e}")
             return None
 
+    def _compile_targets(self):
+        """Recompila o filtro do modo sniper; chamado só quando alvos/blacklist mudam."""
+        self.matcher = Matcher(self.alvos, self.blacklist)
+        self.tui.set_targets([r for r in self.matcher.targets if not r.negative])
+
     def _add_history(self, event_type, item):
         """Adiciona uma nova linha ao painel de 'Histórico Recente' da TUI."""
-        timestamp = datetime.now().strftime("%d/%m %H:%M")
-        if event_type == "added": icon = "[bold green]🟢[/bold green]"
-        elif event_type == "removed": icon = "[bold red]🔴[/bold red]"
-        else: icon = "[bold blue]ℹ️[/bold blue]"
-            
-        self.recent_history.insert(0, f"{icon} {timestamp}: {item}")
-        if len(self.recent_history) > 6: self.recent_history.pop()
+        self.tui.add_history(event_type, item)
+
+    def status_snapshot(self):
+        """Estado atual em formato de máquina (GET /status e stream do plano de controle)."""
+        proxima = None
+        if self.tui.deadline is not None:
+            proxima = datetime.now() + timedelta(seconds=max(0.0, self.tui.deadline - time.monotonic()))
+        restante = self.session.expires_in() if self.session else None
+        return {
+            "status": self.tui.status,
+            "paused": self.paused,
+            "vagas": sorted(self.vagas_atuais),
+            "last_check": self.tui.checked_at,
+            "next_check": proxima,
+            "cycle": self.cycle,
+            "first_check_at": self.first_check_at,
+            "uptime_seconds": round((datetime.now() - self.inicio_sessao).total_seconds()),
+            "engine": "http" if self.fetcher else "selenium",
+            "session_expires_in": None if restante is None else round(max(0, restante)),
+            "alvos": list(self.alvos),
+            "assinantes": len(self.subscribers),
+        }
+
+    def _publish_status(self):
+        if self.control:
+            self.control.publish("status", self.status_snapshot())
 
     # ==========================================================================
-    # 3. CONSTRUÇÃO DA INTERFACE (TUI - Rich Layout)
+    # 4. COMANDOS E COMUNICAÇÃO (Telegram)
     # ==========================================================================
-    def _build_layout(self, status="[bold green]✅ Conectado[/bold green]", next_check=0):
-        """Constrói e empacota todos os painéis visuais para o Live renderizar."""
-        now_str = datetime.now().strftime("%d/%m %H:%M:%S")
-        count = len(self.vagas_atuais)
-        mode = f"🎯 SNIPER ({len(self.alvos)})" if self.alvos else "🌐 GERAL"
-        
-        # 3.1 Cabeçalho
-        header_table = Table(box=None, show_header=False, expand=True)
-        header_table.add_column("Key", style="bold cyan")
-        header_table.add_column("Value")
-        header_table.add_row("Última verificação:", now_str)
-        header_table.add_row("Status:", status)
-        header_table.add_row("Modo:", mode)
-        p_header = Panel(header_table, title="[bold magenta]🏥 MONITOR HU-USP – Especialidades[/bold magenta]", border_style="magenta", box=box.HEAVY)
-
-        # 3.2 Lista de Vagas Detectadas
-        if count > 0:
-            vagas_text = Text()
-            lista = sorted(list(self.vagas_atuais))
-            for v in lista[:8]: vagas_text.append(f"• {v}\n", style="bold white")
-            if len(lista) > 8: vagas_text.append(f"... e mais {len(lista)-8} vagas", style="dim italic")
-            p_vagas = Panel(vagas_text, title=f"[bold green]VAGAS DETECTADAS ({count})[/bold green]", border_style="green", box=box.ROUNDED)
-        else:
-            p_vagas = Panel("[dim]Nenhuma vaga disponível no momento.[/dim]", title="[bold yellow]VAGAS DETECTADAS (0)[/bold yellow]", border_style="yellow", box=box.ROUNDED)
+    def handle_commands(self):
+        """Executa todos os comandos que o listener do Telegram já colocou na fila."""
+        while True:
+            try:
+                full_cmd, origin = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            self.execute_command(full_cmd, origin)
+
+    def execute_command(self, full_cmd, origin=None):
+        """
+        Interpreta um comando de texto (/status, /add ...) e executa a ação
+        correspondente. `origin` é o chat do Telegram que o enviou (None = dono)
+        ou um LocalCommand do plano de controle; as respostas voltam para ele.
+        """
+        local = isinstance(origin, LocalCommand)
+        log.info(f"Comando recebido: {full_cmd}" + (" (local)" if local else f" (chat {origin})" if origin else ""))
+        parts = full_cmd.split()
+        cmd = parts[0].lower()
+        args = parts[1:] if len(parts) > 1 else []
+
+        self._origin = origin
+        try:
+            # Outros chats: só os comandos de assinante, sempre sobre os próprios alvos
+            if not local and origin is not None and str(origin) != str(self.bot.chat_id):
+                self._subscriber_command(cmd, args, str(origin))
+            else:
+                self._owner_command(cmd, args)
+        finally:
+            self._origin = None
+            if local: origin.done.set()
 
-        # 3.3 Painel de Histórico
-        if self.recent_history:
-            hist_text = Text.from_markup("\n".join(self.recent_history))
+    def _reply(self, msg):
+        """Responde a quem mandou o comando em execução (chat do Telegram ou cliente local)."""
+        if isinstance(self._origin, LocalCommand):
+            self._origin.reply(msg)
         else:
-            hist_text = Text("- Nenhuma alteração registrada ainda", style="dim")
-        p_hist = Panel(hist_text, title="[bold blue]Histórico Recente[/bold blue]", border_style="blue", box=box.ROUNDED)
+            self.bot.send(msg, chat_id=self._origin)
 
-        # 3.4 Rodapé de Status
-        footer_text = ""
-        if next_check > 0:
-            footer_text = f"\n[cyan]💤 Próxima verificação em {next_check} minutos (Comandos ativos via Telegram...)[/cyan]"
-        elif "PAUSADO" in status:
-            footer_text = "\n[yellow]⏸️ Monitoramento PAUSADO. Aguardando /resume no Telegram...[/yellow]"
+    def _reply_photo(self, caption, path):
+        # O cliente local recebe só o aviso; a imagem vai para o chat do dono
+        if isinstance(self._origin, LocalCommand):
+            self.bot.send_photo(caption, path)
+            self._origin.reply(f"{caption}: enviado ao Telegram.")
+        else:
+            self.bot.send_photo(caption, path, chat_id=self._origin)
+
+    def _owner_command(self, cmd, args):
+        """Comandos do dono do bot (e do plano de controle local)."""
+        if cmd == "/ping": 
+            self._reply("🏓 Pong!")
+        elif cmd == "/status":
+            tempo = str(datetime.now() - self.inicio_sessao).split('.')[0]
+            msg = f"<b>STATUS MONITOR</b>\n⏱️ Uptime: {tempo}\n🔎 Vagas Visíveis: {len(self.vagas_atuais)}"
+            restante = self.session.expires_in() if self.session else None
+            if restante is not None:
+                msg += f"\n🔑 Sessão expira em: {max(0, restante) / 3600:.1f} h"
+            self._reply(msg)
+        elif cmd == "/list":
+            if not self.vagas_atuais: self._reply("ℹ️ Lista vazia.")
+            else: self._reply("📋 <b>VAGAS ATUAIS:</b>\n" + "\n".join(f"• {v}" for v in sorted(self.vagas_atuais)))
+        elif cmd == "/print":
+            if self._print_job and not self._print_job.done():
+                self._reply("⏳ Já existe um print em andamento.")
+                return
+            local = isinstance(self._origin, LocalCommand)
+            self._reply("📸 Tirando print..." + (" A imagem vai para o Telegram." if local else ""))
+            self._print_job = self._printer.submit(self._print, None if local else self._origin)
+        elif cmd == "/relatorio":
+            self._reply("📊 Gerando gráfico...")
+            path = self._gerar_grafico()
+            if path == "VAZIO": self._reply("ℹ️ Sem dados suficientes.")
+            elif path:
+                # O PNG fica em cache até o índice mudar; não apagamos após o envio
+                self._reply_photo("📈 Horários de Pico", path)
+            else: self._reply("❌ Erro ou sem arquivo CSV.")
+        elif cmd == "/pause":
+            self.paused = True
+            self._reply("⏸️ Pausado.")
+            self.tui.set_status("paused")
+            self._publish_status()
+        elif cmd == "/resume":
+            self.paused = False
+            self._reply("▶️ Retomado.")
+            self.tui.set_status("resuming")
+            self._publish_status()
+        elif cmd == "/alvos":
+            if not self.alvos: self._reply("🌐 Modo GERAL")
+            else: self._reply(f"🎯 <b>ALVOS ATUAIS:</b>\n" + "\n".join(self.alvos))
+        elif cmd == "/add":
+            if args:
+                novo = " ".join(args).upper()
+                if normalize(novo) not in {normalize(a) for a in self.alvos}:
+                    self.alvos.append(novo)
+                    self._compile_targets()
+                    self._reply(f"✅ Alvo adicionado: {novo}")
+            else: self._reply("⚠️ Use: /add NOME (aceita * e ?; -NOME exclui)")
+        elif cmd == "/remove":
+            if args:
+                nome = " ".join(args).upper()
+                self.alvos = [a for a in self.alvos if normalize(nome) not in normalize(a)]
+                self._compile_targets()
+                self._reply(f"🗑️ Removido: {nome}")
+            else: self._reply("⚠️ Use: /remove NOME")
+        elif cmd == "/login":
+            if not self.session:
+                self._reply("ℹ️ /login só está disponível no motor HTTP.")
+            elif self.session.relogin_async():
+                self._reply("🔑 Janela de login aberta. Resolva o CAPTCHA; o monitoramento continua com a sessão atual.")
+            else:
+                self._reply("⏳ Já existe um login em andamento.")
+        elif cmd == "/historico":
+            self._cmd_historico(args)
+        elif cmd == "/stats":
+            self._cmd_stats(args)
+        elif cmd == "/check":
+            self.force_check = True
+            self._reply("🔎 Verificação forçada.")
+        elif cmd == "/assinantes":
+            if not len(self.subscribers): self._reply("ℹ️ Nenhum assinante.")
+            else:
+                linhas = [f"• {c}: {', '.join(a) if a else 'modo geral'}" for c, a in self.subscribers]
+                self._reply(f"👥 <b>ASSINANTES ({len(self.subscribers)}):</b>\n" + "\n".join(linhas))
+        elif cmd == "/help":
+            self._reply("🤖 <b>COMANDOS:</b>\n/status\n/list\n/print\n/relatorio\n/add [NOME]\n/remove [NOME]\n/alvos\n/historico [NOME] [DIAS]\n/stats [NOME]\n/check\n/login\n/pause\n/resume\n/assinantes")
+
+    def _subscriber_command(self, cmd, args, chat_id):
+        """Comandos de um chat que não é o dono do bot: inscrição e alvos próprios."""
+        alvos = self.subscribers.get(chat_id)
+        if alvos is None:
+            if cmd != "/start": return
+            if not self.subscribers.can_subscribe(chat_id):
+                log.info(f"/start recusado para o chat {chat_id} (telegram.subscriptions fechado).")
+                return
+            self.subscribers.subscribe(chat_id)
+            self._reply("✅ Inscrito! Você recebe as vagas novas (modo geral).\nUse /add NOME para receber só as suas especialidades e /help para os comandos.")
+            return
 
-        return Group(p_header, p_vagas, p_hist, Text.from_markup(footer_text) if footer_text else Text(""))
+        if cmd == "/start":
+            self._reply("ℹ️ Você já está inscrito.")
+        elif cmd == "/stop":
+            self.subscribers.unsubscribe(chat_id)
+            self._reply("👋 Inscrição cancelada. Envie /start para voltar.")
+        elif cmd == "/ping":
+            self._reply("🏓 Pong!")
+        elif cmd == "/list":
+            if not self.vagas_atuais: self._reply("ℹ️ Lista vazia.")
+            else: self._reply("📋 <b>VAGAS ATUAIS:</b>\n" + "\n".join(f"• {v}" for v in sorted(self.vagas_atuais)))
+        elif cmd == "/alvos":
+            if not alvos: self._reply("🌐 Modo GERAL")
+            else: self._reply(f"🎯 <b>ALVOS ATUAIS:</b>\n" + "\n".join(alvos))
+        elif cmd == "/add":
+            if args:
+                novo = " ".join(args).upper()
+                if self.subscribers.add_target(chat_id, novo):
+                    self._reply(f"✅ Alvo adicionado: {novo}")
+                elif len(alvos) >= self.subscribers.max_targets:
+                    self._reply(f"⚠️ Limite de {self.subscribers.max_targets} alvos atingido.")
+            else: self._reply("⚠️ Use: /add NOME (aceita * e ?; -NOME exclui)")
+        elif cmd == "/remove":
+            if args:
+                nome = " ".join(args).upper()
+                self.subscribers.remove_target(chat_id, nome)
+                self._reply(f"🗑️ Removido: {nome}")
+            else: self._reply("⚠️ Use: /remove NOME")
+        elif cmd == "/historico":
+            self._cmd_historico(args)
+        elif cmd == "/stats":
+            self._cmd_stats(args)
+        elif cmd == "/help":
+            self._reply("🤖 <b>COMANDOS:</b>\n/list\n/add [NOME]\n/remove [NOME]\n/alvos\n/historico [NOME] [DIAS]\n/stats [NOME]\n/stop")
+
+    def _print(self, chat_id):
+        """Thread de prints: PNG em memória, recompressão e upload direto, sem arquivo temporário."""
+        try:
+            # Um relogin em segundo plano pode estar com o navegador aguardando o CAPTCHA
+            with self.parser.claim():
+                # No modo HTTP o Chrome pode estar fechado ou com a página antiga. Só com os
+                # cookies salvos: o print nunca abre o CAPTCHA (isso é papel do /login)
+                if self.fetcher and not self.parser.restore_session():
+                    self.bot.send("🔑 Sessão expirada: envie /login antes do /print.", chat_id=chat_id)
+                    return
+                png = self.parser.capture_screenshot(crop=self.screenshot_opts["crop"])
+                self._sync_http_session()
+            if not png:
+                self.bot.send("❌ Erro ao tirar print.", chat_id=chat_id)
+                return
+            foto = screenshot.encode(png, self.screenshot_opts["format"], self.screenshot_opts["quality"])
+            log.info(f"Print: {len(png) // 1024} KB em PNG, {len(foto.data) // 1024} KB enviados ({foto.mime}).")
+            if not self.bot.send_photo("📸 Screenshot", foto, chat_id=chat_id):
+                self.bot.send("❌ Falha ao enviar o print.", chat_id=chat_id)
+        except BrowserBusy:
+            self.bot.send("⏳ Navegador ocupado com o login. Tente novamente depois.", chat_id=chat_id)
+        except Exception as e:
+            log.warning(f"Falha ao tirar print: {e}")
+            self.bot.send("❌ Erro ao tirar print.", chat_id=chat_id)
+
+    def _cmd_historico(self, args):
+        """/historico NOME [DIAS]: aberturas recentes de uma especialidade (prefixo, sem acentos)."""
+        dias = 30
+        if len(args) > 1 and args[-1].isdigit():
+            dias, args = int(args[-1]), args[:-1]
+        if not args:
+            self._reply("⚠️ Use: /historico NOME [DIAS]")
+            return
+        nome = " ".join(args)
+        if self.db:
+            aberturas = self.db.openings(nome, days=dias)
+        else:
+            # Backend CSV: varredura do arquivo
+            chave = normalize(nome)
+            aberturas = [
+                e for e in self.journal.iter_events(since=datetime.now() - timedelta(days=dias), evento="added")
+                if normalize(e.especialidade).startswith(chave)
+            ]
+        if not aberturas:
+            self._reply(f"ℹ️ Nenhuma abertura de {nome.upper()} nos últimos {dias} dias.")
+            return
+        linhas = [f"• {e.data_hora.strftime('%d/%m %H:%M')} {e.especialidade}" for e in aberturas[-15:]]
+        extra = f"\n... e mais {len(aberturas) - 15}" if len(aberturas) > 15 else ""
+        self._reply(f"📜 <b>{nome.upper()}</b>: {len(aberturas)} abertura(s) em {dias} dias\n" + "\n".join(linhas) + extra)
+
+    def _cmd_stats(self, args):
+        """/stats [NOME]: quanto tempo as vagas ficam abertas, do índice em memória (sem reler o histórico)."""
+        def fmt(segundos):
+            return "-" if segundos is None else format_duration(segundos)
+
+        if not args:
+            geral = self.analytics.overall_stats()
+            if not geral["closed"]:
+                self._reply("ℹ️ Ainda não há vagas abertas e fechadas no histórico.")
+                return
+            linhas = []
+            ranking = sorted(
+                (self.analytics.specialty_stats(esp) for esp in self.analytics.durations),
+                key=lambda st: st["per_week"], reverse=True,
+            )
+            for st in ranking[:10]:
+                linhas.append(f"• {st['especialidade']}: {st['per_week']:.1f}/sem, mediana {fmt(st['median'])}")
+            self._reply(
+                f"📊 <b>DURAÇÃO DAS VAGAS</b> ({geral['closed']} fechadas)\n"
+                f"mín {fmt(geral['min'])} · mediana {fmt(geral['median'])} · p95 {fmt(geral['p95'])}\n\n"
+                + "\n".join(linhas),
+            )
+            return
 
-    # ==========================================================================
-    # 4. COMANDOS E COMUNICAÇÃO (Telegram)
-    # ==========================================================================
-    def handle_commands(self):
-        """Lê atualizações do Telegram e executa as ações correspondentes."""
-        comandos = self.bot.get_updates()
-        for full_cmd in comandos:
-            log.info(f"Comando recebido: {full_cmd}")
-            parts = full_cmd.split()
-            cmd = parts[0].lower()
-            args = parts[1:] if len(parts) > 1 else []
-            
-            if cmd == "/ping": 
-                self.bot.send("🏓 Pong!")
-            elif cmd == "/status":
-                tempo = str(datetime.now() - self.inicio_sessao).split('.')[0]
-                msg = f"<b>STATUS MONITOR</b>\n⏱️ Uptime: {tempo}\n🔎 Vagas Visíveis: {len(self.vagas_atuais)}"
-                self.bot.send(msg)
-            elif cmd == "/list":
-                if not self.vagas_atuais: self.bot.send("ℹ️ Lista vazia.")
-                else: self.bot.send("📋 <b>VAGAS ATUAIS:</b>\n" + "\n".join(f"• {v}" for v in sorted(self.vagas_atuais)))
-            elif cmd == "/print":
-                self.bot.send("📸 Tirando print...")
-                path = self.parser.take_screenshot("cmd_print.png")
-                if path:
-                    self.bot.send_photo("📸 Screenshot", path)
-                    try: os.remove(path)
-                    except: pass
-                else: self.bot.send("❌ Erro ao tirar print.")
-            elif cmd == "/relatorio":
-                self.bot.send("📊 Gerando gráfico...")
-                path = self._gerar_grafico()
-                if path == "VAZIO": self.bot.send("ℹ️ Sem dados suficientes.")
-                elif path:
-                    self.bot.send_photo("📈 Horários de Pico", path)
-                    try: os.remove(path)
-                    except: pass
-                else: self.bot.send("❌ Erro ou sem arquivo CSV.")
-            elif cmd == "/pause":
-                self.paused = True
-                self.bot.send("⏸️ Pausado.")
-                if self.live: self.live.update(self._build_layout(status="[bold yellow]⏸️ PAUSADO[/bold yellow]"))
-            elif cmd == "/resume":
-                self.paused = False
-                self.bot.send("▶️ Retomado.")
-                if self.live: self.live.update(self._build_layout(status="[bold green]✅ Retomando...[/bold green]"))
-            elif cmd == "/alvos":
-                if not self.alvos: self.bot.send("🌐 Modo GERAL")
-                else: self.bot.send(f"🎯 <b>ALVOS ATUAIS:</b>\n" + "\n".join(self.alvos))
-            elif cmd == "/add":
-                if args:
-                    novo = " ".join(args).upper()
-                    if novo not in self.alvos:
-                        self.alvos.append(novo)
-                        self.bot.send(f"✅ Alvo adicionado: {novo}")
-                else: self.bot.send("⚠️ Use: /add NOME")
-            elif cmd == "/remove":
-                if args:
-                    nome = " ".join(args).upper()
-                    self.alvos = [a for a in self.alvos if nome not in a]
-                    self.bot.send(f"🗑️ Removido: {nome}")
-                else: self.bot.send("⚠️ Use: /remove NOME")
-            elif cmd == "/help":
-                self.bot.send("🤖 <b>COMANDOS:</b>\n/status\n/list\n/print\n/relatorio\n/add [NOME]\n/remove [NOME]\n/alvos\n/pause\n/resume")
+        nome = " ".join(args)
+        encontradas = self.analytics.find(nome)
+        if not encontradas:
+            self._reply(f"ℹ️ {nome.upper()} não aparece no histórico.")
+            return
+        blocos = []
+        for esp in encontradas[:5]:
+            st = self.analytics.specialty_stats(esp)
+            bloco = (
+                f"📊 <b>{esp}</b>\n"
+                f"Aberturas: {st['openings']} ({st['per_week']:.1f}/semana)\n"
+                f"Duração: mín {fmt(st['min'])} · mediana {fmt(st['median'])} · p95 {fmt(st['p95'])} ({st['closed']} fechadas)"
+            )
+            if st["open_since"]:
+                bloco += f"\n🟢 Aberta desde {st['open_since'].strftime('%d/%m %H:%M')}"
+            blocos.append(bloco)
+        self._reply("\n\n".join(blocos))
 
     # ==========================================================================
     # 5. MOTOR PRINCIPAL (Loop e Scheduling)
     # ==========================================================================
-    def smart_sleep(self, minutes):
-        """Pausa a thread principal permitindo a checagem contínua do Telegram."""
-        seconds = minutes * 60
+    def _init_fetcher(self):
+        """Cria o motor HTTP (requests) semeado com os cookies do Selenium, se habilitado."""
+        fetch_cfg = self.scheduler.config.get("fetch", {}) or {}
+        if fetch_cfg.get("engine", "http") != "http":
+            log.info("Motor de coleta: Selenium (refresh do Chrome).")
+            return
+
+        self.release_browser = fetch_cfg.get("release_browser", True)
+        self.fetcher = HTTPFetcher(
+            timeout=fetch_cfg.get("timeout", 10),
+            verify_ssl=fetch_cfg.get("verify_ssl", False),
+        )
+        log.info("Motor de coleta: HTTP (Selenium apenas para login/CAPTCHA).")
+        self.session = SessionManager(
+            self.parser, self.fetcher,
+            notify=lambda msg: self.dispatcher.notify(telegram=msg),
+            release_browser=self.release_browser,
+            options=self.scheduler.config.get("session"),
+        )
+        self._sync_http_session()
+
+    def _sync_http_session(self):
+        """Passa os cookies do navegador para a sessão HTTP e libera o Chrome se configurado."""
+        if self.session:
+            self.session.sync()
+
+    def _try_fast_start(self):
+        """Tenta a primeira leitura só com os cookies salvos. O resultado é usado no 1º ciclo."""
+        if not self.fetcher or not self.fetcher.session.cookies:
+            return False
+        try:
+            self._prefetched = self.fetcher.extract_dropdown()
+        except Exception as e:
+            log.info(f"Cookies salvos não bastaram para o início rápido ({e}).")
+            return False
+        log.info("Início rápido: sessão restaurada via HTTP, sem abrir o navegador.")
+        return True
+
+    def _create_parser(self):
+        self.parser = HUParser(
+            HU_USER, HU_DATA,
+            store=self.cookie_store,
+            browser=self.scheduler.config.get("browser"),
+            on_status=self.state.heartbeat,
+        )
+        self._init_fetcher()
+
+    def warm_standby(self):
+        """
+        Standby do Guardian: paga imports e a resolução do chromedriver antes
+        de ser necessário e espera a promoção. Não toca no banco (migração,
+        índice de analytics), não grava heartbeat nem abre o navegador enquanto
+        o monitor ativo estiver vivo: isso tudo fica para depois da promoção.
+        """
+        log.info("Monitor em standby: aquecendo.")
+        browser = {**BROWSER_DEFAULTS, **(self.scheduler.config.get("browser") or {})}
+        try:
+            resolve_driver_path(browser["driver_path"])
+        except Exception as e:
+            log.warning(f"Standby não resolveu o chromedriver: {e}")
+        self.tui.preload()
+
+        if not aguardar_promocao():
+            return False
+        self._open_storage()
+        self.inicio_sessao = datetime.now()
+        return True
+
+    def _fetch_vagas(self):
+        """Lê o dropdown pelo caminho mais barato disponível."""
+        if self._prefetched is not None:
+            resultado, self._prefetched = self._prefetched, None
+            return resultado
+        if not self.fetcher:
+            with metrics.timed("refresh"):
+                self.parser.driver.refresh()
+            try:
+                return self.parser.extract_dropdown()
+            except Exception as e:
+                # Só o formulário de login pede relogin; página de erro do servidor é "site indisponível"
+                if self.parser.page_state() == "login":
+                    raise SessionRejected("formulário de login") from e
+                raise
+
+        try:
+            return self.fetcher.extract_dropdown()
+        except SessionRejected as e:
+            log.warning(f"Sessão HTTP rejeitada ({e}). Devolvendo controle ao Selenium.")
+            # Login em segundo plano esperando o CAPTCHA: adia em vez de bloquear o loop
+            with self.parser.claim():
+                self._add_history("system", "🔑 Sessão expirada. Refazendo login.")
+                self.session.relogin()
+            return self.fetcher.extract_dropdown()
+
+    def _process_changes(self):
+        """Compara as vagas atuais com o snapshot em memória e dispara alertas/registros."""
+        novas, removidas = self.state.diff(self.vagas_atuais)
+
+        if self.state.is_first_run:
+            if self.vagas_atuais:
+                self._add_history("system", f"Baseline criado: {len(self.vagas_atuais)} especialidades.")
+            self.state.commit(self.vagas_atuais)
+        else:
+            metrics.OPENINGS.inc(len(novas))
+            novas_relevantes = self.matcher.filter(novas)
+
+            if novas_relevantes:
+                log.info(f"VAGAS ENCONTRADAS: {novas_relevantes}")
+                msg_tg, email = montar_alertas(novas_relevantes)
+                # Apenas enfileira: o envio acontece nos workers do dispatcher
+                self.dispatcher.notify(telegram=msg_tg, email=email)
+
+                for n in novas_relevantes: self._add_history("added", f"{n} abriu")
+
+                sys.stdout.write('\a')
+                sys.stdout.flush()
+
+            # Assinantes: a mesma leitura, filtrada pelos alvos de cada um
+            for chat_id, vagas in self.subscribers.fan_out(novas).items():
+                self.dispatcher.notify(telegram=montar_alertas(vagas)[0], chat_id=chat_id)
+
+            # Todos os eventos do ciclo vão para o histórico em uma única escrita
+            with metrics.timed("journal"):
+                self.journal.append(
+                    [("added", n) for n in sorted(novas)] + [("removed", r) for r in sorted(removidas)]
+                )
+            for r in removidas:
+                self._add_history("removed", f"{r} fechou")
+
+            # Só toca o disco quando algo mudou (escrita atômica)
+            self.state.commit(self.vagas_atuais)
+
+    def _wait_command(self, timeout):
+        """Bloqueia até chegar um comando na fila (ou o timeout) e executa o que houver."""
+        try:
+            # Fatias de 1s mantêm o Ctrl+C responsivo; um comando acorda a espera na hora
+            full_cmd, origin = self.commands.get(timeout=max(0.0, min(timeout, 1.0)))
+        except queue.Empty:
+            return
+        self.execute_command(full_cmd, origin)
+        self.handle_commands()
+
+    def smart_sleep(self, seconds):
+        """Dorme até a próxima verificação, acordando na hora para /pause, /print, /check etc."""
         if self.paused:
-            if self.live: self.live.update(self._build_layout(status="[bold yellow]⏸️ PAUSADO[/bold yellow]"))
+            self.tui.set_status("paused")
             while self.paused:
-                self.handle_commands()
-                time.sleep(2)
+                self.state.heartbeat("paused")
+                self._wait_command(1.0)
             return
 
-        for _ in range(int(seconds)):
-            self.handle_commands()
+        deadline = time.monotonic() + seconds
+        while True:
+            restante = deadline - time.monotonic()
+            if restante <= 0: return
+            self._wait_command(restante)
+            self.tui.tick()
             if self.paused: return
-            time.sleep(1)
+            if self.force_check:
+                self.force_check = False
+                return
+
+    def check_once(self):
+        """
+        Uma verificação completa: leitura do dropdown (refazendo o login se
+        preciso), diff, alertas e diário. Levanta exceção se o site não
+        respondeu; o snapshot em memória fica intacto nesse caso.
+        """
+        inicio_ciclo = time.perf_counter()
+        try:
+            resultado = self._fetch_vagas()
+        except SessionRejected:
+            # Só sessão rejeitada volta ao navegador; timeout, conexão e 5xx sobem como
+            # "site indisponível" (sem abrir o Chrome a cada verificação durante uma queda)
+            with self.parser.claim():
+                metrics.RELOGINS.inc()
+                self.parser.ensure_logged()
+                resultado = self.parser.extract_dropdown()
+                self._sync_http_session()
+
+        metrics.CHECKS.inc(engine="http" if self.fetcher else "selenium")
+        metrics.mark_success()
+        if self.first_check_at is None:
+            self.first_check_at = datetime.now().isoformat()
+
+        # Página idêntica ao ciclo anterior (mesmo hash): nada a comparar
+        if resultado.digest != self.last_digest:
+            self.vagas_atuais = resultado.especialidades
+            with metrics.timed("changes"):
+                self._process_changes()
+            self.last_digest = resultado.digest
+        duracao = time.perf_counter() - inicio_ciclo
+        metrics.STAGE_SECONDS.observe(duracao, stage="cycle")
+        self.cycle += 1
+        log.info("Verificação concluída.", extra={
+            "cycle": self.cycle, "stage": "cycle", "duration_ms": round(duracao * 1000, 1),
+            "especialidades": len(self.vagas_atuais), "engine": "http" if self.fetcher else "selenium",
+        })
+        return resultado
 
     def run(self):
         """Inicia a automação, a TUI e o ciclo infinito de monitoramento."""
-        log.info("=== Iniciando MonitorService v3.1 (Organized Edition) ===")
-        try: self.bot.send("🚀 Monitor Iniciado (v3.1)")
-        except: pass
-
-        erro_critico = False # <--- 1. NOVA FLAG DE CONTROLE
+        erro_critico = False
+        em_standby = self.standby
 
         try:
-            self.parser = HUParser(HU_USER, HU_DATA)
-            self.parser.ensure_logged()
-
-            # APENAS UM ESPAÇO EM BRANCO (Sem cls para não apagar o histórico do terminal)
-            print("\n") 
-
-            with Live(self._build_layout(), console=console, screen=True, transient=True, refresh_per_second=4) as live:
-                self.live = live
+            # Ctrl+C durante o standby cai no mesmo encerramento silencioso
+            if self.standby and not self.warm_standby():
+                return
+            em_standby = False
+            log.info("=== Iniciando MonitorService v3.1 (Organized Edition) ===")
+            self.dispatcher.notify(telegram="🚀 Monitor Iniciado (v3.1)")
+            self.state.heartbeat("starting", force=True)
+            if self.parser is None:
+                self._create_parser()
+            # Caminho rápido de restart: com cookies válidos a primeira verificação
+            # sai via HTTP, sem abrir o Chrome nem importar o Selenium
+            if not self._try_fast_start():
+                self.parser.ensure_logged()
+                self._sync_http_session()
+            if self.session:
+                self.session.start()
+            self.bot.start_listener(self.commands)
+            self.control = ControlServer.from_config(self, self.scheduler.config)
+            if self.control:
+                self.journal.add_listener(self.control.on_journal_events)
+                self.control.start()
+            self.exporter = metrics.MetricsExporter.from_config(self.scheduler.config)
+            if self.exporter:
+                self.exporter.start()
+
+            self.tui.start()
+
+            while True:
+                if self.paused:
+                    self.smart_sleep(0)
+                    continue
 
-                while True:
-                    if self.paused:
-                        self.smart_sleep(0)
-                        continue
-                    
-                    state.update_heartbeat("running")
-
-                    try:
-                        self.parser.driver.refresh()
-                        self.vagas_atuais = self.parser.get_dropdown_options()
-                    except Exception:
-                        try:
-                            self.parser.ensure_logged()
-                            self.vagas_atuais = self.parser.get_dropdown_options()
-                        except Exception as e:
-                            # --- BLOCO DE PROTEÇÃO CONTRA SITE FORA DO AR ---
-                            log.warning(f"Falha ao validar a lista de vagas. Site caiu? Erro: {e}")
-                            self._add_history("system", "⚠️ Site indisponível. Mantendo cache.")
-                            
-                            minutos = scheduler.get_interval_minutes()
-                            self.live.update(self._build_layout(status="[bold red]⚠️ Erro no Site HU - Aguardando...[/bold red]", next_check=minutos))
-                            self.smart_sleep(minutos)
-                            continue # O 'continue' pula direto para o próximo ciclo do while, sem apagar o snapshot
-                            # ------------------------------------------------
-
-                    snapshot = state.load_snapshot()
-                    vagas_anteriores = set(snapshot.get("especialidades", []))
-                    is_first_run = snapshot.get("is_first_run", False)
-                    
-                    novas = self.vagas_atuais - vagas_anteriores
-                    removidas = vagas_anteriores - self.vagas_atuais
-
-                    if is_first_run:
-                        if self.vagas_atuais:
-                            self._add_history("system", f"Baseline criado: {len(self.vagas_atuais)} especialidades.")
-                        state.save_snapshot(list(self.vagas_atuais))
-                    else:
-                        if self.alvos:
-                            novas_relevantes = {v for v in novas if any(alvo in v.upper() for alvo in self.alvos)}
-                        else:
-                            novas_relevantes = {v for v in novas if v not in self.blacklist}
-
-                        if novas_relevantes:
-                            log.info(f"VAGAS ENCONTRADAS: {novas_relevantes}")
-                            msg_tg = "🟢 <b>NOVAS VAGAS:</b>\n" + "\n".join(f"• {n}" for n in novas_relevantes)
-                            self.bot.send(msg_tg)
-                            
-                            msg_email = "O Monitor HU encontrou as seguintes vagas:\n\n" + "\n".join(f"- {n}" for n in novas_relevantes)
-                            send_email("Monitor HU: Novas Vagas!", msg_email)
-
-                            for n in novas_relevantes: self._add_history("added", f"{n} abriu")
-                                
-                            sys.stdout.write('\a')
-                            sys.stdout.flush()
-                        
-                        for n in novas: self._log_to_csv("added", n)
-                        for r in removidas: 
-                            self._log_to_csv("removed", r)
-                            self._add_history("removed", f"{r} fechou")
-
-                        if novas or removidas:
-                            state.save_snapshot(list(self.vagas_atuais))
+                try:
+                    self.check_once()
+                except BrowserBusy:
+                    # O navegador está com o login em segundo plano: o loop segue vivo
+                    # (heartbeat em dia) e tenta de novo em instantes
+                    log.info("Sessão rejeitada com login em andamento; verificação adiada.")
+                    segundos = min(self.scheduler.interval_seconds(), LOGIN_RETRY_SECONDS)
+                    self.state.heartbeat(
+                        "relogin", expires_in=segundos + CHECK_BUDGET_SECONDS,
+                        first_check_at=self.first_check_at,
+                    )
+                    self.smart_sleep(segundos)
+                    continue
+                except Exception as e:
+                    # --- BLOCO DE PROTEÇÃO CONTRA SITE FORA DO AR ---
+                    log.warning(f"Falha ao validar a lista de vagas. Site caiu? Erro: {e}")
+                    self._add_history("system", "⚠️ Site indisponível. Mantendo cache.")
+                    metrics.CHECK_FAILURES.inc()
                     
-                    minutos = scheduler.get_interval_minutes()
-                    self.live.update(self._build_layout(status="[bold green]✅ Conectado[/bold green]", next_check=minutos))
-                    self.smart_sleep(minutos)
+                    segundos = self.scheduler.interval_seconds()
+                    self.state.heartbeat(
+                        "site_error", expires_in=segundos + CHECK_BUDGET_SECONDS,
+                        first_check_at=self.first_check_at,
+                    )
+                    if self.exporter: self.exporter.write_textfile()
+                    with metrics.timed("tui"):
+                        self.tui.set_status("site_error", next_check=segundos)
+                    self._publish_status()
+                    self.smart_sleep(segundos)
+                    continue # O 'continue' pula direto para o próximo ciclo do while, sem apagar o snapshot
+                    # ------------------------------------------------
+
+                segundos = self.scheduler.interval_seconds()
+                self.state.heartbeat(
+                    "running", expires_in=segundos + CHECK_BUDGET_SECONDS,
+                    first_check_at=self.first_check_at,
+                )
+                if self.exporter: self.exporter.write_textfile()
+                with metrics.timed("tui"):
+                    self.tui.set_vagas(self.vagas_atuais)
+                    self.tui.set_status("connected", next_check=segundos)
+                self._publish_status()
+                self.smart_sleep(segundos)
 
         except KeyboardInterrupt:
-            # Fechamento manual limpo via Ctrl+C
-            if self.live:
-                self.live.stop()
+            # Fechamento manual limpo via Ctrl+C (a tela é limpa no finally)
+            pass
         except Exception as e:
-            erro_critico = True # <--- 2. MARCA QUE HOUVE ERRO
+            erro_critico = True
             log.error(f"Erro fatal no Monitor: {e}", exc_info=True)
-            console.print_exception()
+            # Sai da tela alternativa sem limpar: o traceback precisa ficar visível
+            self.tui.stop(clear=False)
+            self.tui.print_exception()
             raise
         finally:
             # 3. LIMPEZA DA TELA VEM PRIMEIRO! (É rápido e garantido)
-            if not erro_critico:
-                # Código ANSI agressivo: Força a saída do buffer alternativo e limpa tudo
-                sys.stdout.write("\033[?1049l\033[2J\033[H") 
-                sys.stdout.flush()
-                os.system('cls' if os.name == 'nt' else 'clear') 
-            
-            # 4. FECHAMENTO DO SELENIUM DEPOIS (É demorado)
+            # (um standby nunca promovido não mexe no terminal que divide com o Guardian)
+            if not erro_critico and not em_standby:
+                self.tui.stop()
+
+            # 4. ENTREGA OS ALERTAS PENDENTES ANTES DE SAIR
+            self.bot.stop_listener()
+            self._printer.shutdown(wait=False)
+            if self.control:
+                self.control.stop()
+            if self.session:
+                self.session.stop()
+            if self.exporter:
+                self.exporter.stop()
+            self.dispatcher.close(timeout=10)
+
+            # 5. FECHAMENTO DO SELENIUM DEPOIS (É demorado)
+            if self.fetcher:
+                self.fetcher.close()
             if self.parser: 
                 try:
                     self.parser.close()
                 except:
                     pass
+            if self.db:
+                self.db.close()
 
 def main():
-    MonitorService().run()
+    # Windows: o Guardian pede o encerramento com CTRL_BREAK (ver guardian.stop_monitor);
+    # tratado como Ctrl+C, passa pelo mesmo encerramento limpo (Chrome fechado, alertas entregues)
+    if hasattr(signal, "SIGBREAK"):
+        signal.signal(signal.SIGBREAK, signal.default_int_handler)
+    # --standby: processo reserva do Guardian, promovido quando o ativo cai
+    standby = "--standby" in sys.argv[1:]
+    # --headless: sem TUI nem import do Rich (servidores); também via `tui.mode` no config.yaml
+    headless = True if "--headless" in sys.argv[1:] else None
+    # Com `accounts:` no config.yaml roda o pool multi-conta (sem TUI)
+    if scheduler.get_scheduler().config.get("accounts"):
+        from .pool import MonitorPool
+        try:
+            if standby and not aguardar_promocao(): return
+        except KeyboardInterrupt:
+            return
+        MonitorPool().run()
+    else:
+        MonitorService(headless=headless, standby=standby).run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,9 +1,18 @@
 import os
+import queue
+import threading
+import time
 import requests
 import smtplib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from email.message import EmailMessage
 from dotenv import load_dotenv
 
+from . import metrics
+from .logger import get_logger
+
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -12,6 +21,16 @@ EMAIL_CONTA = os.getenv("EMAIL_CONTA")
 EMAIL_SENHA = os.getenv("EMAIL_SENHA")
 EMAIL_DESTINO = os.getenv("EMAIL_DESTINO")
 
+TELEGRAM_MAX_CHARS = 4000  # limite da API é 4096; deixamos folga para o HTML
+LONG_POLL_TIMEOUT = 50     # segundos que o Telegram segura o getUpdates aberto
+# Limites da Bot API: ~30 mensagens/s no total e ~1/s por chat
+TELEGRAM_RATE_PER_SECOND = 25
+TELEGRAM_PER_CHAT_INTERVAL = 1.0
+TELEGRAM_429_RETRIES = 3
+
+log = get_logger("Notifier")
+
+
 def send_telegram(message: str):
     if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID: return
     try:
@@ -21,55 +40,459 @@ def send_telegram(message: str):
 def send_email(assunto: str, corpo: str):
     if not EMAIL_CONTA or not EMAIL_SENHA or not EMAIL_DESTINO:
         return
-    msg = EmailMessage()
-    msg.set_content(corpo)
-    msg['Subject'] = assunto
-    msg['From'] = EMAIL_CONTA
-    msg['To'] = EMAIL_DESTINO
     try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-            smtp.login(EMAIL_CONTA, EMAIL_SENHA)
-            smtp.send_message(msg)
+        _mailer.send(assunto, corpo)
     except Exception as e:
         print(f"Erro ao enviar e-mail: {e}")
 
+
+class SMTPMailer:
+    """Conexão SMTP persistente: faz login uma vez e mantém a sessão viva com NOOP."""
+
+    def __init__(self, host="smtp.gmail.com", port=465, keepalive=60):
+        self.host = host
+        self.port = port
+        self.keepalive_seconds = keepalive
+        self._smtp = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(EMAIL_CONTA and EMAIL_SENHA)
+
+    def _connect(self):
+        smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        smtp.login(EMAIL_CONTA, EMAIL_SENHA)
+        self._smtp = smtp
+        log.info("Conexão SMTP aberta.")
+
+    def _close(self):
+        if self._smtp is None: return
+        try: self._smtp.quit()
+        except Exception: pass
+        self._smtp = None
+
+    def send(self, assunto: str, corpo: str, destino=None):
+        msg = EmailMessage()
+        msg.set_content(corpo)
+        msg['Subject'] = assunto
+        msg['From'] = EMAIL_CONTA
+        msg['To'] = destino or EMAIL_DESTINO
+
+        with self._lock:
+            # Uma reconexão silenciosa: o servidor pode ter derrubado a sessão ociosa
+            for tentativa in range(2):
+                try:
+                    if self._smtp is None: self._connect()
+                    self._smtp.send_message(msg)
+                    self._last_used = time.monotonic()
+                    return
+                except (smtplib.SMTPServerDisconnected, OSError):
+                    self._close()
+                    if tentativa: raise
+
+    def keepalive(self):
+        """Envia NOOP se a conexão está ociosa há mais que o intervalo; fecha se o servidor não responder."""
+        with self._lock:
+            if self._smtp is None: return
+            if time.monotonic() - self._last_used < self.keepalive_seconds: return
+            try:
+                self._smtp.noop()
+                self._last_used = time.monotonic()
+            except Exception:
+                self._close()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+_mailer = SMTPMailer()
+
+
+class RateLimiter:
+    """
+    Agenda cada envio no primeiro instante livre do limite global e do limite
+    do chat (reserva sob lock, espera fora dele). Um 429 segura o chat pelo
+    retry_after informado pelo Telegram.
+    """
+
+    def __init__(self, per_second=TELEGRAM_RATE_PER_SECOND, per_chat_interval=TELEGRAM_PER_CHAT_INTERVAL):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self.per_chat_interval = per_chat_interval
+        self._lock = threading.Lock()
+        self._next_global = 0.0
+        self._next_chat = {}
+
+    @classmethod
+    def from_config(cls, config):
+        """Limites da seção `telegram:` do config.yaml."""
+        opts = (config or {}).get("telegram", {}) or {}
+        return cls(
+            per_second=opts.get("rate_per_second", TELEGRAM_RATE_PER_SECOND),
+            per_chat_interval=opts.get("per_chat_interval", TELEGRAM_PER_CHAT_INTERVAL),
+        )
+
+    def acquire(self, chat_id):
+        with self._lock:
+            agora = time.monotonic()
+            inicio = max(agora, self._next_global, self._next_chat.get(chat_id, 0.0))
+            self._next_global = inicio + self.interval
+            self._next_chat[chat_id] = inicio + self.per_chat_interval
+        if inicio > agora:
+            time.sleep(inicio - agora)
+
+    def hold(self, chat_id, seconds, everyone=False):
+        with self._lock:
+            ate = time.monotonic() + seconds
+            self._next_chat[chat_id] = max(self._next_chat.get(chat_id, 0.0), ate)
+            if everyone:
+                self._next_global = max(self._next_global, ate)
+
+
+class NotificationDispatcher:
+    """
+    Fila limitada + um worker por canal. O loop principal só enfileira (put_nowait);
+    os workers agrupam rajadas em uma única mensagem, reaproveitam conexões e
+    tentam novamente com backoff exponencial.
+    """
+    _STOP = object()
+    KEEPALIVE_TICK = 30  # segundos ociosos entre verificações de keepalive do SMTP
+
+    def __init__(self, bot=None, mailer=None, maxsize=1000, max_retries=4, backoff=2.0, coalesce_window=0.5,
+                 telegram_workers=4, on_blocked=None):
+        self.bot = bot or TelegramBot()
+        self.mailer = mailer or _mailer
+        # Chamado com o chat_id quando o Telegram responde 403 (bot bloqueado ou removido do grupo)
+        self.on_blocked = on_blocked
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.coalesce_window = coalesce_window
+        self.dropped = 0
+        # Fan-out para vários assinantes: envios a chats diferentes saem em paralelo,
+        # sempre dentro do RateLimiter do bot
+        self._senders = ThreadPoolExecutor(max_workers=telegram_workers, thread_name_prefix="telegram-send")
+        # Fila por chat: as mensagens de um chat saem em ordem, e um chat lento
+        # não segura a próxima rajada dos outros
+        self._chats = {}
+        self._chats_idle = threading.Condition()
+        self._queues = {
+            "telegram": queue.Queue(maxsize=maxsize),
+            "email": queue.Queue(maxsize=maxsize),
+        }
+        self._threads = []
+        for canal, q in self._queues.items():
+            t = threading.Thread(target=self._worker, args=(canal, q), name=f"notify-{canal}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def notify(self, telegram=None, email=None, chat_id=None, email_to=None):
+        """
+        Enfileira um alerta. `email` é uma tupla (assunto, corpo). Nunca bloqueia.
+        `chat_id`/`email_to` roteiam para outro destinatário (padrão: os do .env).
+        """
+        if telegram and self.bot.token:
+            self._put("telegram", (chat_id, telegram))
+        if email and self.mailer.configured and (email_to or EMAIL_DESTINO):
+            self._put("email", (email_to, email))
+
+    def _put(self, canal, item):
+        try:
+            # O instante de enfileiramento alimenta a métrica de atraso de entrega
+            self._queues[canal].put_nowait(item + (time.monotonic(),))
+        except queue.Full:
+            self.dropped += 1
+            metrics.NOTIFICATIONS.inc(channel=canal, result="dropped")
+            log.warning(f"Fila de notificações '{canal}' cheia. Alerta descartado.")
+
+    def _worker(self, canal, q):
+        while True:
+            try:
+                item = q.get(timeout=self.KEEPALIVE_TICK)
+            except queue.Empty:
+                if canal == "email": self.mailer.keepalive()
+                continue
+            if item is self._STOP:
+                q.task_done()
+                return
+
+            # Coalescência: tudo o que chegar dentro da janela vira uma única mensagem
+            lote = [item]
+            parar = False
+            deadline = time.monotonic() + self.coalesce_window
+            while True:
+                restante = deadline - time.monotonic()
+                if restante <= 0: break
+                try:
+                    proximo = q.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if proximo is self._STOP:
+                    parar = True
+                    break
+                lote.append(proximo)
+
+            # Agrupa por destinatário: cada um recebe uma única mensagem por rajada
+            por_destino = {}
+            for destino, conteudo, enfileirado in lote:
+                por_destino.setdefault(destino, ([], enfileirado))[0].append(conteudo)
+
+            try:
+                if canal == "telegram":
+                    for destino, (conteudos, desde) in por_destino.items():
+                        self._enqueue_chat(destino, conteudos, desde)
+                else:
+                    for destino, (conteudos, desde) in por_destino.items():
+                        assunto = conteudos[0][0]
+                        corpo = "\n\n----------\n\n".join(c for _, c in conteudos)
+                        self._deliver(canal, lambda d=destino: self.mailer.send(assunto, corpo, d) or True, desde)
+            finally:
+                for _ in range(len(lote) + parar):
+                    q.task_done()
+            if parar: return
+
+    def _enqueue_chat(self, destino, conteudos, desde):
+        with self._chats_idle:
+            pendentes = self._chats.setdefault(destino, deque())
+            pendentes.append((conteudos, desde))
+            if len(pendentes) > 1: return  # já há uma thread esvaziando a fila desse chat
+        self._senders.submit(self._drain_chat, destino)
+
+    def _drain_chat(self, destino):
+        while True:
+            with self._chats_idle:
+                pendentes = self._chats[destino]
+                conteudos, desde = pendentes[0]
+            try:
+                bloqueado = not self._send_telegram(destino, conteudos, desde)
+            except Exception as e:
+                log.error(f"Erro inesperado enviando ao chat {destino}: {e}")
+                bloqueado = False
+            with self._chats_idle:
+                pendentes.popleft()
+                if bloqueado:
+                    # O resto da fila desse chat também voltaria 403
+                    for _ in pendentes:
+                        metrics.NOTIFICATIONS.inc(channel="telegram", result="failed")
+                    pendentes.clear()
+                if not pendentes:
+                    del self._chats[destino]
+                    self._chats_idle.notify_all()
+                    return
+
+    def _send_telegram(self, destino, conteudos, desde):
+        """Envia as partes em ordem; devolve False se o chat bloqueou o bot (403)."""
+        for parte in self._chunks("\n\n".join(conteudos)):
+            status = []
+            if self._deliver("telegram", lambda p=parte: self._telegram_result(p, destino, status), desde) is not None:
+                continue
+            if status == [403]:
+                log.warning(f"Chat {destino} bloqueou o bot (403): mensagem descartada.")
+                if self.on_blocked:
+                    self.on_blocked(destino)
+                return False
+        return True
+
+    def _telegram_result(self, parte, destino, status):
+        codigo = self.bot.send(parte, chat_id=destino)
+        if codigo is None or codigo >= 500:
+            return False  # rede ou erro do servidor do Telegram: vale tentar de novo
+        if 200 <= codigo < 300:
+            return True
+        # 4xx não muda com outra tentativa (403 bloqueado, 400 chat inexistente;
+        # o 429 já foi esperado e repetido em TelegramBot._post)
+        status.append(codigo)
+        return None
+
+    def _deliver(self, canal, envio, desde=None):
+        """
+        `envio` devolve True (entregue), False (falha temporária: tenta de novo
+        com backoff) ou None (falha permanente: desiste na hora, devolve None).
+        """
+        espera = self.backoff
+        for tentativa in range(self.max_retries + 1):
+            try:
+                resultado = envio()
+                if resultado:
+                    metrics.NOTIFICATIONS.inc(channel=canal, result="sent")
+                    if desde is not None:
+                        metrics.NOTIFICATION_DELAY.observe(time.monotonic() - desde, channel=canal)
+                    return True
+                if resultado is None:
+                    metrics.NOTIFICATIONS.inc(channel=canal, result="failed")
+                    return None
+            except Exception as e:
+                log.warning(f"Falha ao enviar via {canal} (tentativa {tentativa + 1}): {e}")
+            if tentativa < self.max_retries:
+                time.sleep(espera)
+                espera *= 2
+        log.error(f"Notificação via {canal} descartada após {self.max_retries + 1} tentativas.")
+        metrics.NOTIFICATIONS.inc(channel=canal, result="failed")
+        return False
+
+    @staticmethod
+    def _chunks(texto):
+        linhas, atual = [], ""
+        for linha in texto.split("\n"):
+            if atual and len(atual) + len(linha) + 1 > TELEGRAM_MAX_CHARS:
+                linhas.append(atual)
+                atual = ""
+            atual = f"{atual}\n{linha}" if atual else linha
+        if atual: linhas.append(atual)
+        return linhas
+
+    def flush(self, timeout=10):
+        """Aguarda as filas esvaziarem (ou o timeout estourar). Devolve True se tudo foi entregue."""
+        deadline = time.monotonic() + timeout
+        for q in self._queues.values():
+            with q.all_tasks_done:
+                while q.unfinished_tasks:
+                    restante = deadline - time.monotonic()
+                    if restante <= 0: return False
+                    q.all_tasks_done.wait(restante)
+        # O worker do Telegram só repassa o lote: falta esperar as filas por chat
+        with self._chats_idle:
+            while self._chats:
+                restante = deadline - time.monotonic()
+                if restante <= 0: return False
+                self._chats_idle.wait(restante)
+        return True
+
+    def close(self, timeout=10):
+        """Flush no encerramento: entrega o que estiver pendente e encerra os workers."""
+        entregue = self.flush(timeout)
+        for q in self._queues.values():
+            try: q.put_nowait(self._STOP)
+            except queue.Full: pass
+        for t in self._threads:
+            t.join(timeout=1)
+        self._senders.shutdown(wait=False)
+        self.mailer.close()
+        if not entregue:
+            log.warning("Encerrando com notificações pendentes na fila.")
+        return entregue
+
+
+def _retry_after(resp):
+    try:
+        return float(resp.json().get("parameters", {}).get("retry_after", 1))
+    except Exception:
+        return 1.0
+
+
 class TelegramBot:
-    def __init__(self):
+    def __init__(self, limiter=None):
         self.token = TELEGRAM_TOKEN
         self.chat_id = TELEGRAM_CHAT_ID
         self.offset = 0
+        self.limiter = limiter or RateLimiter()
+        self._listener = None
+        self._stop = threading.Event()
+        # Sessões persistentes (uma por thread de envio): a conexão TLS com
+        # api.telegram.org é reaproveitada entre mensagens
+        self._local = threading.local()
 
-    def send(self, message: str, parse_mode="HTML"):
-        if not self.token: return
-        url = f"https://api.telegram.org/bot{self.token}/sendMessage"
-        payload = {"chat_id": self.chat_id, "text": message, "parse_mode": parse_mode}
-        try: requests.post(url, data=payload, timeout=10)
-        except Exception: pass
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return session
 
-    def send_photo(self, caption: str, file_path: str):
-        if not self.token: return
-        url = f"https://api.telegram.org/bot{self.token}/sendPhoto"
+    def _post(self, method, chat_id, **kwargs):
+        """POST na Bot API respeitando o RateLimiter; 429 espera o retry_after e tenta de novo."""
+        url = f"https://api.telegram.org/bot{self.token}/{method}"
+        for _ in range(TELEGRAM_429_RETRIES + 1):
+            self.limiter.acquire(chat_id)
+            resp = self.session.post(url, **kwargs)
+            if resp.status_code != 429:
+                return resp
+            espera = _retry_after(resp)
+            metrics.TELEGRAM_THROTTLED.inc()
+            log.warning(f"Telegram 429 para o chat {chat_id}: aguardando {espera:.0f}s.")
+            self.limiter.hold(chat_id, espera, everyone=espera > TELEGRAM_PER_CHAT_INTERVAL * 5)
+        return resp
+
+    def send(self, message: str, parse_mode="HTML", chat_id=None):
+        """Devolve o status HTTP da Bot API (None sem token ou se a requisição nem chegou lá)."""
+        if not self.token: return None
+        destino = chat_id or self.chat_id
+        payload = {"chat_id": destino, "text": message, "parse_mode": parse_mode}
         try:
-            with open(file_path, 'rb') as f:
-                requests.post(url, data={'chat_id': self.chat_id, 'caption': caption}, files={'photo': f}, timeout=20)
-        except Exception: pass
+            return self._post("sendMessage", destino, data=payload, timeout=10).status_code
+        except Exception:
+            return None
 
-    def get_updates(self):
+    def send_photo(self, caption: str, photo, chat_id=None):
+        """Envia uma imagem: Photo (bytes em memória, ver screenshot.py) ou caminho de arquivo."""
+        if not self.token: return False
+        destino = chat_id or self.chat_id
+        try:
+            if isinstance(photo, (str, os.PathLike)):
+                with open(photo, 'rb') as f:
+                    arquivo = (os.path.basename(photo), f.read())
+            else:
+                arquivo = (photo.filename, photo.data, photo.mime)
+            # Bytes (não um arquivo aberto): um novo envio após 429 manda o conteúdo inteiro de novo
+            resp = self._post("sendPhoto", destino, data={'chat_id': destino, 'caption': caption}, files={'photo': arquivo}, timeout=20)
+            return resp.ok
+        except Exception:
+            return False
+
+    def get_updates(self, timeout=1, session=None):
+        """Busca comandos pendentes. Com `timeout` alto vira long-poll no servidor do Telegram."""
         if not self.token: return []
         url = f"https://api.telegram.org/bot{self.token}/getUpdates"
-        params = {"offset": self.offset, "timeout": 1}
+        params = {"offset": self.offset, "timeout": timeout}
         try:
-            resp = requests.get(url, params=params, timeout=3)
+            resp = (session or self.session).get(url, params=params, timeout=timeout + 10)
             data = resp.json()
+            metrics.TELEGRAM_POLLS.inc(result="ok" if data.get("ok") else "error")
             if not data.get("ok"): return []
-            
+
+            # Comandos de qualquer chat, como (texto, chat_id): quem pode o quê é decidido pelo monitor
             valid_commands = []
             for update in data.get("result", []):
                 self.offset = update["update_id"] + 1
                 msg = update.get("message", {})
-                if str(msg.get("chat", {}).get("id")) == str(self.chat_id):
-                    text = msg.get("text", "").strip()
-                    if text.startswith("/"):
-                        valid_commands.append(text)
+                chat_id = msg.get("chat", {}).get("id")
+                text = msg.get("text", "").strip()
+                if chat_id is not None and text.startswith("/"):
+                    valid_commands.append((text, str(chat_id)))
             return valid_commands
-        except: return []
\ No newline at end of file
+        except:
+            metrics.TELEGRAM_POLLS.inc(result="error")
+            return []
+
+    def start_listener(self, sink, timeout=LONG_POLL_TIMEOUT):
+        """Sobe a thread de long-poll que empurra os comandos recebidos para a fila `sink`."""
+        if not self.token or self._listener: return
+        self._listener = threading.Thread(
+            target=self._listen, args=(sink, timeout), name="telegram-listener", daemon=True
+        )
+        self._listener.start()
+        log.info(f"Listener do Telegram iniciado (long-poll de {timeout}s).")
+
+    def stop_listener(self):
+        self._stop.set()
+
+    def _listen(self, sink, timeout):
+        # Sessão própria: requests.Session não deve ser compartilhada com a thread principal
+        session = requests.Session()
+        espera = 1
+        while not self._stop.is_set():
+            inicio = time.monotonic()
+            comandos = self.get_updates(timeout=timeout, session=session)
+            for cmd in comandos:
+                sink.put(cmd)
+
+            # Uma resposta vazia muito rápida indica erro de rede/API: evita martelar o servidor
+            if not comandos and time.monotonic() - inicio < 1:
+                self._stop.wait(espera)
+                espera = min(espera * 2, 60)
+            else:
+                espera = 1
+        session.close()
@@ -16,35 +16,223 @@ Descrição:
 
 import os
 import sys
+import json
 import time
-import pickle
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from pathlib import Path
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 
+from . import metrics
 from .logger import get_logger
+from .session import COOKIES_FILE, CookieStore
+
+# Selenium e webdriver_manager são importados sob demanda (dentro dos métodos):
+# no modo HTTP o monitor pode rodar sem nunca precisar deles, e cada restart
+# do Guardian deixa de pagar ~300 ms de import antes da primeira verificação.
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
-COOKIES_FILE = DATA_DIR / "hu_cookies.pkl"
-URL = "https://sistemashu.hu.usp.br/reshu/paciente"
+DRIVER_CACHE_FILE = DATA_DIR / "driver_path.json"
+DEFAULT_URL = "https://sistemashu.hu.usp.br/reshu/paciente"
+
+
+def hu_url():
+    """
+    HU_URL aponta o monitor para outro endereço (ex.: o site falso de
+    benchmarks/fake_hu.py). Lido na construção, não no import: assim vale
+    também quando vem do .env, carregado depois dos imports do pacote.
+    """
+    return os.getenv("HU_URL") or DEFAULT_URL
+
+
+# Perfil do navegador (seção `browser:` do config.yaml). Sem configuração, o
+# comportamento antigo: janela visível, carregando todos os recursos.
+BROWSER_DEFAULTS = {
+    "headless": False,             # headless fora do CAPTCHA; manual_login reabre com janela
+    "block_resources": False,      # bloqueia imagens/fontes/mídia/analytics via CDP
+    "blocked_urls": [
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+        "*.woff", "*.woff2", "*.ttf", "*.otf", "*.mp4", "*.webm", "*.mp3",
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    ],
+    "page_load_strategy": "normal",  # eager: devolve o controle no DOMContentLoaded
+    "window_size": "1080,624",
+    "window_position": "-1080,0",
+    "driver_path": None,           # chromedriver fixo; sem ele, cache em data/driver_path.json
+}
+
+# Recursos de fundo do Chrome que não servem para o monitor
+LEAN_ARGS = [
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-first-run",
+]
 
 log = get_logger("Parser")
 
+
+def resolve_driver_path(configured=None, refresh=False):
+    """
+    Caminho do chromedriver sem rede no caminho quente: usa `browser.driver_path`
+    do config ou o último caminho resolvido (data/driver_path.json). O
+    webdriver-manager (que consulta a internet) só roda na primeira vez ou com
+    refresh=True, quando o driver em cache não serviu para o Chrome instalado.
+    """
+    if configured:
+        return str(configured)
+    if not refresh:
+        try:
+            with open(DRIVER_CACHE_FILE, encoding="utf-8") as f:
+                path = json.load(f).get("path")
+            if path and os.path.exists(path):
+                return path
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    try:
+        with open(DRIVER_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"path": path}, f)
+    except OSError:
+        pass
+    log.info(f"Chromedriver resolvido via webdriver-manager: {path}")
+    return path
+
+
+def normalize_options(textos):
+    """Normaliza os textos do dropdown no mesmo formato usado pelo Select."""
+    opcoes = set()
+    for texto in textos:
+        texto = " ".join(texto.split()).upper()
+        if texto and "SELECIONE" not in texto:
+            opcoes.add(texto)
+    return opcoes
+
+
+class DropdownSnapshot:
+    """Conteúdo bruto do dropdown: lista de (texto, valor, desabilitado) e um hash do conjunto."""
+
+    def __init__(self, options):
+        self.options = list(options)
+        raw = "\n".join(f"{t}\x1f{v}\x1f{int(bool(d))}" for t, v, d in self.options)
+        self.digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @property
+    def especialidades(self):
+        return normalize_options(texto for texto, _, _ in self.options)
+
+
+# ==============================================================================
+# Estratégias de extração do dropdown
+# ==============================================================================
+class ExtractionStrategy(ABC):
+    """Interface: recebe o driver e devolve um DropdownSnapshot."""
+    name = "base"
+
+    @abstractmethod
+    def extract(self, driver):
+        ...
+
+
+class ScriptExtraction(ExtractionStrategy):
+    """Coleta textos, valores e estado 'disabled' em um único execute_script."""
+    name = "script"
+    JS = """
+        var sel = document.getElementById('Especialidade');
+        if (!sel) return null;
+        var out = [];
+        for (var i = 0; i < sel.options.length; i++) {
+            var o = sel.options[i];
+            out.push([o.text, o.value, o.disabled]);
+        }
+        return out;
+    """
+
+    def extract(self, driver):
+        from selenium.common.exceptions import NoSuchElementException
+
+        rows = driver.execute_script(self.JS)
+        if rows is None:
+            raise NoSuchElementException("Elemento 'Especialidade' não encontrado.")
+        return DropdownSnapshot((t, v, bool(d)) for t, v, d in rows)
+
+
+class SelectExtraction(ExtractionStrategy):
+    """Caminho antigo via Select: uma chamada WebDriver por atributo de cada opção."""
+    name = "select"
+
+    def extract(self, driver):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import Select
+
+        select_element = Select(driver.find_element(By.ID, "Especialidade"))
+        return DropdownSnapshot(
+            (o.text, o.get_attribute("value"), not o.is_enabled()) for o in select_element.options
+        )
+
+
+class BrowserBusy(Exception):
+    """Outra thread (login em segundo plano, /print) está com o navegador."""
+
+
 class HUParser:
-    def __init__(self, HU_USER, HU_DATA):
+    def __init__(self, HU_USER, HU_DATA, cookies_file=COOKIES_FILE, browser=None, url=None, on_status=None, store=None):
         self.HU_USER = HU_USER
         self.HU_DATA = HU_DATA
-        log.info("Inicializando WebDriver...")
-        self.driver = self._init_driver()
+        # Chamado com "captcha" enquanto o login espera intervenção humana (heartbeat do Guardian)
+        self.on_status = on_status
+        self.store = store or CookieStore(cookies_file)
+        self.cookies_file = self.store.path
+        # Um único dono do navegador por vez (loop principal, relogin em segundo plano, /print)
+        self.lock = threading.RLock()
+        self.url = url or hu_url()
+        self.browser = {**BROWSER_DEFAULTS, **(browser or {})}
+        self.headless = False  # modo do navegador aberto no momento
+        self._driver = None
+        # A primeira estratégia que funcionar vence; o Select fica como fallback
+        self.strategies = [ScriptExtraction(), SelectExtraction()]
 
-    def _init_driver(self):
+    @contextmanager
+    def claim(self):
+        """Lock do navegador sem espera: BrowserBusy se outra thread o detém (ex.: CAPTCHA em aberto)."""
+        if not self.lock.acquire(blocking=False):
+            raise BrowserBusy("navegador ocupado com outro login ou print")
+        try:
+            yield
+        finally:
+            self.lock.release()
+
+    @property
+    def driver(self):
+        # O Chrome só sobe quando alguém realmente precisa dele (login, CAPTCHA, print)
+        if self._driver is None:
+            log.info("Inicializando WebDriver...")
+            self._driver = self._init_driver(headless=self.browser["headless"])
+        return self._driver
+
+    @property
+    def browser_running(self):
+        return self._driver is not None
+
+    def _init_driver(self, headless=False):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        cfg = self.browser
         options = webdriver.ChromeOptions()
+        options.page_load_strategy = cfg["page_load_strategy"]
         options.add_argument("--ignore-certificate-errors")
         options.add_argument("--ignore-ssl-errors")
         options.add_argument("--disable-web-security")
@@ -55,48 +243,104 @@ class HUParser:
         options.add_experimental_option('useAutomationExtension', False)
 
         # Define o tamanho da janela (L x A) - 1080x624 é um retângulo vertical ótimo
-        options.add_argument("--window-size=1080,624") 
-        
-        # Como o Monitor 3 está à esquerda do principal, usamos um X negativo.
-        # -1080 vai empurrar a janela para dentro do Monitor 3.
-        options.add_argument("--window-position=-1080,0")
+        options.add_argument(f"--window-size={cfg['window_size']}")
+
+        if headless:
+            options.add_argument("--headless=new")
+        else:
+            # Como o Monitor 3 está à esquerda do principal, usamos um X negativo.
+            # -1080 vai empurrar a janela para dentro do Monitor 3.
+            options.add_argument(f"--window-position={cfg['window_position']}")
+        if cfg["headless"] or cfg["block_resources"]:
+            for arg in LEAN_ARGS:
+                options.add_argument(arg)
 
         try:
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
-            log.info("WebDriver iniciado com sucesso.")
-            return driver
+            try:
+                driver = webdriver.Chrome(service=Service(resolve_driver_path(cfg["driver_path"])), options=options)
+            except Exception as e:
+                if cfg["driver_path"]: raise
+                # Driver em cache incompatível (ex.: Chrome atualizou): resolve de novo, uma vez
+                log.warning(f"Chromedriver em cache falhou ({e}). Resolvendo novamente.")
+                driver = webdriver.Chrome(service=Service(resolve_driver_path(refresh=True)), options=options)
+            log.info(f"WebDriver iniciado com sucesso ({'headless' if headless else 'com janela'}).")
         except Exception as e:
             log.error(f"Falha ao iniciar WebDriver: {e}")
             raise
 
+        self.headless = headless
+        # Com janela (CAPTCHA) nada é bloqueado: a imagem do desafio precisa aparecer
+        if headless and cfg["block_resources"]:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(cfg["blocked_urls"])})
+            except Exception as e:
+                log.warning(f"Bloqueio de recursos indisponível: {e}")
+        return driver
+
+    def _report(self, status):
+        if self.on_status is None: return
+        try: self.on_status(status)
+        except Exception: pass
+
+    def _relaunch(self, headless):
+        """Troca o navegador aberto por outro no modo pedido (sessão segue pelos cookies)."""
+        self.close()
+        log.info(f"Reabrindo o navegador {'headless' if headless else 'com janela'}.")
+        self._driver = self._init_driver(headless=headless)
+
     def open(self):
-        self.driver.get(URL)
+        self.driver.get(self.url)
 
     def load_cookies(self):
-        if COOKIES_FILE.exists():
-            try:
-                with open(COOKIES_FILE, "rb") as f:
-                    cookies = pickle.load(f)
-                    for cookie in cookies:
-                        self.driver.add_cookie(cookie)
-                self.driver.refresh()
-                log.info("Cookies carregados.")
-                return True
-            except Exception:
-                return False
-        return False
+        cookies = self.store.load()
+        if not cookies: return False
+        try:
+            for cookie in cookies:
+                try: self.driver.add_cookie(cookie)
+                except Exception: pass  # cookie de outro domínio/expirado: os demais ainda servem
+            self.driver.refresh()
+            log.info("Cookies carregados.")
+            return True
+        except Exception:
+            return False
+
+    def get_cookies(self):
+        """Cookies da sessão atual: do navegador, se aberto, ou do arquivo salvo."""
+        if self._driver is not None:
+            try: return self._driver.get_cookies()
+            except Exception: pass
+        return self.store.load()
 
     def save_cookies(self):
         try:
-            with open(COOKIES_FILE, "wb") as f:
-                pickle.dump(self.driver.get_cookies(), f)
+            self.store.save(self.driver.get_cookies(), login=True)
             log.info("Sessão salva em cookies.")
         except Exception: pass
 
+    def page_state(self):
+        """Classifica a página aberta pelo HTML: "ok", "login" (kickback) ou None (ainda carregando)."""
+        from .fetcher import parse_options
+
+        try:
+            found, login_form, _ = parse_options(self.driver.page_source)
+        except Exception:
+            return None
+        if found: return "ok"
+        if login_form: return "login"
+        return None
+
     def manual_login(self):
         """Preenche o formulário e aguarda infinitamente pela resolução do CAPTCHA."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
         log.warning("Sessão perdida ou inicial. Iniciando login manual.")
+        if self._driver is None or self.headless:
+            # O CAPTCHA precisa de uma janela de verdade (e das imagens)
+            self._relaunch(headless=False)
+            self.open()
         wait = WebDriverWait(self.driver, 10)
         
         try:
@@ -124,6 +368,7 @@ class HUParser:
         # LOOP INFINITO: O cão de guarda da sessão
         log.warning("Aguardando intervenção humana no CAPTCHA...")
         while True:
+            self._report("captcha")
             try:
                 # Ele checa a cada 3 segundos se o menu 'Especialidade' finalmente carregou na tela
                 WebDriverWait(self.driver, 3).until(EC.presence_of_element_located((By.ID, "Especialidade")))
@@ -134,45 +379,87 @@ class HUParser:
                 # Se não carregou, ele simplesmente não faz nada e tenta de novo. Sem gerar erros.
                 time.sleep(1)
 
-    def ensure_logged(self):
-        self.open()
-        if self.load_cookies():
-            try:
-                # Se após carregar o cookie o menu de Especialidade aparecer rápido, a sessão está viva.
-                WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.ID, "Especialidade")))
+    def restore_session(self):
+        """Abre a página com os cookies salvos; True se a sessão estiver viva (nunca abre o CAPTCHA)."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        with self.lock:
+            self.open()
+            if not self.load_cookies(): return False
+            # O HTML já diz se a sessão está viva ou se caiu no formulário (kickback);
+            # a espera pelo select só acontece se a página ainda estiver carregando
+            estado = self.page_state()
+            if estado is None:
+                try:
+                    WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.ID, "Especialidade")))
+                    estado = "ok"
+                except Exception: pass
+            if estado == "ok":
                 log.info("Sessão restaurada com sucesso via cookies.")
+                return True
+            return False
+
+    def ensure_logged(self):
+        with self.lock, metrics.timed("login"):
+            if self.restore_session():
                 return
-            except Exception: pass
-            
-        # Se os cookies falharam ou não existem, entramos no modo de login blindado
-        log.warning("Necessário login manual ou resolução de Kickback.")
-        self.manual_login()
+
+            # Se os cookies falharam ou não existem, entramos no modo de login blindado
+            log.warning("Necessário login manual ou resolução de Kickback.")
+            self.manual_login()
+
+            # CAPTCHA resolvido: volta ao perfil enxuto levando a sessão pelos cookies
+            if self.browser["headless"] and not self.headless:
+                self._relaunch(headless=True)
+                self.open()
+                self.load_cookies()
+
+    def extract_dropdown(self):
+        # Se o site der erro do servidor, o elemento não existe e a NoSuchElementException
+        # sobe para o monitor.py, que trata como "Site Indisponível"
+        from selenium.common.exceptions import NoSuchElementException
+
+        erro = None
+        for strategy in self.strategies:
+            try:
+                with metrics.timed("extract"):
+                    return strategy.extract(self.driver)
+            except NoSuchElementException:
+                raise
+            except Exception as e:
+                log.warning(f"Estratégia de extração '{strategy.name}' falhou: {e}")
+                erro = e
+        raise erro
 
     def get_dropdown_options(self):
-        # Se o site der erro do servidor, esse By.ID vai falhar e gerar a exceção 
-        # que o monitor.py vai capturar como "Site Indisponível"
-        select_element = Select(self.driver.find_element(By.ID, "Especialidade"))
-        
-        opcoes = set()
-        for option in select_element.options:
-            texto = option.text.strip().upper()
-            if "SELECIONE" not in texto:
-                opcoes.add(texto)
-        
-        return opcoes
+        return self.extract_dropdown().especialidades
 
-    def take_screenshot(self, filename="screenshot.png"):
-        try:
+    def capture_screenshot(self, crop=False):
+        """PNG da página em memória (só o dropdown com crop=True); None se falhar."""
+        from selenium.webdriver.common.by import By
+
+        with self.lock:
             try:
-                self.driver.find_element(By.ID, "Especialidade").click()
-                time.sleep(0.5)
-            except: pass
-            path = DATA_DIR / filename
-            self.driver.save_screenshot(str(path))
-            return str(path)
-        except Exception:
-            return None
+                try:
+                    elemento = self.driver.find_element(By.ID, "Especialidade")
+                except Exception:
+                    elemento = None
+                if crop and elemento is not None:
+                    return elemento.screenshot_as_png
+                if elemento is not None:
+                    try:
+                        elemento.click()
+                        time.sleep(0.5)
+                    except Exception: pass
+                return self.driver.get_screenshot_as_png()
+            except Exception:
+                return None
 
     def close(self):
-        try: self.driver.quit()
-        except: pass
\ No newline at end of file
+        with self.lock:
+            if self._driver is None: return
+            try: self._driver.quit()
+            except: pass
+            self._driver = None
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: pool.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Multi-Account Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Monitoramento de várias contas do HU em um único processo. Cada conta tem
+    seu próprio navegador (só para login/CAPTCHA), sessão HTTP, cookies,
+    snapshot e histórico em data/accounts/<nome>/; agendador, dispatcher de
+    notificações e heartbeat são compartilhados. As verificações de um ciclo
+    rodam em paralelo num ThreadPoolExecutor com `pool.max_workers` threads.
+
+    Ativado quando o config.yaml tem a lista `accounts:`. Os comandos do
+    Telegram e a TUI continuam exclusivos do modo de conta única.
+===============================================================================
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+from . import logger, metrics
+from .db import open_storage
+from .fetcher import HTTPFetcher, SessionRejected
+from .logger import get_logger
+from .matcher import Matcher
+from .monitor import CHECK_BUDGET_SECONDS, montar_alertas
+from .notifier import NotificationDispatcher
+from .parser import HUParser
+from .scheduler import get_scheduler
+from .session import SessionManager
+from .state import StateStore
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+ACCOUNTS_DIR = DATA_DIR / "accounts"
+
+log = get_logger("Pool")
+
+# Chaves aceitas em cada item de `accounts:` (os parâmetros de Account)
+ACCOUNT_FIELDS = {"name", "user_env", "data_env", "telegram_chat_id", "email", "alvos", "blacklist"}
+
+
+class Account:
+    """Uma conta do config.yaml. Credenciais vêm do .env pelos nomes em user_env/data_env."""
+
+    def __init__(self, name, user_env="HU_USER", data_env="HU_DATA", telegram_chat_id=None,
+                 email=None, alvos=None, blacklist=None):
+        self.name = name
+        self.user = os.getenv(user_env)
+        self.data = os.getenv(data_env)
+        self.telegram_chat_id = str(telegram_chat_id) if telegram_chat_id else None
+        self.email = email
+        self.alvos = [a.upper() for a in (alvos or [])]
+        self.blacklist = list(blacklist if blacklist is not None else ["PEDIATRIA", "ODONTOLOGIA"])
+        self.matcher = Matcher(self.alvos, self.blacklist)
+        self.data_dir = ACCOUNTS_DIR / name
+
+    @classmethod
+    def from_config(cls, entry):
+        if not isinstance(entry, dict) or not entry.get("name"):
+            raise ValueError(f"Conta inválida no config.yaml (falta 'name'): {entry!r}")
+        desconhecidos = sorted(set(entry) - ACCOUNT_FIELDS)
+        if desconhecidos:
+            raise ValueError(
+                f"accounts.{entry['name']}: campo(s) desconhecido(s) {', '.join(desconhecidos)} "
+                f"(use {', '.join(sorted(ACCOUNT_FIELDS))})"
+            )
+        return cls(**entry)
+
+
+class AccountWorker:
+    """Ciclo de verificação de uma conta: coleta, diff, alerta e registro."""
+
+    def __init__(self, account, dispatcher, scheduler, login_lock, fetch_cfg=None, heartbeat=None):
+        fetch_cfg = fetch_cfg or {}
+        self.account = account
+        self.dispatcher = dispatcher
+        self.login_lock = login_lock
+        self.status = "iniciando"
+        self.last_digest = None
+        self._login_thread = None
+
+        account.data_dir.mkdir(parents=True, exist_ok=True)
+        self.db, self.journal, cookie_store = open_storage(scheduler.config, account.data_dir)
+        self.state = StateStore(data_dir=account.data_dir, db=self.db)
+        self.journal.add_listener(self._on_journal_events)
+        self.scheduler = scheduler
+        scheduler.use_journal(self.journal)
+
+        self.parser = HUParser(
+            account.user, account.data,
+            store=cookie_store,
+            browser=scheduler.config.get("browser"),
+            on_status=(lambda status: heartbeat(status, conta=account.name)) if heartbeat else None,
+        )
+        self.fetcher = HTTPFetcher(
+            timeout=fetch_cfg.get("timeout", 10),
+            verify_ssl=fetch_cfg.get("verify_ssl", False),
+        )
+        self.fetcher.load_cookies(self.parser.get_cookies())
+        self.session = SessionManager(
+            self.parser, self.fetcher,
+            notify=lambda msg: dispatcher.notify(
+                telegram=f"👤 <b>{account.name}</b>\n{msg}", chat_id=account.telegram_chat_id,
+            ),
+            options=scheduler.config.get("session"),
+        )
+
+    def _on_journal_events(self, eventos):
+        for e in eventos:
+            if e.evento == "added":
+                self.scheduler.observe_release(e.data_hora)
+
+    @property
+    def logging_in(self):
+        return self._login_thread is not None and self._login_thread.is_alive()
+
+    def _relogin(self):
+        """
+        Login via Selenium numa thread própria, fora do ciclo: o CAPTCHA pode
+        levar minutos e as outras contas seguem sendo verificadas. Serializado
+        entre as contas pelo login_lock (um navegador/CAPTCHA por vez).
+        """
+        if self.logging_in: return
+
+        def _run():
+            with self.login_lock:
+                log.info(f"[{self.account.name}] Refazendo login pelo navegador.")
+                try:
+                    self.session.relogin()
+                except Exception as e:
+                    log.error(f"[{self.account.name}] Login falhou: {e}")
+
+        self.status = "login"
+        self._login_thread = threading.Thread(target=_run, name=f"login-{self.account.name}", daemon=True)
+        self._login_thread.start()
+
+    def _fetch(self):
+        """Leitura HTTP; devolve None (e dispara o login em segundo plano) se a sessão não serve."""
+        if not self.fetcher.session.cookies:
+            self._relogin()
+            return None
+        try:
+            return self.fetcher.extract_dropdown()
+        except SessionRejected as e:
+            log.warning(f"[{self.account.name}] Sessão HTTP rejeitada ({e}).")
+        self._relogin()
+        return None
+
+    def check(self):
+        """Uma verificação completa. Nunca propaga exceções para o pool."""
+        if self.logging_in:
+            # Conta fora deste ciclo até o login terminar
+            self.status = "login"
+            return False
+        try:
+            resultado = self._fetch()
+            if resultado is None:
+                return False
+        except Exception as e:
+            log.warning(f"[{self.account.name}] Site indisponível, mantendo cache: {e}")
+            metrics.CHECK_FAILURES.inc()
+            self.status = "erro"
+            return False
+
+        metrics.CHECKS.inc(engine="http")
+        metrics.mark_success()
+
+        if resultado.digest != self.last_digest:
+            self._process_changes(resultado.especialidades)
+            self.last_digest = resultado.digest
+        self.status = "ok"
+        return True
+
+    def _process_changes(self, atuais):
+        novas, removidas = self.state.diff(atuais)
+        if self.state.is_first_run:
+            log.info(f"[{self.account.name}] Baseline criado: {len(atuais)} especialidades.")
+            self.state.commit(atuais)
+            return
+
+        relevantes = self.account.matcher.filter(novas)
+        if relevantes:
+            log.info(f"[{self.account.name}] VAGAS ENCONTRADAS: {relevantes}")
+            msg_tg, (assunto, corpo) = montar_alertas(relevantes)
+            self.dispatcher.notify(
+                telegram=f"👤 <b>{self.account.name}</b>\n{msg_tg}",
+                email=(f"{assunto} ({self.account.name})", corpo),
+                chat_id=self.account.telegram_chat_id,
+                email_to=self.account.email,
+            )
+
+        self.journal.append(
+            [("added", n) for n in sorted(novas)] + [("removed", r) for r in sorted(removidas)]
+        )
+        self.state.commit(atuais)
+
+    def close(self):
+        self.session.stop()
+        self.fetcher.close()
+        try:
+            self.parser.close()
+        except Exception:
+            pass
+        if self.db:
+            self.db.close()
+
+
+class MonitorPool:
+    """Executa os AccountWorkers em paralelo, no ritmo do agendador compartilhado."""
+
+    def __init__(self):
+        self.scheduler = get_scheduler()
+        logger.configure(self.scheduler.config)
+        self.dispatcher = NotificationDispatcher()
+        self.state = StateStore()  # só para o heartbeat global lido pelo Guardian
+        self.stop_event = threading.Event()
+
+        config = self.scheduler.config
+        pool_cfg = config.get("pool", {}) or {}
+        self.accounts = [Account.from_config(c) for c in config.get("accounts", [])]
+        nomes = [a.name for a in self.accounts]
+        if len(set(nomes)) != len(nomes):
+            raise ValueError(f"Nomes de conta repetidos no config.yaml: {nomes}")
+        self.max_workers = pool_cfg.get("max_workers") or len(self.accounts)
+        self.login_lock = threading.Lock()
+        self.first_check_at = None
+        self.cycle = 0
+        self.exporter = metrics.MetricsExporter.from_config(config)
+        self.fetch_cfg = config.get("fetch", {}) or {}
+        self.workers = []
+
+    def run_cycle(self, executor):
+        """Dispara uma verificação por conta e espera todas terminarem."""
+        futuros = [executor.submit(w.check) for w in self.workers]
+        wait(futuros)
+        return {w.account.name: w.status for w in self.workers}
+
+    def run(self):
+        log.info(f"=== Iniciando MonitorPool com {len(self.accounts)} conta(s) ===")
+        self.dispatcher.notify(telegram=f"🚀 Monitor Iniciado ({len(self.accounts)} contas)")
+        self.state.heartbeat("starting", force=True)
+        try:
+            self.workers = [
+                AccountWorker(a, self.dispatcher, self.scheduler, self.login_lock, self.fetch_cfg, self.state.heartbeat)
+                for a in self.accounts
+            ]
+            for w in self.workers:
+                w.session.start()
+            if self.exporter:
+                self.exporter.start()
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="conta") as executor:
+                while not self.stop_event.is_set():
+                    inicio = time.monotonic()
+                    contas = self.run_cycle(executor)
+                    if self.first_check_at is None and "ok" in contas.values():
+                        self.first_check_at = datetime.now().isoformat()
+                    segundos = self.scheduler.interval_seconds()
+                    self.state.heartbeat(
+                        "running", expires_in=segundos + CHECK_BUDGET_SECONDS,
+                        first_check_at=self.first_check_at, contas=contas,
+                    )
+                    if self.exporter: self.exporter.write_textfile()
+                    self.cycle += 1
+                    log.info(
+                        f"Ciclo concluído em {time.monotonic() - inicio:.1f}s. Próximo em {segundos:.0f}s.",
+                        extra={"cycle": self.cycle, "stage": "cycle",
+                               "duration_ms": round((time.monotonic() - inicio) * 1000, 1), "contas": len(contas)},
+                    )
+                    self.stop_event.wait(segundos)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.exporter:
+                self.exporter.stop()
+            self.dispatcher.close(timeout=10)
+            for w in self.workers:
+                w.close()
+
+    def stop(self):
+        self.stop_event.set()
@@ -1,19 +1,283 @@
+import random
 from datetime import datetime
+from pathlib import Path
+
 import yaml
 
+from .logger import get_logger
+from .adaptive import ReleaseModel, read_release_times
 
-def load_config():
-    with open("config.yaml") as f:
-        return yaml.safe_load(f)
+BASE_DIR = Path(__file__).resolve().parent.parent
+CONFIG_FILE = BASE_DIR / "config.yaml"
+MINUTES_PER_DAY = 24 * 60
+MIN_INTERVAL_SECONDS = 5
 
+WEEKDAYS = {
+    "mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
+    "seg": 0, "ter": 1, "qua": 2, "qui": 3, "sex": 4, "sab": 5, "dom": 6,
+}
 
-def get_interval_minutes():
-    config = load_config()
-    now = datetime.now()
-    hour = now.hour
+log = get_logger("Scheduler")
+
+
+class ConfigError(ValueError):
+    """config.yaml inválido (blocos sem cobertura de 24h, horários malformados etc.)."""
+
+
+def _minute_of_day(value, campo):
+    """Aceita hora inteira (8, 24) ou 'HH:MM' (entre aspas no YAML) e devolve o minuto do dia."""
+    if isinstance(value, int):
+        if value > 24:
+            # PyYAML lê 12:30 sem aspas como inteiro sexagesimal (12*60 + 30 = 750)
+            h, m = divmod(value, 60)
+            raise ConfigError(f"Horário em '{campo}' precisa de aspas: use \"{h:02d}:{m:02d}\" em vez de {h}:{m:02d}.")
+        minuto = value * 60
+    else:
+        try:
+            h, m = str(value).split(":")
+            minuto = int(h) * 60 + int(m)
+        except ValueError:
+            raise ConfigError(f"Horário inválido em '{campo}': {value!r}")
+    if not 0 <= minuto <= MINUTES_PER_DAY:
+        raise ConfigError(f"Horário fora do dia em '{campo}': {value!r}")
+    return minuto
+
+
+def _section(value, campo):
+    """Seção do YAML que precisa ser um mapeamento (ausente/vazia vira {})."""
+    if value is None: return {}
+    if not isinstance(value, dict):
+        raise ConfigError(f"'{campo}' deve ser um mapeamento (chave: valor), não {type(value).__name__}.")
+    return value
+
+
+def _number(value, campo):
+    if isinstance(value, bool):
+        raise ConfigError(f"'{campo}' deve ser um número: {value!r}")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ConfigError(f"'{campo}' deve ser um número: {value!r}")
+
+
+def compile_intervals(blocks, origem="intervals"):
+    """
+    Converte os blocos do YAML em uma lista (inicio, fim, segundos) em minutos do dia.
+    Blocos podem se sobrepor (ex.: uma janela de pico dentro do 'day'); nesse caso o
+    bloco mais estreito vence. A união dos blocos precisa cobrir as 24 horas.
+    """
+    blocks = _section(blocks, origem)
+    if not blocks:
+        raise ConfigError(f"'{origem}' está vazio.")
+
+    plano = []
+    for nome, block in blocks.items():
+        campo = f"{origem}.{nome}"
+        block = _section(block, campo)
+        for chave in ("start", "end"):
+            if chave not in block:
+                raise ConfigError(f"'{campo}' precisa de '{chave}'.")
+        inicio = _minute_of_day(block["start"], campo)
+        fim = _minute_of_day(block["end"], campo)
+        if fim <= inicio:
+            raise ConfigError(f"'{campo}' termina antes de começar.")
+        if "seconds" in block:
+            segundos = _number(block["seconds"], f"{campo}.seconds")
+        elif "minutes" in block:
+            segundos = _number(block["minutes"], f"{campo}.minutes") * 60
+        else:
+            raise ConfigError(f"'{campo}' precisa de 'minutes' ou 'seconds'.")
+        if segundos < MIN_INTERVAL_SECONDS:
+            raise ConfigError(f"'{campo}' abaixo do mínimo de {MIN_INTERVAL_SECONDS}s.")
+        plano.append((inicio, fim, segundos))
+
+    # Cobertura: percorre os blocos ordenados procurando buracos entre 00:00 e 24:00
+    coberto = 0
+    for inicio, fim, _ in sorted(plano):
+        if inicio > coberto:
+            break
+        coberto = max(coberto, fim)
+    if coberto < MINUTES_PER_DAY:
+        raise ConfigError(f"'{origem}' não cobre o horário {coberto // 60:02d}:{coberto % 60:02d}.")
+
+    # Mais estreito primeiro: a busca linear devolve sempre o bloco mais específico
+    plano.sort(key=lambda b: b[1] - b[0])
+    return plano
+
+
+class Scheduler:
+    """
+    Lê o config.yaml uma única vez e só volta ao disco quando o mtime muda.
+    Suporta intervalos em segundos, sobreposições por dia da semana/feriado e jitter.
+    No modo 'adaptive' o orçamento diário do plano fixo é redistribuído conforme o
+    modelo de liberações aprendido do histórico (ver adaptive.py).
+    """
+
+    def __init__(self, path=CONFIG_FILE):
+        self.path = Path(path)
+        self.config = {}
+        self._mtime = None
+        self._default = []
+        self._by_date = {}
+        self._by_weekday = {}
+        self.jitter = 0.0
+        self.mode = "fixed"
+        self.model = None
+        self.journals = []  # diários de onde o modelo adaptativo aprende (ver use_journal)
+        self._adaptive = {}
+        self._budgets = {}
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        """Recarrega o YAML se o arquivo mudou. Um config inválido mantém o anterior em uso."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            if self._mtime is None: raise
+            return False
+        if mtime == self._mtime:
+            return False
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                config = yaml.safe_load(f) or {}
+            self._compile(config)
+        except (ValueError, KeyError, TypeError, AttributeError, yaml.YAMLError) as e:
+            if self._mtime is None: raise
+            log.error(f"config.yaml inválido, mantendo a versão anterior: {e}")
+            self._mtime = mtime
+            return False
+
+        self.config = config
+        self._mtime = mtime
+        log.info("config.yaml carregado.")
+        return True
+
+    def _compile(self, config):
+        config = _section(config, "config.yaml")
+        opts = _section(config.get("scheduler"), "scheduler")
+        default = compile_intervals(config.get("intervals"))
+        by_date, by_weekday = {}, {}
 
-    for block in config["intervals"].values():
-        if block["start"] <= hour < block["end"]:
-            return block["minutes"]
+        for nome, override in _section(opts.get("overrides"), "scheduler.overrides").items():
+            override = _section(override, f"scheduler.overrides.{nome}")
+            plano = compile_intervals(override.get("intervals"), f"scheduler.overrides.{nome}.intervals")
+            for dia in override.get("days", []) or []:
+                chave = str(dia).lower()[:3]
+                if chave not in WEEKDAYS:
+                    raise ConfigError(f"Dia da semana inválido em '{nome}': {dia!r}")
+                by_weekday[WEEKDAYS[chave]] = plano
+            for data in override.get("dates", []) or []:
+                by_date[str(data)] = plano
 
-    return 60
+        jitter = _number(opts.get("jitter", 0) or 0, "scheduler.jitter")
+        if not 0 <= jitter < 1:
+            raise ConfigError("'scheduler.jitter' deve estar entre 0 e 1.")
+
+        mode = opts.get("mode", "fixed")
+        if mode not in ("fixed", "adaptive"):
+            raise ConfigError(f"'scheduler.mode' inválido: {mode!r}")
+        adaptive = {"min_seconds": 15, "max_seconds": 3600, "lead_minutes": 10, "bandwidth_minutes": 15,
+                    "floor": 0.3, "weekday_pooling": 0.5}
+        adaptive.update(_section(opts.get("adaptive"), "scheduler.adaptive"))
+        for chave, valor in adaptive.items():
+            adaptive[chave] = _number(valor, f"scheduler.adaptive.{chave}")
+
+        self._default, self._by_date, self._by_weekday, self.jitter = default, by_date, by_weekday, jitter
+        self._budgets = {}
+        if (mode, adaptive) != (self.mode, self._adaptive):
+            self.model = None
+        self.mode, self._adaptive = mode, adaptive
+
+    def plan_for(self, now):
+        """Plano do dia: feriado/data específica > dia da semana > padrão."""
+        plano = self._by_date.get(now.strftime("%Y-%m-%d"))
+        if plano is None:
+            plano = self._by_weekday.get(now.weekday(), self._default)
+        return plano
+
+    @staticmethod
+    def _lookup(plano, minuto):
+        for inicio, fim, segundos in plano:
+            if inicio <= minuto < fim:
+                return segundos
+        return 3600
+
+    def fixed_budget(self, now):
+        """Verificações por dia que o plano fixo faria na data de `now`."""
+        plano = self.plan_for(now)
+        chave = id(plano)
+        if chave not in self._budgets:
+            self._budgets[chave] = sum(60.0 / self._lookup(plano, m) for m in range(MINUTES_PER_DAY))
+        return self._budgets[chave]
+
+    def adaptive_options(self):
+        return dict(self._adaptive)
+
+    def use_journal(self, journal):
+        """Liga o diário ativo (o de open_storage) ao modelo adaptativo; o modelo é refeito a partir dele."""
+        if journal not in self.journals:
+            self.journals.append(journal)
+            self.model = None
+
+    def _release_times(self):
+        if not self.journals:
+            return read_release_times()
+        return (ts for journal in self.journals for ts in read_release_times(journal))
+
+    def _ensure_model(self):
+        if self.model is None:
+            self.model = ReleaseModel.from_history(
+                self._release_times(),
+                lead=int(self._adaptive["lead_minutes"]),
+                bandwidth=int(self._adaptive["bandwidth_minutes"]),
+                floor=self._adaptive["floor"],
+                pool=self._adaptive["weekday_pooling"],
+            )
+            log.info(f"Modelo adaptativo carregado com {self.model.total} liberações.")
+        return self.model
+
+    def observe_release(self, ts=None):
+        """Alimenta o modelo adaptativo com uma liberação recém-detectada."""
+        if self.mode == "adaptive":
+            self._ensure_model().observe(ts or datetime.now())
+
+    def base_interval_seconds(self, now=None, adaptive=True):
+        self.reload_if_changed()
+        now = now or datetime.now()
+        if adaptive and self.mode == "adaptive":
+            segundos = self._ensure_model().interval_seconds(
+                now, self.fixed_budget(now),
+                self._adaptive["min_seconds"], self._adaptive["max_seconds"],
+            )
+            # Sem histórico ainda: cai para o plano fixo
+            if segundos is not None:
+                return segundos
+        return self._lookup(self.plan_for(now), now.hour * 60 + now.minute)
+
+    def interval_seconds(self, now=None):
+        """Intervalo até a próxima verificação, já com jitter aplicado."""
+        segundos = self.base_interval_seconds(now)
+        if self.jitter:
+            segundos *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(MIN_INTERVAL_SECONDS, segundos)
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler()
+    return _scheduler
+
+
+def load_config():
+    scheduler = get_scheduler()
+    scheduler.reload_if_changed()
+    return scheduler.config
+
+
+def get_interval_minutes():
+    return get_scheduler().interval_seconds() / 60
@@ -0,0 +1,68 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: screenshot.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (In-Memory Print Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Pipeline do /print sem arquivos temporários: o PNG sai do Chrome direto
+    para a memória (opcionalmente recortado no <select id="Especialidade">),
+    é recomprimido em JPEG/WebP com o Pillow e enviado ao Telegram como bytes.
+    Sem o Pillow o PNG original é enviado como está.
+===============================================================================
+"""
+
+import io
+from collections import namedtuple
+
+from .logger import get_logger
+
+log = get_logger("Screenshot")
+
+SCREENSHOT_DEFAULTS = {
+    "format": "jpeg",   # jpeg | webp | png (sem recompressão)
+    "quality": 70,
+    "crop": False,      # true: só o dropdown de especialidades em vez da janela inteira
+}
+# formato -> (nome para o Pillow, extensão, tipo MIME)
+FORMATS = {
+    "png": ("PNG", "png", "image/png"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "webp": ("WEBP", "webp", "image/webp"),
+}
+
+Photo = namedtuple("Photo", ["data", "filename", "mime"])
+
+
+def options(config):
+    opts = {**SCREENSHOT_DEFAULTS, **((config or {}).get("screenshot", {}) or {})}
+    if opts["format"] not in FORMATS:
+        raise ValueError(f"screenshot.format inválido: {opts['format']!r} (use {', '.join(FORMATS)})")
+    return opts
+
+
+def encode(png, fmt="jpeg", quality=70, name="print"):
+    """PNG (bytes) -> Photo no formato pedido; devolve o PNG se o Pillow não estiver instalado."""
+    if fmt != "png":
+        try:
+            from PIL import Image
+        except ImportError:
+            log.info("Pillow ausente: print enviado em PNG.")
+            fmt = "png"
+        else:
+            pillow, _, _ = FORMATS[fmt]
+            with Image.open(io.BytesIO(png)) as img:
+                if pillow == "JPEG" and img.mode != "RGB":
+                    img = img.convert("RGB")
+                saida = io.BytesIO()
+                img.save(saida, pillow, quality=quality, optimize=True)
+            # Páginas quase só de texto às vezes ficam menores no PNG original
+            if saida.tell() < len(png):
+                _, ext, mime = FORMATS[fmt]
+                return Photo(saida.getvalue(), f"{name}.{ext}", mime)
+            fmt = "png"
+    _, ext, mime = FORMATS[fmt]
+    return Photo(png, f"{name}.{ext}", mime)
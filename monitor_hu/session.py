@@ -0,0 +1,255 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: session.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Session Lifecycle Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Ciclo de vida da sessão autenticada do HU.
+    - CookieStore: cookies em JSON (data/hu_cookies.json) com metadados de
+      login, migrando uma única vez o antigo hu_cookies.pkl.
+    - SessionManager: thread de fundo que mantém a sessão viva entre
+      verificações espaçadas (keepalive), acompanha a expiração pelos
+      metadados dos cookies e avisa com antecedência para que o operador
+      refaça o login (/login) sem derrubar o monitoramento.
+===============================================================================
+"""
+
+import pickle
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from . import metrics
+from .logger import get_logger
+from .state import read_json, atomic_write_json
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+COOKIES_FILE = DATA_DIR / "hu_cookies.json"
+
+SESSION_DEFAULTS = {
+    "keepalive_minutes": 10,     # toca a sessão se nenhuma requisição aconteceu nesse intervalo
+    "warn_before_minutes": 60,   # aviso de "sessão expirando" com essa antecedência
+    "max_age_hours": None,       # validade da sessão quando os cookies não trazem expiry
+    "auto_relogin": False,       # abre o CAPTCHA sozinho ao receber o aviso de expiração
+}
+
+log = get_logger("Session")
+
+
+class _CookieUnpickler(pickle.Unpickler):
+    """Só aceita a estrutura de cookies do Selenium (listas/dicts de tipos simples)."""
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Tipo não permitido no arquivo de cookies: {module}.{name}")
+
+
+def _valid_cookies(cookies):
+    return isinstance(cookies, list) and all(
+        isinstance(c, dict) and isinstance(c.get("name"), str) and isinstance(c.get("value"), str)
+        for c in cookies
+    )
+
+
+class CookieStore:
+    """Cookies no formato do Selenium + metadados ({"login_at", "saved_at", "cookies"})."""
+
+    def __init__(self, path=COOKIES_FILE):
+        self.path = Path(path)
+        self.legacy_path = self.path.with_suffix(".pkl")
+
+    def _read(self):
+        data = read_json(self.path)
+        if isinstance(data, dict) and _valid_cookies(data.get("cookies")):
+            return data
+        return self._migrate()
+
+    def _migrate(self):
+        """Converte o hu_cookies.pkl antigo para JSON e tira o pickle do caminho."""
+        if not self.legacy_path.exists(): return None
+        try:
+            with open(self.legacy_path, "rb") as f:
+                cookies = _CookieUnpickler(f).load()
+        except Exception as e:
+            log.warning(f"Arquivo de cookies antigo ignorado ({e}).")
+            return None
+        if not _valid_cookies(cookies): return None
+
+        data = {"login_at": None, "saved_at": datetime.now().isoformat(), "cookies": cookies}
+        try:
+            atomic_write_json(self.path, data)
+            self.legacy_path.replace(self.legacy_path.with_suffix(".pkl.migrado"))
+            log.info(f"Cookies migrados de {self.legacy_path.name} para {self.path.name}.")
+        except OSError:
+            pass
+        return data
+
+    def load(self):
+        data = self._read()
+        return data["cookies"] if data else []
+
+    def save(self, cookies, login=False):
+        """Grava os cookies; login=True marca o instante de um login novo (base do max_age)."""
+        anterior = self._read() or {}
+        agora = datetime.now().isoformat()
+        data = {
+            "login_at": agora if login else anterior.get("login_at"),
+            "saved_at": agora,
+            "cookies": list(cookies),
+        }
+        atomic_write_json(self.path, data)
+
+    def expires_at(self, max_age_hours=None):
+        """Instante (epoch) em que a sessão deixa de valer, ou None se desconhecido."""
+        data = self._read()
+        if not data: return None
+        expiracoes = [c["expiry"] for c in data["cookies"] if isinstance(c.get("expiry"), (int, float))]
+        if expiracoes:
+            return min(expiracoes)
+        if max_age_hours and data.get("login_at"):
+            return datetime.fromisoformat(data["login_at"]).timestamp() + max_age_hours * 3600
+        return None
+
+
+class SessionManager:
+    """
+    Keepalive, expiração e relogin da sessão HTTP. O relogin pode rodar em
+    segundo plano (/login ou auto_relogin): a sessão antiga continua servindo
+    as verificações enquanto o operador resolve o CAPTCHA.
+    """
+
+    TICK = 30
+
+    def __init__(self, parser, fetcher, notify=None, release_browser=True, options=None):
+        opts = {**SESSION_DEFAULTS, **(options or {})}
+        self.parser = parser
+        self.fetcher = fetcher
+        self.store = parser.store
+        self.notify = notify or (lambda msg: None)
+        self.release_browser = release_browser
+        self.keepalive_seconds = opts["keepalive_minutes"] * 60
+        self.warn_before_seconds = opts["warn_before_minutes"] * 60
+        self.max_age_hours = opts["max_age_hours"]
+        self.auto_relogin = opts["auto_relogin"]
+        self._warned_for = None
+        self._dropped = False
+        self._last_touch = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+        self._relogin_thread = None
+
+    # ==========================================================================
+    # Login
+    # ==========================================================================
+    def sync(self):
+        """Passa os cookies do navegador para a sessão HTTP e libera o Chrome se configurado."""
+        with self.parser.lock:
+            self.fetcher.load_cookies(self.parser.get_cookies())
+            if self.release_browser:
+                self.parser.close()
+        self._warned_for = None
+
+    def relogin(self):
+        """Login bloqueante (cookies salvos ou CAPTCHA) seguido da troca de cookies."""
+        metrics.RELOGINS.inc()
+        with self.parser.lock:
+            self.parser.ensure_logged()
+            self.sync()
+
+    def relogin_async(self):
+        """Refaz o login numa thread; devolve False se já houver um em andamento."""
+        if self._relogin_thread and self._relogin_thread.is_alive():
+            return False
+
+        def _run():
+            with self.parser.lock:
+                # O loop principal segue verificando: o Guardian não deve ver "captcha" no heartbeat
+                on_status, self.parser.on_status = self.parser.on_status, None
+                try:
+                    # Navegador novo, sem cookies: força um login de verdade mesmo com a sessão viva
+                    metrics.RELOGINS.inc()
+                    self.parser.close()
+                    self.parser.manual_login()
+                    self.sync()
+                    self.notify("🔑 Sessão renovada sem interromper o monitoramento.")
+                except Exception as e:
+                    log.error(f"Relogin em segundo plano falhou: {e}")
+                finally:
+                    self.parser.on_status = on_status
+
+        self._relogin_thread = threading.Thread(target=_run, name="relogin", daemon=True)
+        self._relogin_thread.start()
+        return True
+
+    # ==========================================================================
+    # Keepalive / expiração
+    # ==========================================================================
+    def expires_in(self):
+        expira = self.store.expires_at(self.max_age_hours)
+        return None if expira is None else expira - time.time()
+
+    def touch(self):
+        """Requisição de manutenção. Devolve False se o servidor já derrubou a sessão."""
+        from .fetcher import SessionRejected
+
+        self._last_touch = time.monotonic()
+        try:
+            self.fetcher.extract_dropdown()
+        except SessionRejected as e:
+            log.warning(f"Keepalive: sessão rejeitada ({e}).")
+            return False
+        except Exception as e:
+            log.info(f"Keepalive sem resposta ({e}).")
+            return True
+        self._dropped = False
+        self._persist()
+        return True
+
+    def _persist(self):
+        """Salva cookies renovados pelo servidor (ex.: Set-Cookie com nova validade)."""
+        cookies = self.fetcher.export_cookies()
+        if cookies and cookies != self.store.load():
+            try: self.store.save(cookies)
+            except OSError: pass
+
+    def _check_expiry(self):
+        restante = self.expires_in()
+        if restante is None or restante > self.warn_before_seconds: return
+        expira = self.store.expires_at(self.max_age_hours)
+        if self._warned_for == expira: return
+        self._warned_for = expira
+
+        minutos = max(0, int(restante // 60))
+        log.warning(f"Sessão expira em {minutos} min.")
+        if self.auto_relogin and self.relogin_async():
+            self.notify(f"⏳ Sessão do HU expira em {minutos} min. Janela de CAPTCHA aberta para renovar.")
+        else:
+            self.notify(f"⏳ Sessão do HU expira em {minutos} min. Envie /login e resolva o CAPTCHA para renovar sem parar o monitor.")
+
+    def _loop(self):
+        while not self._stop.wait(self.TICK):
+            try:
+                agora = time.monotonic()
+                ocioso = agora - max(self.fetcher.last_ok, self._last_touch)
+                if ocioso >= self.keepalive_seconds and not self.touch() and not self._dropped:
+                    self._dropped = True
+                    self.notify("🔑 Sessão do HU caiu. O login será refeito na próxima verificação.")
+                self._check_expiry()
+            except Exception as e:
+                log.warning(f"Falha no keepalive da sessão: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="session-keepalive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
@@ -1,51 +1,135 @@
 import json
+import os
+import time
 from datetime import datetime
 from pathlib import Path
 
+from . import metrics
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
 
-def load_snapshot():
-    path = DATA_DIR / "last_snapshot.json"
-    
-    if not path.exists():
-        return {"especialidades": [], "is_first_run": True}
-    
+def read_json(path):
+    """Lê um JSON do disco; devolve None se ausente, vazio ou corrompido."""
     try:
-        content = path.read_text(encoding='utf-8').strip()
-        if not content:
-            return {"especialidades": [], "is_first_run": True}
-            
-        data = json.loads(content)
-        data["is_first_run"] = False
-        return data
-        
+        content = Path(path).read_text(encoding='utf-8').strip()
+        return json.loads(content) if content else None
     except (json.JSONDecodeError, OSError):
-        return {"especialidades": [], "is_first_run": True}
+        return None
 
 
-def save_snapshot(especialidades):
-    path = DATA_DIR / "last_snapshot.json"
-    snapshot = {
-        "timestamp": datetime.now().isoformat(),
-        "especialidades": sorted(especialidades),
-        "is_first_run": False
-    }
-    try:
-        path.write_text(json.dumps(snapshot, indent=2), encoding='utf-8')
-    except Exception:
-        pass
+def atomic_write_json(path, data, backup=False):
+    """
+    Escreve em arquivo temporário + fsync + os.replace: um crash no meio nunca deixa
+    JSON pela metade. Com backup=True a versão anterior vira <arquivo>.bak.
+    """
+    path = Path(path)
+    # PID no nome: o monitor reserva e o ativo podem gravar o mesmo arquivo
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    if backup and path.exists():
+        os.replace(path, path.with_name(path.name + ".bak"))
+    os.replace(tmp, path)
 
 
-def update_heartbeat(status="ok"):
-    path = DATA_DIR / "heartbeat.json"
-    heartbeat = {
-        "last_run": datetime.now().isoformat(),
-        "status": status,
-    }
-    try:
-        path.write_text(json.dumps(heartbeat, indent=2), encoding='utf-8')
-    except Exception:
-        pass
\ No newline at end of file
+def _load_with_backup(path):
+    for candidato in (path, path.with_name(path.name + ".bak")):
+        data = read_json(candidato)
+        if isinstance(data, dict) and "especialidades" in data:
+            return data
+    return None
+
+
+class StateStore:
+    """
+    Snapshot autoritativo em memória. O disco só é tocado quando o conjunto muda
+    (write-behind atômico) e o heartbeat é gravado no máximo a cada
+    `heartbeat_interval` segundos, a menos que o status mude. Com `db`, o
+    snapshot vai para a tabela snapshots do SQLite (o heartbeat segue em JSON).
+    """
+
+    def __init__(self, data_dir=DATA_DIR, heartbeat_interval=30, db=None):
+        self.data_dir = Path(data_dir)
+        self.db = db
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.data_dir / "last_snapshot.json"
+        self.heartbeat_path = self.data_dir / "heartbeat.json"
+        self.heartbeat_interval = heartbeat_interval
+        self.especialidades = set()
+        self.is_first_run = True
+        self._heartbeat_status = None
+        self._heartbeat_at = 0.0
+        self._expires_at = 0.0
+        self.recover()
+
+    def recover(self):
+        """Restaura o snapshot do disco (com fallback para o .bak) sem cair em modo baseline."""
+        if self.db is not None:
+            especialidades = self.db.latest_snapshot()
+            data = None if especialidades is None else {"especialidades": especialidades}
+        else:
+            data = _load_with_backup(self.snapshot_path)
+        if data is None:
+            self.especialidades = set()
+            self.is_first_run = True
+            return False
+        self.especialidades = set(data.get("especialidades", []))
+        self.is_first_run = False
+        return True
+
+    def diff(self, atuais):
+        """Devolve (novas, removidas) em relação ao snapshot em memória."""
+        return atuais - self.especialidades, self.especialidades - atuais
+
+    def commit(self, atuais):
+        """Atualiza o snapshot; só escreve no disco se algo mudou. Devolve True se escreveu."""
+        atuais = set(atuais)
+        if atuais == self.especialidades and not self.is_first_run:
+            return False
+        with metrics.timed("snapshot_write"):
+            if self.db is not None:
+                self.db.save_snapshot(atuais)
+            else:
+                snapshot = {
+                    "timestamp": datetime.now().isoformat(),
+                    "especialidades": sorted(atuais),
+                    "is_first_run": False,
+                }
+                atomic_write_json(self.snapshot_path, snapshot, backup=True)
+        self.especialidades = atuais
+        self.is_first_run = False
+        return True
+
+    def heartbeat(self, status="ok", force=False, expires_in=None, **extra):
+        """
+        Grava heartbeat.json, agrupando batidas repetidas dentro do intervalo.
+        `expires_at` promete ao Guardian quando virá a próxima batida: `expires_in`
+        segundos (ex.: até a próxima verificação) ou, por padrão, dois intervalos.
+        """
+        agora = time.monotonic()
+        expires_at = time.time() + (expires_in if expires_in is not None else 2 * self.heartbeat_interval)
+        if (not force and status == self._heartbeat_status
+                and agora - self._heartbeat_at < self.heartbeat_interval
+                and (expires_in is None or expires_at <= self._expires_at)):
+            return False
+        heartbeat = {
+            "last_run": datetime.now().isoformat(),
+            "status": status,
+            "pid": os.getpid(),
+            "expires_at": datetime.fromtimestamp(expires_at).isoformat(),
+            **extra,
+        }
+        try:
+            with metrics.timed("heartbeat_write"):
+                atomic_write_json(self.heartbeat_path, heartbeat)
+        except OSError:
+            return False
+        self._heartbeat_status = status
+        self._heartbeat_at = agora
+        self._expires_at = expires_at
+        return True
@@ -0,0 +1,154 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: subscribers.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Fan-out Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Assinantes do Telegram além do dono do bot: cada chat inscrito (/start)
+    tem a própria lista de alvos (/add, /remove) e recebe só as vagas que
+    casam com ela. A raspagem continua uma só por ciclo; o custo por
+    assinante é o filtro do Matcher sobre as vagas novas, e chats com os
+    mesmos alvos compartilham o mesmo filtro compilado.
+    Persistência na tabela subscribers do banco (ou em subscribers.json no
+    backend csv).
+===============================================================================
+"""
+
+import threading
+from pathlib import Path
+
+from .logger import get_logger
+from .matcher import Matcher, normalize
+from .state import atomic_write_json, read_json
+
+log = get_logger("Subscribers")
+
+SUBSCRIPTION_DEFAULTS = {
+    "subscriptions": "closed",  # closed (só os chats em `allowed`) ou open (qualquer chat pode dar /start)
+    "allowed": [],
+    "max_targets": 20,
+}
+POLICIES = ("closed", "open")
+
+
+class SubscriberRegistry:
+    """Chats inscritos -> alvos. Sem alvos, o assinante recebe tudo fora da blacklist (modo geral)."""
+
+    def __init__(self, path, db=None, blacklist=(), policy="closed", allowed=(), max_targets=20):
+        if policy not in POLICIES:
+            raise ValueError(f"telegram.subscriptions inválido: {policy!r} (use {', '.join(POLICIES)})")
+        self.path = Path(path)
+        self.db = db
+        self.blacklist = list(blacklist)
+        self.policy = policy
+        self.allowed = {str(c) for c in allowed or ()}
+        self.max_targets = max_targets
+        self._matchers = {}  # tupla de alvos -> Matcher compilado
+        # O dispatcher remove chats que bloquearam o bot a partir das threads de envio
+        self._lock = threading.RLock()
+        if db is not None:
+            self._subs = db.subscribers()
+        else:
+            self._subs = (read_json(self.path) or {}).get("subscribers", {})
+        log.info(f"{len(self._subs)} assinante(s) carregado(s).")
+
+    @classmethod
+    def from_config(cls, config, data_dir, db=None, blacklist=()):
+        opts = {**SUBSCRIPTION_DEFAULTS, **((config or {}).get("telegram", {}) or {})}
+        return cls(
+            Path(data_dir) / "subscribers.json", db=db, blacklist=blacklist,
+            policy=opts["subscriptions"], allowed=opts["allowed"], max_targets=opts["max_targets"],
+        )
+
+    def __len__(self):
+        return len(self._subs)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._subs.items()))
+
+    def get(self, chat_id):
+        return self._subs.get(str(chat_id))
+
+    def can_subscribe(self, chat_id):
+        return self.policy == "open" or str(chat_id) in self.allowed
+
+    # ==========================================================================
+    # Alterações (cada uma grava na hora)
+    # ==========================================================================
+    def subscribe(self, chat_id):
+        """Inscreve o chat; devolve False se ele já estava inscrito."""
+        chat_id = str(chat_id)
+        with self._lock:
+            if chat_id in self._subs: return False
+            self._subs[chat_id] = []
+            self._save(chat_id)
+        log.info(f"Novo assinante: {chat_id}")
+        return True
+
+    def unsubscribe(self, chat_id):
+        chat_id = str(chat_id)
+        with self._lock:
+            if self._subs.pop(chat_id, None) is None: return False
+            if self.db is not None:
+                self.db.delete_subscriber(chat_id)
+            else:
+                self._save(chat_id)
+            self._prune()
+        log.info(f"Assinante removido: {chat_id}")
+        return True
+
+    def add_target(self, chat_id, alvo):
+        """Devolve False se o alvo já existia ou o limite de alvos foi atingido."""
+        alvos = self._subs[str(chat_id)]
+        if normalize(alvo) in {normalize(a) for a in alvos} or len(alvos) >= self.max_targets:
+            return False
+        self.set_targets(chat_id, alvos + [alvo])
+        return True
+
+    def remove_target(self, chat_id, nome):
+        alvos = self._subs[str(chat_id)]
+        self.set_targets(chat_id, [a for a in alvos if normalize(nome) not in normalize(a)])
+
+    def set_targets(self, chat_id, alvos):
+        chat_id = str(chat_id)
+        with self._lock:
+            self._subs[chat_id] = list(alvos)
+            self._save(chat_id)
+            self._prune()
+
+    def _save(self, chat_id):
+        if self.db is not None:
+            self.db.save_subscriber(chat_id, self._subs[chat_id])
+        else:
+            atomic_write_json(self.path, {"subscribers": self._subs})
+
+    def _prune(self):
+        # Descarta filtros de listas de alvos que ninguém mais usa
+        em_uso = {tuple(a) for a in self._subs.values()}
+        self._matchers = {k: m for k, m in self._matchers.items() if k in em_uso}
+
+    # ==========================================================================
+    # Fan-out
+    # ==========================================================================
+    def fan_out(self, novas):
+        """{chat_id: vagas relevantes (ordenadas)} para cada assinante com algo a receber."""
+        with self._lock:
+            if not novas or not self._subs: return {}
+            assinantes = list(self._subs.items())
+        por_alvos = {}  # a mesma lista de alvos é filtrada uma vez só
+        entregas = {}
+        for chat_id, alvos in assinantes:
+            chave = tuple(alvos)
+            if chave not in por_alvos:
+                matcher = self._matchers.get(chave)
+                if matcher is None:
+                    matcher = self._matchers[chave] = Matcher(alvos, self.blacklist)
+                por_alvos[chave] = sorted(matcher.filter(novas))
+            if por_alvos[chave]:
+                entregas[chat_id] = por_alvos[chave]
+        return entregas
@@ -0,0 +1,254 @@
+"""
+===============================================================================
+Projeto: Monitor HU-USP (Especialidades)
+Arquivo: tui.py
+Autor: Guterman (guterman.com.br)
+Versão: 3.3 (Dirty Region Edition)
+Data: Março de 2026
+===============================================================================
+
+Descrição:
+    Painel do monitor no terminal.
+    - RichDashboard: os painéis (cabeçalho, vagas, histórico, rodapé) só são
+      reconstruídos quando suas entradas mudam; as linhas já renderizadas ficam
+      em cache e a tela só é redesenhada quando algo mudou. Sem refresh
+      automático: a contagem regressiva redesenha apenas o rodapé, e só quando
+      o texto exibido muda (1x por minuto acima de 2 minutos).
+    - Dashboard (headless): mesma interface sem importar o Rich, para
+      servidores; mudanças de status e eventos vão para o log.
+===============================================================================
+"""
+
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+from .logger import get_logger
+
+log = get_logger("TUI")
+
+TUI_DEFAULTS = {
+    "mode": "auto",   # auto (Rich num terminal, headless fora dele), rich ou headless
+}
+
+# status -> (markup do Rich, texto do log)
+STATUS = {
+    "starting": ("[bold cyan]⏳ Iniciando...[/bold cyan]", "Iniciando"),
+    "connected": ("[bold green]✅ Conectado[/bold green]", "Conectado"),
+    "resuming": ("[bold green]✅ Retomando...[/bold green]", "Retomando"),
+    "paused": ("[bold yellow]⏸️ PAUSADO[/bold yellow]", "Pausado"),
+    "site_error": ("[bold red]⚠️ Erro no Site HU - Aguardando...[/bold red]", "Erro no site HU"),
+}
+HISTORY_ICONS = {
+    "added": "[bold green]🟢[/bold green]",
+    "removed": "[bold red]🔴[/bold red]",
+    "system": "[bold blue]ℹ️[/bold blue]",
+}
+REGIONS = ("header", "vagas", "history", "footer")
+MAX_VAGAS = 8
+
+
+def format_wait(seconds):
+    return f"{seconds / 60:.0f} minutos" if seconds >= 120 else f"{seconds:.0f} segundos"
+
+
+class Dashboard:
+    """Estado do painel. Sem Rich: só registra no log o que mudou (modo headless)."""
+
+    interactive = False
+
+    def __init__(self, history_size=6):
+        self.status = "starting"
+        self.vagas = frozenset()
+        self.history = deque(maxlen=history_size)
+        self.targets = 0
+        self.checked_at = None
+        self.deadline = None
+
+    # ==========================================================================
+    # Entradas (cada uma marca só a sua região)
+    # ==========================================================================
+    def set_status(self, status, next_check=0):
+        """Status após uma verificação (ou pausa); `next_check` arma a contagem regressiva."""
+        anterior = self.status
+        self.status = status
+        if next_check > 0:
+            self.checked_at = datetime.now()
+            self.deadline = time.monotonic() + next_check
+        else:
+            self.deadline = None
+        if status != anterior:
+            log.info(f"Status: {STATUS[status][1]}")
+        self._dirty("header", "footer")
+
+    def set_vagas(self, vagas):
+        vagas = frozenset(vagas)
+        if vagas == self.vagas: return
+        self.vagas = vagas
+        self._dirty("vagas")
+
+    def set_targets(self, alvos):
+        if len(alvos) == self.targets: return
+        self.targets = len(alvos)
+        self._dirty("header")
+
+    def add_history(self, event_type, item):
+        self.history.appendleft((event_type, datetime.now().strftime("%d/%m %H:%M"), item))
+        if not self.interactive:
+            log.info(item)
+        self._dirty("history")
+
+    def tick(self):
+        """Chamado a cada despertar do sleep; só o modo Rich tem o que atualizar."""
+
+    def _dirty(self, *regions):
+        pass
+
+    # ==========================================================================
+    # Ciclo de vida
+    # ==========================================================================
+    def preload(self):
+        pass
+
+    def start(self):
+        log.info("Painel em modo headless (sem TUI).")
+
+    def stop(self, clear=True):
+        pass
+
+    def print_exception(self):
+        pass
+
+
+class RichDashboard(Dashboard):
+    """Dashboard do Rich com renderização por região suja e redesenho sob demanda."""
+
+    interactive = True
+
+    def __init__(self, history_size=6):
+        super().__init__(history_size)
+        self._console = None
+        self._live = None
+        self._cache = {}        # região -> (largura, linhas já renderizadas)
+        self._countdown = None
+
+    def _dirty(self, *regions):
+        for nome in regions:
+            self._cache.pop(nome, None)
+        self.refresh()
+
+    def refresh(self):
+        if self._live is not None:
+            self._live.refresh()
+
+    def tick(self):
+        # Só redesenha quando o texto exibido muda (segundos abaixo de 2 min, minutos acima)
+        if self._countdown_text() != self._countdown:
+            self._dirty("footer")
+
+    def _countdown_text(self):
+        if self.deadline is None: return None
+        return format_wait(max(0.0, self.deadline - time.monotonic()))
+
+    # ==========================================================================
+    # Painéis
+    # ==========================================================================
+    def _build(self, region):
+        from rich.panel import Panel
+        from rich.table import Table
+        from rich.text import Text
+        from rich import box
+
+        if region == "header":
+            table = Table(box=None, show_header=False, expand=True)
+            table.add_column("Key", style="bold cyan")
+            table.add_column("Value")
+            table.add_row("Última verificação:", self.checked_at.strftime("%d/%m %H:%M:%S") if self.checked_at else "-")
+            table.add_row("Status:", STATUS[self.status][0])
+            table.add_row("Modo:", f"🎯 SNIPER ({self.targets})" if self.targets else "🌐 GERAL")
+            return Panel(table, title="[bold magenta]🏥 MONITOR HU-USP – Especialidades[/bold magenta]", border_style="magenta", box=box.HEAVY)
+
+        if region == "vagas":
+            count = len(self.vagas)
+            if not count:
+                return Panel("[dim]Nenhuma vaga disponível no momento.[/dim]", title="[bold yellow]VAGAS DETECTADAS (0)[/bold yellow]", border_style="yellow", box=box.ROUNDED)
+            vagas_text = Text()
+            lista = sorted(self.vagas)
+            for v in lista[:MAX_VAGAS]: vagas_text.append(f"• {v}\n", style="bold white")
+            if count > MAX_VAGAS: vagas_text.append(f"... e mais {count - MAX_VAGAS} vagas", style="dim italic")
+            return Panel(vagas_text, title=f"[bold green]VAGAS DETECTADAS ({count})[/bold green]", border_style="green", box=box.ROUNDED)
+
+        if region == "history":
+            if self.history:
+                linhas = [f"{HISTORY_ICONS.get(tipo, HISTORY_ICONS['system'])} {quando}: {item}" for tipo, quando, item in self.history]
+                hist_text = Text.from_markup("\n".join(linhas))
+            else:
+                hist_text = Text("- Nenhuma alteração registrada ainda", style="dim")
+            return Panel(hist_text, title="[bold blue]Histórico Recente[/bold blue]", border_style="blue", box=box.ROUNDED)
+
+        # Rodapé
+        self._countdown = self._countdown_text()
+        if self._countdown is not None:
+            return Text.from_markup(f"\n[cyan]💤 Próxima verificação em {self._countdown} (Comandos ativos via Telegram...)[/cyan]")
+        if self.status == "paused":
+            return Text.from_markup("\n[yellow]⏸️ Monitoramento PAUSADO. Aguardando /resume no Telegram...[/yellow]")
+        return Text("")
+
+    def __rich_console__(self, console, options):
+        from rich.segment import Segment
+
+        for region in REGIONS:
+            cache = self._cache.get(region)
+            if cache is None or cache[0] != options.max_width:
+                linhas = console.render_lines(self._build(region), options.update(height=None), pad=False)
+                cache = self._cache[region] = (options.max_width, linhas)
+            for linha in cache[1]:
+                yield from linha
+                yield Segment.line()
+
+    # ==========================================================================
+    # Ciclo de vida
+    # ==========================================================================
+    def preload(self):
+        import rich.live  # noqa: F401 -- a TUI sobe na hora da promoção
+
+    def start(self):
+        from rich.console import Console
+        from rich.live import Live
+
+        # Habilita suporte ANSI nativo (necessário para o Windows Terminal)
+        os.system("")
+        # APENAS UM ESPAÇO EM BRANCO (Sem cls para não apagar o histórico do terminal)
+        print("\n")
+        self._console = Console()
+        # Sem refresh automático: redesenho só quando uma região muda
+        self._live = Live(self, console=self._console, screen=True, transient=True, auto_refresh=False)
+        self._live.start(refresh=True)
+
+    def stop(self, clear=True):
+        if self._live is not None:
+            try: self._live.stop()
+            except Exception: pass
+            self._live = None
+        if clear:
+            # Código ANSI agressivo: Força a saída do buffer alternativo e limpa tudo
+            sys.stdout.write("\033[?1049l\033[2J\033[H")
+            sys.stdout.flush()
+            os.system('cls' if os.name == 'nt' else 'clear')
+
+    def print_exception(self):
+        if self._console is not None:
+            self._console.print_exception()
+
+
+def create_dashboard(config=None, headless=None):
+    """Escolhe o painel pela seção `tui:` do config.yaml (ou pelo --headless)."""
+    opts = {**TUI_DEFAULTS, **((config or {}).get("tui", {}) or {})}
+    mode = "headless" if headless else opts["mode"]
+    if mode == "auto":
+        mode = "rich" if sys.stdout.isatty() else "headless"
+    if mode == "rich":
+        return RichDashboard()
+    return Dashboard()